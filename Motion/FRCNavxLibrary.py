@@ -6,6 +6,8 @@
 #                                                                #
 #  This class is a wrapper around the HAL-Navx libraries.  This  #
 #  class provides threading of the Navx board interactions.      #
+#  The board is accessed through a backend so a simulated VMX    #
+#  that replays recorded IMU traces can be used off the robot.   #
 #                                                                #
 #  @Version: 1.0                                                 #
 #  @Created: 2020-2-11                                           #
@@ -19,7 +21,7 @@
 
 # System imports
 import sys
-import imp
+import importlib.util
 
 # Setup paths
 sys.path.append('/usr/local/lib/vmxpi/')
@@ -29,106 +31,547 @@ import math
 import time
 import datetime
 import logging
-from threading import Thread
+from threading import Thread, Lock
+
+# Team 4121 module imports
+from FRCTelemetryLibrary import SOURCE_NAVX, log_message
+
+# Set global variables
+vmx_module_file = '/usr/local/lib/vmxpi/vmxpi_hal_python.py'
+
+
+# Define the VMX-pi hardware backend
+class VMXBackend:
+
+    # Define initialization
+    def __init__(self, vmxpi=None):
+
+        # Load VMX module (a stand-in module can be passed for testing)
+        if vmxpi is None:
+            spec = importlib.util.spec_from_file_location('vmxpi_hal_python', vmx_module_file)
+            vmxpi = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(vmxpi)
+        self.vmxpi = vmxpi
+        self.vmx = self.vmxpi.VMXPi(False,50)
+
+        # Samples are taken in real time
+        self.realtime = True
+
+
+    # Define open check method
+    def is_open(self):
+
+        return self.vmx.IsOpen()
+
+
+    # Define AHRS reset method
+    def reset(self):
+
+        self.vmx.getAHRS().Reset()
+        self.vmx.getAHRS().ZeroYaw()
+
+
+    # Define clock method (timestamps for samples)
+    def get_time(self):
+
+        return time.monotonic()
+
+
+    # Define AHRS read method
+    def read_ahrs(self):
+
+        ahrs = self.vmx.getAHRS()
+        return ahrs.GetAngle(), ahrs.GetYaw(), ahrs.GetPitch()
+
+
+    # Define read RTC time method
+    def get_rtc_time(self):
+
+        return self.vmx.getTime().GetRTCTime()
+
+
+    # Define read RTC date method
+    def get_rtc_date(self):
+
+        return self.vmx.getTime().GetRTCDate()
+
+
+    # Define set RTC time method
+    def set_rtc_time(self, hour, minute, second):
+
+        return self.vmx.getTime().SetRTCTime(hour, minute, second)
+
+
+    # Define set RTC date method
+    def set_rtc_date(self, weekday, day, month, year):
+
+        return self.vmx.getTime().SetRTCDate(weekday, day, month, year)
+
+
+# Define the simulated VMX backend (replays a recorded IMU trace)
+class SimulatedVMXBackend:
+
+    # Define initialization
+    def __init__(self, tracefile=None, samples=None):
+
+        # Load trace from file (time,angle,yaw,pitch) or use given samples
+        self.samples = []
+        if tracefile is not None:
+            self.samples = self.read_trace_file(tracefile)
+        elif samples is not None:
+            self.samples = [tuple(float(v) for v in sample) for sample in samples]
+
+        # Initialize replay position
+        self.sampleIndex = 0
+        self.angleOffset = 0.0
+        self.yawOffset = 0.0
+        self.currentTime = self.samples[0][0] if len(self.samples) > 0 else 0.0
+
+        # Replay runs as fast as samples are requested
+        self.realtime = False
+
+
+    # Define trace file read method
+    def read_trace_file(self, tracefile):
+
+        samples = []
+        with open(tracefile, 'r') as in_file:
+            for line in in_file.readlines():
+
+                # Skip header and blank lines
+                split_line = line.strip().split(',')
+                try:
+                    samples.append(tuple(float(v) for v in split_line[0:4]))
+                except ValueError:
+                    continue
+
+        return samples
+
+
+    # Define open check method
+    def is_open(self):
+
+        return len(self.samples) > 0
+
+
+    # Define end of trace check method
+    def is_finished(self):
+
+        return self.sampleIndex >= len(self.samples)
+
+
+    # Define next sample time method
+    def peek_time(self):
+
+        if self.is_finished():
+            return None
+        return self.samples[self.sampleIndex][0]
+
+
+    # Define AHRS reset method (zero heading at last sample read)
+    def reset(self):
+
+        i = min(max(self.sampleIndex - 1, 0), len(self.samples) - 1)
+        if i >= 0:
+            self.angleOffset = self.samples[i][1]
+            self.yawOffset = self.samples[i][2]
+
+
+    # Define clock method (trace time of the last sample read)
+    def get_time(self):
+
+        return self.currentTime
+
+
+    # Define AHRS read method
+    def read_ahrs(self):
+
+        # Hold last sample once the trace is finished
+        i = min(self.sampleIndex, len(self.samples) - 1)
+        sampleTime, angle, yaw, pitch = self.samples[i]
+        if self.sampleIndex < len(self.samples):
+            self.sampleIndex += 1
+        self.currentTime = sampleTime
+
+        # Apply reset offsets (yaw is kept in -180 to 180)
+        yaw = ((yaw - self.yawOffset + 180.0) % 360.0) - 180.0
+        return angle - self.angleOffset, yaw, pitch
+
+
+    # Define read RTC time method
+    def get_rtc_time(self):
+
+        currentTime = time.localtime(time.time())
+        return [True, currentTime.tm_hour, currentTime.tm_min, currentTime.tm_sec]
+
+
+    # Define read RTC date method
+    def get_rtc_date(self):
+
+        currentTime = time.localtime(time.time())
+        return [True, currentTime.tm_wday + 1, currentTime.tm_mday, 
+                currentTime.tm_mon, currentTime.tm_year - 2000]
+
+
+    # Define set RTC time method
+    def set_rtc_time(self, hour, minute, second):
+
+        return False
+
+
+    # Define set RTC date method
+    def set_rtc_date(self, weekday, day, month, year):
+
+        return False
 
 
 # Define the Navx class
 class FRCNavx:
 
     # Define initialization
-    def __init__(self, name):
+    def __init__(self, name, backend=None, historysize=400, telemetry=None):
 
-        # Load VMX module
-        self.vmxpi = imp.load_source('vmxpi_hal_python', '/usr/local/lib/vmxpi/vmxpi_hal_python.py')
-        self.vmx = self.vmxpi.VMXPi(False,50)
-        self.vmxOpen = self.vmx.IsOpen()
+        # Set up telemetry logging (gyro samples, which can be paused, and messages)
+        self.telemetry = telemetry
+        self.logSamples = True
+
+        # Set up board backend (defaults to the VMX-pi hardware)
+        if backend is None:
+            backend = VMXBackend()
+        self.backend = backend
+        self.vmxOpen = self.backend.is_open()
 
         # Log error if VMX didn't open properly
         if self.vmxOpen is False:
 
-            # Get current time as a string
-            currentTime = time.localtime(time.time())
-            timeString = str(currentTime.tm_year) + str(currentTime.tm_mon) + str(currentTime.tm_mday) + str(currentTime.tm_hour) + str(currentTime.tm_min)
-
-            # Open a log file
-            logFilename = '/data/Logs/Navx_Log_' + timeString + '.txt'
-            self.log_file = open(logFilename, 'w')
-            self.log_file.write('Navx initialized on %s.\n' % datetime.datetime.now())
-            self.log_file.write('')
-
             # Write error message
-            self.log_file.write('Error:  Unable to open VMX Client.\n')
-            self.log_file.write('\n')
-            self.log_file.write('        - Is pigpio (or the system resources it requires) in use by another process?\n')
-            self.log_file.write('        - Does this application have root privileges?')
-            self.log_file.close()
+            log_message(self.telemetry, SOURCE_NAVX, 'Error: Unable to open VMX Client')
+            log_message(self.telemetry, SOURCE_NAVX, 'Check pigpio is free and root privileges')
 
         # Set name of Navx thread
         self.name = name
 
-        # Initialize Navx values
+        # Initialize Navx values (latest sample is kept whole so readers never mix samples)
         self.angle = 0.0
         self.yaw = 0.0
         self.pitch = 0.0
+        self.latestSample = (0.0, 0.0, 0.0)
         self.time = []
         self.date = []
+
+        # Initialize sample history (ring buffer of timestamped samples)
+        self.historySize = int(historysize)
+        self.sampleTimes = [0.0] * self.historySize
+        self.sampleAngles = [0.0] * self.historySize
+        self.sampleYaws = [0.0] * self.historySize
+        self.samplePitches = [0.0] * self.historySize
+        self.sampleIndex = 0
+        self.sampleCount = 0
+        self.sampleLock = Lock()
+
+        # Initialize sampling thread values
+        self.sampleRate = 100.0
+        self.stopped = True
         
         # Reset Navx and initialize time
         if self.vmxOpen is True:
-            self.vmx.getAHRS().Reset()
-            self.vmx.getAHRS().ZeroYaw()
-            self.time = self.vmx.getTime().GetRTCTime()
-            self.date = self.vmx.getTime().GetRTCDate()
+            self.backend.reset()
+            self.time = self.backend.get_rtc_time()
+            self.date = self.backend.get_rtc_date()
        
 
+    # Define sample read method (angle, yaw and pitch from one AHRS read)
+    def read_sample(self):
+
+        # Use latest sample if the sampling thread is running or a trace is being replayed
+        if self.sampleCount > 0 and (self.stopped is False or self.backend.realtime is False):
+            return self.latestSample
+
+        angle, yaw, pitch = self.backend.read_ahrs()
+        self.store_latest(angle, yaw, pitch)
+        return self.latestSample
+
+
     # Define read angle method
     def read_angle(self):
 
-        self.angle = round(self.vmx.getAHRS().GetAngle(), 2)
-        return self.angle
+        return self.read_sample()[0]
 
 
     # Define read yaw method
     def read_yaw(self):
 
-        self.yaw = round(self.vmx.getAHRS().GetYaw(), 2)
-        return self.yaw
+        return self.read_sample()[1]
 
 
     # Define read pitch method
     def read_pitch(self):
 
-        self.pitch = round(self.vmx.getAHRS().GetPitch(), 2)
-        return self.pitch
+        return self.read_sample()[2]
+
+
+    # Define latest sample store method
+    def store_latest(self, angle, yaw, pitch):
+
+        self.latestSample = (round(angle, 2), round(yaw, 2), round(pitch, 2))
+        self.angle, self.yaw, self.pitch = self.latestSample
 
 
     # Define reset gyro method
     def reset_gyro(self):
 
-        self.vmx.Reset()
-        self.vmx.ZeroYaw()
+        # Hold the sample lock so the sampling thread doesn't read mid-reset
+        with self.sampleLock:
+
+            self.backend.reset()
+
+            # Clear history so lookups don't interpolate across the reset
+            self.sampleIndex = 0
+            self.sampleCount = 0
+
+
+    # Define sampling thread start method
+    def start_navx_thread(self, rate=100.0):
+
+        # Set sample rate (Hz)
+        self.sampleRate = float(rate)
+        self.stopped = False
+
+        # Define sampling thread
+        navxThread = Thread(target=self.update, name=self.name, args=())
+        navxThread.daemon = True
+        navxThread.start()
+
+        return self
+
+
+    # Define sampling thread stop method
+    def stop_navx_thread(self):
+
+        # Set stop flag
+        self.stopped = True
+
+
+    # Define threaded update method
+    def update(self):
+
+        # Set sample period and first sample time
+        period = 1.0 / self.sampleRate
+        nextTime = time.monotonic()
+
+        # Main thread loop
+        while True:
+
+            # Check stop flag
+            if self.stopped:
+                return
+
+            # Take a new sample
+            self.take_sample()
+
+            # Simulated boards replay as fast as possible until the trace ends
+            if self.backend.realtime is False:
+                if self.backend.is_finished():
+                    self.stopped = True
+                continue
+
+            # Wait for next sample time (resync if we fell behind)
+            nextTime += period
+            delay = nextTime - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            elif delay < -period:
+                nextTime = time.monotonic()
+
+
+    # Define take sample method
+    def take_sample(self):
+
+        with self.sampleLock:
+
+            # Read AHRS values and timestamp them
+            angle, yaw, pitch = self.backend.read_ahrs()
+            sampleTime = self.backend.get_time()
+
+            # Store sample in ring buffer
+            i = self.sampleIndex
+            self.sampleTimes[i] = sampleTime
+            self.sampleAngles[i] = angle
+            self.sampleYaws[i] = yaw
+            self.samplePitches[i] = pitch
+            self.sampleIndex = (i + 1) % self.historySize
+            if self.sampleCount < self.historySize:
+                self.sampleCount += 1
+
+        # Log sample
+        if self.telemetry is not None and self.logSamples == True:
+            self.telemetry.log_gyro(sampleTime, angle, yaw, pitch)
+
+        # Update latest values
+        self.store_latest(angle, yaw, pitch)
+
+        return sampleTime
+
+
+    # Define replay method (simulated boards only)
+    def replay_until(self, timestamp):
+
+        # Take samples until the next trace sample is past the timestamp
+        samplesTaken = 0
+        while self.backend.is_finished() is False and self.backend.peek_time() <= timestamp:
+            self.take_sample()
+            samplesTaken += 1
+
+        return samplesTaken
+
+
+    # Define history save method (writes a trace the simulator can replay)
+    def save_history(self, tracefile):
+
+        # Copy history out in time order
+        with self.sampleLock:
+            oldest = (self.sampleIndex - self.sampleCount) % self.historySize
+            order = [(oldest + n) % self.historySize for n in range(self.sampleCount)]
+            lines = ['%.6f,%.4f,%.4f,%.4f\n' % (self.sampleTimes[i], self.sampleAngles[i],
+                                                self.sampleYaws[i], self.samplePitches[i]) for i in order]
+
+        # Write trace file
+        with open(tracefile, 'w') as out_file:
+            out_file.write('time,angle,yaw,pitch\n')
+            out_file.writelines(lines)
+
+        return len(lines)
+
+
+    # Define sample lookup method
+    def get_sample_at(self, timestamp):
+
+        with self.sampleLock:
+
+            # Make sure there is history to search
+            if self.sampleCount == 0:
+                return None
+
+            # Start from newest sample (most lookups are only a few samples back)
+            newest = (self.sampleIndex - 1) % self.historySize
+            if timestamp >= self.sampleTimes[newest] or self.sampleCount == 1:
+                return (self.sampleAngles[newest], self.sampleYaws[newest], 
+                        self.samplePitches[newest])
+
+            # Walk back until the bracketing pair of samples is found
+            later = newest
+            for n in range(1, self.sampleCount):
+                earlier = (newest - n) % self.historySize
+                if self.sampleTimes[earlier] <= timestamp:
+                    break
+                later = earlier
+            else:
+                # Timestamp is older than all history so use oldest sample
+                return (self.sampleAngles[later], self.sampleYaws[later], 
+                        self.samplePitches[later])
+
+            # Interpolate between bracketing samples
+            t0 = self.sampleTimes[earlier]
+            t1 = self.sampleTimes[later]
+            fraction = (timestamp - t0) / (t1 - t0) if t1 > t0 else 0.0
+            angle = self.interpolate(self.sampleAngles[earlier], self.sampleAngles[later], fraction)
+            yaw = self.interpolate_wrapped(self.sampleYaws[earlier], self.sampleYaws[later], fraction)
+            pitch = self.interpolate(self.samplePitches[earlier], self.samplePitches[later], fraction)
+
+        return (angle, yaw, pitch)
+
+
+    # Define angle lookup method
+    def get_angle_at(self, timestamp):
+
+        sample = self.get_sample_at(timestamp)
+        if sample is None:
+            return self.read_angle()
+        return round(sample[0], 2)
+
+
+    # Define yaw lookup method
+    def get_yaw_at(self, timestamp):
+
+        sample = self.get_sample_at(timestamp)
+        if sample is None:
+            return self.read_yaw()
+        return round(sample[1], 2)
+
+
+    # Define pitch lookup method
+    def get_pitch_at(self, timestamp):
+
+        sample = self.get_sample_at(timestamp)
+        if sample is None:
+            return self.read_pitch()
+        return round(sample[2], 2)
+
+
+    # Define turn rate lookup method (degrees per second over the window before timestamp)
+    def get_rate_at(self, timestamp, window=0.1):
+
+        current = self.get_sample_at(timestamp)
+        earlier = self.get_sample_at(timestamp - window)
+        if current is None or earlier is None:
+            return 0.0
+
+        # Take the short way around the circle
+        delta = current[1] - earlier[1]
+        if delta > 180.0:
+            delta -= 360.0
+        elif delta < -180.0:
+            delta += 360.0
+
+        return delta / window
+
+
+    # Define linear interpolation method
+    def interpolate(self, value0, value1, fraction):
+
+        return value0 + (value1 - value0) * fraction
+
+
+    # Define interpolation method for values that wrap at +/-180 degrees
+    def interpolate_wrapped(self, value0, value1, fraction):
+
+        # Take the short way around the circle
+        delta = value1 - value0
+        if delta > 180.0:
+            delta -= 360.0
+        elif delta < -180.0:
+            delta += 360.0
+
+        # Interpolate and normalize back to (-180, 180]
+        value = value0 + delta * fraction
+        if value > 180.0:
+            value -= 360.0
+        elif value <= -180.0:
+            value += 360.0
+
+        return value
 
 
     # Define read time method
     def read_time(self):
 
-        self.time = self.vmx.getTime().GetRTCTime()
+        self.time = self.backend.get_rtc_time()
         return self.time
     
 
     # Define read date method
     def read_date(self):
 
-        self.date = self.vmx.getTime().GetRTCDate()
+        self.date = self.backend.get_rtc_date()
         return self.date
     
 
     # Define set time method
     def set_time(self, newtime):
 
-        success = self.vmx.getTime().SetRTCTime(newtime[0], 
-                                                newtime[1],
-                                                newtime[2])
+        success = self.backend.set_rtc_time(newtime[0], 
+                                             newtime[1],
+                                             newtime[2])
         
         return success
     
@@ -136,10 +579,10 @@ class FRCNavx:
     # Define set date method
     def set_date(self, newdate):
 
-        success = self.vmx.getTime().SetRTCDate(newdate[0],
-                                                newdate[1],
-                                                newdate[2],
-                                                newdate[3])
+        success = self.backend.set_rtc_date(newdate[0],
+                                             newdate[1],
+                                             newdate[2],
+                                             newdate[3])
 
         return success
     
@@ -40,7 +40,10 @@
 
 #System imports
 import sys
-import imp
+import time
+
+#Start timing startup (imports included)
+startupStart = time.perf_counter()
 
 #Setup paths
 sys.path.append('/home/pi/.local/lib/python3.5/site-packages')
@@ -48,22 +51,23 @@ sys.path.append('/home/pi/Team4121/Libraries')
 sys.path.append('/usr/local/lib/vmxpi/')
 #sys.path.append('C:\\Users\\timfu\\Documents\\Team4121\\Libraries')
 
-#Module imports
+#Module imports (NetworkTables is imported when connecting)
 import cv2 as cv
 import numpy as np
 import datetime
-import time
 import logging
 import argparse
-from operator import itemgetter
-import math
-from networktables import NetworkTables
 from time import sleep
 
-#Team 4121 module imports
+#Team 4121 module imports (Navx, band segmenter and ball layout are imported when enabled)
 from FRCVisionLibrary import VisionLibrary
 from FRCCameraLibrary import FRCWebCam
-from FRCNavxLibrary import FRCNavx
+from FRCProjectionLibrary import FRCProjection
+from FRCFrameGateLibrary import FRCFrameGate
+from FRCTelemetryLibrary import FRCTelemetry
+from FRCTelemetryLibrary import SOURCE_MAIN, SOURCE_FIELDCAM, SOURCE_GOALCAM
+from FRCTelemetryLibrary import TARGET_BALL, TARGET_MARKER, TARGET_TAPE
+from FRCTelemetryLibrary import STAGE_LOOP, STAGE_READ, STAGE_DETECT, STAGE_PUBLISH, STAGE_VIDEO
 
 #Set up basic logging
 logging.basicConfig(level=logging.DEBUG)
@@ -72,6 +76,9 @@ logging.basicConfig(level=logging.DEBUG)
 cameraFile = '/home/pi/Team4121/Config/2021CameraSettings.txt'
 visionFile = '/home/pi/Team4121/Config/2021VisionSettings.txt'
 videoDirectory = '/home/pi/Team4121/Videos'
+logDirectory = '/home/pi/Team4121/Logs'
+fieldCamDevice = '/dev/v4l/by-path/platform-fd500000.pcie-pci-0000:01:00.0-usb-0:1.1:1.0-video-index0'
+goalCamDevice = '/dev/v4l/by-path/platform-fd500000.pcie-pci-0000:01:00.0-usb-0:1.2:1.0-video-index0'
 cameraValues={}
 
 #Define program control flags
@@ -81,9 +88,24 @@ useGoalCam = True
 findBalls = False
 findMarkers = False
 findGoal = True
+findGoalPose = False
+gateFrames = True
+incrementalMorphology = False
+parallelSegmentation = False
 videoTesting = False
 resizeVideo = True
 saveVideo = False
+serviceMode = True
+profileStartup = False
+
+#Define how often idle cameras are grabbed (seconds, service mode only)
+idleGrabPeriod = 0.05
+
+#Define Navx sampling rate (Hz)
+navxSampleRate = 100
+
+#Define how often camera settings are read back (frames)
+cameraCheckFrames = 150
 
 #Read vision settings file
 def read_settings_file():
@@ -141,49 +163,37 @@ def read_settings_file():
         cameraValues['GoalCamResizeFactor'] = 2
 
 
-#Define ball layout detection function
-def determineBallPattern(method, ballX, ballDistance, ballAngle):
+#Define log filename function (run number is added after the first run of the process)
+def getLogFilename(navx, runNumber):
 
-    #Initialize return value
-    ballPattern = -1
-    ballPatternName = 'none'
+    #Get current time as a string
+    if useNavx == True:
+        timeString = navx.get_raw_time()
+    else:
+        currentTime = time.localtime(time.time())
+        timeString = str(currentTime.tm_year) + str(currentTime.tm_mon) + str(currentTime.tm_mday) + str(currentTime.tm_hour) + str(currentTime.tm_min)
 
-    #Run selected method
-    if method == 1:
+    if runNumber > 1:
+        timeString += '_' + str(runNumber)
+    return logDirectory + '/Run_Log_' + timeString + '.tlm'
 
-        ballWidthPercent = (ballX / float(cameraValues['BallCamWidth']))
 
-        #Blue 1 
-        if (ballWidthPercent > 0.9) and (ballWidthPercent < 0.95):
-            ballPattern = 1
-            ballPatternName = "blue1"
-        #Red1
-        elif (ballWidthPercent > 0.4) and (ballWidthPercent < 0.6):
-            ballPattern = 2
-            ballPatternName = "red1"
-        #Blue 2
-        elif (ballWidthPercent > 0.68) and (ballWidthPercent < 0.72):
-            ballPattern = 3
-            ballPatternName = "blue2"
-        #Red 2
-        elif (ballWidthPercent > 0) and (ballWidthPercent < 0.05):
-            ballPattern = 4
-            ballPatternName = "red2"
+#Define field relative bearing function
+def getFieldBearing(navx, frameTime, targetAngle):
 
-    else:
+    #Look up robot heading at the moment the frame was captured
+    frameHeading = navx.get_angle_at(frameTime)
 
-        #Blue 1
-        if ((ballDistance > 0) and (ballDistance < 10)) and ((ballAngle > 0) and (ballAngle < 10)):
-            ballPattern = 1
-            ballPatternName = 'blue1'
- 
-    #Return values
-    return ballPattern, ballPatternName
+    #Target bearing is the camera relative angle added to that heading
+    return round(frameHeading + targetAngle, 2)
 
 
 #Define main processing function
 def main():
 
+    #Declare global variables (save video flag can be changed from network tables)
+    global saveVideo
+
     #Define flags
     networkTablesConnected = False
     foundTape = False
@@ -195,8 +205,9 @@ def main():
     markersFound = 0
     ballData = []
     markerData = []
-    currentTime = []
-    timeString = ''
+    frameNumber = 0
+    resumeTime = time.monotonic()
+    firstDetectionPending = True
     fieldCamWriter = 0
     fieldCamWidth = 0
     fieldCamHeight = 0
@@ -215,39 +226,42 @@ def main():
     fieldCamera = object
     goalCamera = object
 
-    #Create Navx object
+    #Mark the end of each startup phase (reported after the first frame when profiling)
+    startupMarks = [('start', startupStart), ('imports', time.perf_counter())]
+
+    #Create Navx object and start sampling
     if useNavx == True:
+        from FRCNavxLibrary import FRCNavx
         navx = FRCNavx('NavxStream')
+        navx.start_navx_thread(navxSampleRate)
+        startupMarks.append(('navx', time.perf_counter()))
 
-    #Get current time as a string
+    #Open the telemetry log (a new one is started each time the pipeline resumes)
+    runNumber = 1
+    telemetry = FRCTelemetry(getLogFilename(navx, runNumber))
+    telemetry.log_message(SOURCE_MAIN, 'Run started on %s' % datetime.datetime.now())
     if useNavx == True:
-        timeString = navx.get_raw_time()
-    else:
-        currentTime = time.localtime(time.time())
-        timeString = str(currentTime.tm_year) + str(currentTime.tm_mon) + str(currentTime.tm_mday) + str(currentTime.tm_hour) + str(currentTime.tm_min)
-
-    #Open a log file
-    logFilename = '/home/pi/Team4121/Logs/Run_Log_' + timeString + '.txt'
-    log_file = open(logFilename, 'w')
-    log_file.write('run started on %s.\n' % datetime.datetime.now())
-    log_file.write('')
+        navx.telemetry = telemetry
+    startupMarks.append(('telemetry log', time.perf_counter()))
 
     #Connect NetworkTables
     try:
+        from networktables import NetworkTables
         NetworkTables.initialize(server='10.41.21.2')
         visionTable = NetworkTables.getTable("vision")
         navxTable = NetworkTables.getTable("navx")
         networkTablesConnected = True
-        log_file.write('Connected to Networktables on 10.41.21.2 \n')
+        telemetry.log_message(SOURCE_MAIN, 'Connected to Networktables on 10.41.21.2')
 
         visionTable.putNumber("RobotStop", 0)
     except:
-        log_file.write('Error:  Unable to connect to Network tables.\n')
-        log_file.write('Error message: ', sys.exc_info()[0])
-        log_file.write('\n')
+        telemetry.log_message(SOURCE_MAIN, 'Error: Unable to connect to Network tables')
+        telemetry.log_message(SOURCE_MAIN, 'Error message: ' + repr(sys.exc_info()[1]))
+    startupMarks.append(('network tables', time.perf_counter()))
 
     #Read camera settings file
     read_settings_file()
+    startupMarks.append(('camera settings', time.perf_counter()))
 
     #Create field camera stream (to find game pieces)
     if (findBalls == True) or (findMarkers == True):
@@ -257,18 +271,29 @@ def main():
         fieldCamSettings['Brightness'] = cameraValues['FieldCamBrightness']
         fieldCamSettings['Exposure'] = cameraValues['FieldCamExposure']
         fieldCamSettings['FPS'] = cameraValues['FieldCamFPS']
-        fieldCamFilename = videoDirectory + "/FieldCam_001.avi"
-        fieldCamera = FRCWebCam('/dev/v4l/by-path/platform-fd500000.pcie-pci-0000:01:00.0-usb-0:1.1:1.0-video-index0', 
+        fieldCamSettings['Capture'] = cameraValues.get('FieldCamCapture', 'default')
+        fieldCamSettings['Decode'] = cameraValues.get('FieldCamDecode', 'color')
+        fieldCamSettings['DriverBrightness'] = cameraValues.get('FieldCamDriverBrightness', cameraValues['FieldCamBrightness'])
+        fieldCamSettings['DriverExposure'] = cameraValues.get('FieldCamDriverExposure', 'default')
+        fieldCamSettings['VideoDirectory'] = videoDirectory
+        fieldCamFilename = "FieldCam_001"
+        fieldCamera = FRCWebCam(fieldCamDevice, 
                                 'FieldCam',
                                  fieldCamSettings,
-                                 'FieldCam01',
-                                 fieldCamFilename)
+                                 fieldCamFilename,
+                                 telemetry)
         
-        fieldCamWidth = int(cameraValues['FieldCamWidth'])
-        fieldCamHeight = int(cameraValues['FieldCamHeight'])
+        fieldCamWidth = fieldCamera.frame_width
+        fieldCamHeight = fieldCamera.frame_height
         fieldCamFPS = cameraValues['FieldCamFPS']
         fieldResizeFactor = int(cameraValues['FieldCamResizeFactor'])
 
+        #Measure targets from undistorted keypoints instead of undistorting whole frames
+        fieldProjection = FRCProjection(fieldCamWidth, fieldCamHeight, float(cameraValues['FieldCamFOV']),
+                                        fieldCamera.calibration, fieldCamera.decode_scale)
+        fieldCamera.undistort_img = False
+        startupMarks.append(('field camera open', time.perf_counter()))
+
     #Create goal camera stream (to find vision tape marked shooting targets)
     if findGoal == True:
         goalCamSettings = {}
@@ -277,20 +302,77 @@ def main():
         goalCamSettings['Brightness'] = cameraValues['GoalCamBrightness']
         goalCamSettings['Exposure'] = cameraValues['GoalCamExposure']
         goalCamSettings['FPS'] = cameraValues['GoalCamFPS']
-        goalCamFilename = videoDirectory + "/GoalCam_001.avi"
-        goalCamera = FRCWebCam('/dev/v4l/by-path/platform-fd500000.pcie-pci-0000:01:00.0-usb-0:1.2:1.0-video-index0', 
+        goalCamSettings['Capture'] = cameraValues.get('GoalCamCapture', 'default')
+        goalCamSettings['Decode'] = cameraValues.get('GoalCamDecode', 'color')
+        goalCamSettings['DriverBrightness'] = cameraValues.get('GoalCamDriverBrightness', cameraValues['GoalCamBrightness'])
+        goalCamSettings['DriverExposure'] = cameraValues.get('GoalCamDriverExposure', 'default')
+        goalCamSettings['VideoDirectory'] = videoDirectory
+        goalCamSettings['Interleave'] = cameraValues.get('GoalCamInterleave', 0)
+        goalCamSettings['DriverFPS'] = cameraValues.get('GoalCamDriverFPS', 5)
+        goalCamSettings['SettleFrames'] = cameraValues.get('GoalCamSettleFrames', 1)
+        goalCamFilename = "GoalCam_001"
+        goalCamera = FRCWebCam(goalCamDevice, 
                                'GoalCam', 
                                goalCamSettings,
-                               'GoalCam01',
-                               goalCamFilename)
+                               goalCamFilename,
+                               telemetry)
         
-        goalCamWidth = int(cameraValues['GoalCamWidth'])
-        goalCamHeight = int(cameraValues['GoalCamHeight'])
+        goalCamWidth = goalCamera.frame_width
+        goalCamHeight = goalCamera.frame_height
         goalCamFPS = cameraValues['GoalCamFPS']
         goalResizeFactor = int(cameraValues['GoalCamResizeFactor'])
 
+        #Measure targets from undistorted keypoints instead of undistorting whole frames
+        goalProjection = FRCProjection(goalCamWidth, goalCamHeight, float(cameraValues['GoalCamFOV']),
+                                       goalCamera.calibration, goalCamera.decode_scale)
+        goalCamera.undistort_img = False
+        startupMarks.append(('goal camera open', time.perf_counter()))
+
     #Create vision processing
     visionProcessor = VisionLibrary(visionFile)
+    visionProcessor.incremental = incrementalMorphology
+
+    #Spread thresholding over all cores (640x480 and larger frames on more than one core only)
+    if parallelSegmentation == True:
+        from FRCBandSegmentLibrary import FRCBandSegmenter
+        visionProcessor.segmenter = FRCBandSegmenter()
+
+    #Create ball layout classifier (Galactic Search path from the balls in view)
+    if findBalls == True:
+        from FRCBallLayoutLibrary import FRCBallLayout
+        ballLayout = FRCBallLayout(VisionLibrary.layout_values, float(cameraValues['FieldCamFOV']))
+        ballLayoutPublished = False
+
+    #Create frame gates (reuse detections while the view is unchanged)
+    fieldGate = FRCFrameGate()
+    goalGate = FRCFrameGate()
+    startupMarks.append(('vision setup', time.perf_counter()))
+
+    #Define field detection (balls and markers)
+    def detectField(img):
+        fieldResult = [0, [], 0, []]
+        if findBalls == True:
+            fieldResult[0:2] = visionProcessor.detect_game_balls(img, fieldCamWidth,
+                                                                 fieldCamHeight,
+                                                                 float(cameraValues['FieldCamFOV']),
+                                                                 fieldProjection)
+        if findMarkers == True:
+            fieldResult[2:4] = visionProcessor.detect_field_marker(img, fieldCamWidth,
+                                                                   fieldCamHeight,
+                                                                   float(cameraValues['FieldCamFOV']),
+                                                                   fieldProjection)
+        return fieldResult
+
+    #Define goal detection
+    def detectGoal(img):
+        return visionProcessor.detect_tape_rectangle(img, goalCamWidth,
+                                                     goalCamHeight,
+                                                     float(cameraValues['GoalCamFOV']),
+                                                     float(cameraValues['GoalCamFocalLength']) / goalCamera.decode_scale,
+                                                     float(cameraValues['GoalCamMountAngle']),
+                                                     float(cameraValues['GoalCamMountHeight']),
+                                                     goalProjection,
+                                                     findGoalPose)
 
     #Create blank vision image
     imgField = np.zeros(shape=(int(cameraValues['FieldCamWidth']), int(cameraValues['FieldCamHeight']), 3), dtype=np.uint8)
@@ -300,36 +382,68 @@ def main():
     #Start main processing loop
     while (True):
 
+        #Start timing this pass
+        frameNumber += 1
+        loopStart = time.perf_counter()
+
         #######################
         # Find field elements #
         #######################
 
         if (findBalls == True) or (findMarkers == True):
 
-            #Define ball and marker variables
-            ballPatternNumber = 0
-            ballPatternName = ""
+            #Make sure the camera kept its settings (some fall back to auto exposure)
+            if frameNumber % cameraCheckFrames == 0:
+                fieldCamera.check_controls()
 
             #Read frame from camera
+            stageStart = time.perf_counter()
             imgField = fieldCamera.read_frame()
-
-            #Call detection methods
-            if findBalls == True:
-                ballsFound, ballData = visionProcessor.detect_game_balls(imgField, int(cameraValues['FieldCamWidth']),
-                                                                        int(cameraValues['FieldCamHeight']),
-                                                                        float(cameraValues['FieldCamFOV']))
-            if findMarkers == True:
-                markersFound, markerData = visionProcessor.detect_field_marker(imgField, int(cameraValues['FieldCamWidth']),
-                                                                        int(cameraValues['FieldCamHeight']),
-                                                                        float(cameraValues['FieldCamFOV']))
+            fieldFrameTime = fieldCamera.frame_time
+            telemetry.log_timing(SOURCE_FIELDCAM, STAGE_READ, frameNumber, time.perf_counter() - stageStart)
+            stageStart = time.perf_counter()
+
+            #Call detection methods (skipped when the frame has not changed)
+            if gateFrames == True:
+                fieldRate = navx.get_rate_at(fieldFrameTime) if useNavx == True else None
+                ballsFound, ballData, markersFound, markerData = fieldGate.process(imgField, detectField, fieldRate)
+            else:
+                ballsFound, ballData, markersFound, markerData = detectField(imgField)
+            fieldReused = fieldGate.reused if gateFrames == True else False
+            telemetry.log_timing(SOURCE_FIELDCAM, STAGE_DETECT, frameNumber, time.perf_counter() - stageStart)
+            stageStart = time.perf_counter()
+
+            #Find field relative bearings and log detections
+            for i, ball in enumerate(ballData):
+                ball['bearing'] = getFieldBearing(navx, fieldFrameTime, ball['angle']) if useNavx == True else 0
+                telemetry.log_detection(SOURCE_FIELDCAM, TARGET_BALL, frameNumber, fieldFrameTime,
+                                        (1, 0, i, ball['distance'], ball['angle'], ball['offset'], ball['bearing'],
+                                         ball['x'], ball['y'], 2 * ball['radius'], 2 * ball['radius'], ball['percent']))
+            for i, marker in enumerate(markerData):
+                marker['bearing'] = getFieldBearing(navx, fieldFrameTime, marker['angle']) if useNavx == True else 0
+                telemetry.log_detection(SOURCE_FIELDCAM, TARGET_MARKER, frameNumber, fieldFrameTime,
+                                        (1, 0, i, marker['distance'], marker['angle'], marker['offset'], marker['bearing'],
+                                         marker['x'], marker['y'], marker['w'], marker['h'], marker['percent']))
+
+            #Tell consumers when the field values came from the last processed frame
+            if networkTablesConnected == True:
+                visionTable.putBoolean("FieldReused", fieldReused)
+
+            #Vote on the ball layout (reused frames add nothing new) and publish it once decided
+            if findBalls == True and ballLayoutPublished == False:
+                if fieldReused == False and ballLayout.update(ballData, fieldFrameTime) == True:
+                    ballPatternNumber, ballPatternName = ballLayout.layout()
+                    telemetry.log_message(SOURCE_FIELDCAM, 'Ball layout %s decided in %.2f s (confident: %s)' %
+                                          (ballPatternName, ballLayout.decisionTime, ballLayout.confident))
+                    if networkTablesConnected == True:
+                        visionTable.putNumber("BallLayoutNum", ballPatternNumber)
+                        visionTable.putString("BallLayoutName", ballPatternName)
+                        visionTable.putBoolean("BallLayoutConfident", ballLayout.confident)
+                    ballLayoutPublished = True
 
             #Draw ball contours and target data on the image
             if ballsFound > 0:
 
-                #Detect ball pattern
-                #ballPatternNumber, ballPatternName = determineBallPattern(1, ballData[0]['x'], ballData[0]['distance'], ballData[0]['angle'])
-
-                
                 #Loop over found balls and process data
                 i = 0
                 for ball in ballData:
@@ -339,12 +453,12 @@ def main():
                         #Write ball data to network table
                         if networkTablesConnected == True:
                             visionTable.putBoolean("FoundBall", bool(ballsFound > 0))
-                            visionTable.putNumber("BallLayoutNum", ballPatternNumber)
-                            visionTable.putString("BallLayoutName", ballPatternName)
                             visionTable.putNumber("BallDistance" + str(i), ball['distance'])
                             visionTable.putNumber("BallAngle" + str(i), ball['angle'])
                             visionTable.putNumber("BallScreenPercent" + str(i), ball['percent'])
                             visionTable.putNumber("BallOffset" + str(i), ball['offset'])
+                            if useNavx == True:
+                                visionTable.putNumber("BallBearing" + str(i), ball['bearing'])
 
                         if i == 0:
                             cv.circle(imgField, (int(ball['x']), int(ball['y'])), int(ball['radius']), (0, 0, 255), 2)
@@ -385,8 +499,12 @@ def main():
                         visionTable.putNumber("MarkerAngle" + str(i), marker['angle'])
                         visionTable.putNumber("MarkerScreenPercent" + str(i), marker['percent'])
                         visionTable.putNumber("MarkerOffset" + str(i), marker['offset'])
+                        if useNavx == True:
+                            visionTable.putNumber("MarkerBearing" + str(i), marker['bearing'])
 
                     i += 1
+            telemetry.log_timing(SOURCE_FIELDCAM, STAGE_PUBLISH, frameNumber, time.perf_counter() - stageStart)
+            stageStart = time.perf_counter()
 
             #Determine if image should be resized before showing and saving
             if resizeVideo:
@@ -407,10 +525,19 @@ def main():
 
             if (saveVideo == 1) or (saveVideo == True):
 
-                if resizeVideo:
-                    fieldCamera.write_video(imgFieldResize)
-                else:
-                    fieldCamera.write_video(imgField)
+                #Link the frame to the closest ball or marker
+                fieldFrameData = {'time': fieldFrameTime}
+                fieldTargets = ballData if findBalls == True else markerData
+                if len(fieldTargets) > 0:
+                    fieldFrameData['found'] = True
+                    fieldFrameData['distance'] = fieldTargets[0]['distance']
+                    fieldFrameData['angle'] = fieldTargets[0]['angle']
+                    fieldFrameData['offset'] = fieldTargets[0]['offset']
+                    fieldFrameData['bearing'] = fieldTargets[0]['bearing']
+
+                #Record at the size the writer was opened with (the resized copy is for display only)
+                fieldCamera.write_video(imgField, fieldFrameData)
+            telemetry.log_timing(SOURCE_FIELDCAM, STAGE_VIDEO, frameNumber, time.perf_counter() - stageStart)
                 
 
         #####################
@@ -419,17 +546,46 @@ def main():
 
         if findGoal == True:
 
+            #Switch camera profile when asked (driver view uses auto exposure)
+            if (networkTablesConnected == True) and (goalCamera.interleave == False):
+                goalProfile = visionTable.getString("GoalCamProfile", "tracking")
+                if (goalProfile in goalCamera.control.profiles) and (goalProfile != goalCamera.control.profile):
+                    goalCamera.set_profile(goalProfile)
+                    goalGate.reset()
+
+            #Make sure the camera kept its settings (some fall back to auto exposure)
+            if frameNumber % cameraCheckFrames == 0:
+                goalCamera.check_controls()
+
             #Read frame from camera
-            imgGoal = goalCamera.read_frame()
+            stageStart = time.perf_counter()
+            if goalCamera.interleave == True:
+                imgGoal = goalCamera.read_frame_interleaved()
+            else:
+                imgGoal = goalCamera.read_frame()
+            goalFrameTime = goalCamera.frame_time
+            telemetry.log_timing(SOURCE_GOALCAM, STAGE_READ, frameNumber, time.perf_counter() - stageStart)
+            stageStart = time.perf_counter()
             imgBlankRaw = np.zeros(shape=(int(cameraValues['GoalCamWidth']), int(cameraValues['GoalCamHeight']), 3), dtype=np.uint8)
 
-            #Call detection method
-            tapeCameraValues, tapeRealWorldValues, foundTape, tapeTargetLock, rect, box = visionProcessor.detect_tape_rectangle(imgGoal, int(cameraValues['GoalCamWidth']),
-                                                                                                                            int(cameraValues['GoalCamHeight']),
-                                                                                                                            float(cameraValues['GoalCamFOV']),
-                                                                                                                            float(cameraValues['GoalCamFocalLength']),
-                                                                                                                            float(cameraValues['GoalCamMountAngle']),
-                                                                                                                            float(cameraValues['GoalCamMountHeight']))
+            #Call detection method (skipped when the frame has not changed)
+            if gateFrames == True:
+                goalRate = navx.get_rate_at(goalFrameTime) if useNavx == True else None
+                tapeCameraValues, tapeRealWorldValues, foundTape, tapeTargetLock, rect, box = goalGate.process(imgGoal, detectGoal, goalRate)
+            else:
+                tapeCameraValues, tapeRealWorldValues, foundTape, tapeTargetLock, rect, box = detectGoal(imgGoal)
+            tapeReused = goalGate.reused if gateFrames == True else False
+            telemetry.log_timing(SOURCE_GOALCAM, STAGE_DETECT, frameNumber, time.perf_counter() - stageStart)
+            stageStart = time.perf_counter()
+
+            #Find field relative bearing and log detection
+            tapeBearing = 0
+            if foundTape == True and useNavx == True:
+                tapeBearing = getFieldBearing(navx, goalFrameTime, tapeRealWorldValues['HAngle'])
+            telemetry.log_detection(SOURCE_GOALCAM, TARGET_TAPE, frameNumber, goalFrameTime,
+                                    (foundTape, tapeTargetLock, 0, tapeRealWorldValues['TapeDistance'], tapeRealWorldValues['HAngle'],
+                                     tapeCameraValues['Offset'], tapeBearing, tapeCameraValues['TargetX'], tapeCameraValues['TargetY'],
+                                     tapeCameraValues['TargetW'], tapeCameraValues['TargetH'], 0))
 
             #Draw vision tape contours and target data on the image
             if foundTape == True:
@@ -453,15 +609,30 @@ def main():
                 #Write target data to network table
                 if networkTablesConnected == True:
                     visionTable.putBoolean("FoundTape", foundTape)
+                    visionTable.putBoolean("TapeReused", tapeReused)
                     visionTable.putBoolean("TargetLock", tapeTargetLock)
                     visionTable.putNumber("TapeDistance", tapeRealWorldValues['TapeDistance'])
                     visionTable.putNumber("TapeOffset", tapeCameraValues['Offset'])
+                    if useNavx == True:
+                        visionTable.putNumber("TapeBearing", tapeBearing)
+                    visionTable.putBoolean("TapePoseFound", tapeRealWorldValues['PoseFound'])
+                    if tapeRealWorldValues['PoseFound'] == True:
+                        visionTable.putNumber("TapePoseX", tapeRealWorldValues['PoseX'])
+                        visionTable.putNumber("TapePoseZ", tapeRealWorldValues['PoseZ'])
+                        visionTable.putNumber("TapePoseYaw", tapeRealWorldValues['PoseYaw'])
+                        visionTable.putBoolean("TapePoseAmbiguous", tapeRealWorldValues['PoseAmbiguous'])
             else:
                 if networkTablesConnected == True:
                     visionTable.putBoolean("FoundTape", foundTape)
+                    visionTable.putBoolean("TapeReused", tapeReused)
                     visionTable.putBoolean("TargetLock", tapeTargetLock)
                     visionTable.putNumber("TapeDistance", 0)
                     visionTable.putNumber("TapeOffset", 0)
+                    if useNavx == True:
+                        visionTable.putNumber("TapeBearing", 0)
+                    visionTable.putBoolean("TapePoseFound", False)
+            telemetry.log_timing(SOURCE_GOALCAM, STAGE_PUBLISH, frameNumber, time.perf_counter() - stageStart)
+            stageStart = time.perf_counter()
 
             #Determine if image should be resized before showing and saving
             if resizeVideo:
@@ -476,6 +647,8 @@ def main():
                 else:
                     cv.imshow("Goal", imgGoal)
                 cv.imshow("Data", imgBlankRaw)
+                if goalCamera.driver_frame is not None:
+                    cv.imshow("Driver", goalCamera.driver_frame)
 
             #Save video to a file (if enabled)
             if networkTablesConnected:
@@ -483,10 +656,24 @@ def main():
 
             if (saveVideo == 1) or (saveVideo == True):
 
-                if resizeVideo:
-                    goalCamera.write_video(imgGoalResize)
+                #Link the frame to the published tape values
+                goalFrameData = {'time': goalFrameTime,
+                                 'found': foundTape,
+                                 'lock': tapeTargetLock,
+                                 'distance': tapeRealWorldValues['TapeDistance'],
+                                 'angle': tapeRealWorldValues['HAngle'],
+                                 'offset': tapeCameraValues['Offset'],
+                                 'bearing': tapeBearing}
+
+                #Interleaved cameras record only the bright driver frames (frames are recorded at
+                #the size the writer was opened with, the resized copy is for display only)
+                if goalCamera.interleave == True:
+                    if goalCamera.driver_frame is not None:
+                        goalFrameData['time'] = goalCamera.driver_frame_time
+                        goalCamera.write_video(goalCamera.driver_frame, goalFrameData)
                 else:
-                    goalCamera.write_video(imgGoal)
+                    goalCamera.write_video(imgGoal, goalFrameData)
+            telemetry.log_timing(SOURCE_GOALCAM, STAGE_VIDEO, frameNumber, time.perf_counter() - stageStart)
                 
 
         #####################
@@ -510,6 +697,28 @@ def main():
         if networkTablesConnected == True:
             navxTable.putNumber("GyroAngle", gyroAngle)
 
+        #Log time for this pass
+        telemetry.log_timing(SOURCE_MAIN, STAGE_LOOP, frameNumber, time.perf_counter() - loopStart)
+
+        #Report time spent in each startup phase once the first frame is through
+        if (frameNumber == 1) and (profileStartup == True):
+            startupMarks.append(('first frame', time.perf_counter()))
+            for i in range(1, len(startupMarks)):
+                phaseMessage = 'Startup %-18s %8.1f ms' % (startupMarks[i][0], 1000 * (startupMarks[i][1] - startupMarks[i - 1][1]))
+                print(phaseMessage)
+                telemetry.log_message(SOURCE_MAIN, phaseMessage)
+            phaseMessage = 'Startup %-18s %8.1f ms' % ('total', 1000 * (startupMarks[-1][1] - startupMarks[0][1]))
+            print(phaseMessage)
+            telemetry.log_message(SOURCE_MAIN, phaseMessage)
+
+        #Measure time from start or enable to the first valid detection
+        if firstDetectionPending == True and ((ballsFound > 0) or (markersFound > 0) or (foundTape == True)):
+            firstDetectionTime = time.monotonic() - resumeTime
+            telemetry.log_message(SOURCE_MAIN, 'First detection %.1f ms after enable' % (1000 * firstDetectionTime))
+            if networkTablesConnected == True:
+                visionTable.putNumber("FirstDetectionTime", 1000 * firstDetectionTime)
+            firstDetectionPending = False
+
         #################################
         # Check for stopping conditions #
         #################################
@@ -519,10 +728,54 @@ def main():
             if cv.waitKey(1) == 27:
                 break
 
-        #Check for stop code from network tables
+        #Check for stop code from network tables (service mode idles on 1 and exits on 2)
         if networkTablesConnected == True: 
             robotStop = visionTable.getNumber("RobotStop", 0)
-            if (robotStop == 1) or (networkTablesConnected == False):
+            if (robotStop == 1) and (serviceMode == True):
+
+                #Idle with cameras streaming, calibration loaded and the table connected
+                #(gyro samples are still taken for heading history but not logged)
+                telemetry.log_message(SOURCE_MAIN, 'Pipeline idle')
+                if useNavx == True:
+                    navx.logSamples = False
+                visionTable.putBoolean("VisionIdle", True)
+                while robotStop == 1:
+                    idleStart = time.monotonic()
+                    if (findBalls == True) or (findMarkers == True):
+                        fieldCamera.idle_frame()
+                    if findGoal == True:
+                        goalCamera.idle_frame()
+                    idleWait = idleGrabPeriod - (time.monotonic() - idleStart)
+                    if idleWait > 0:
+                        sleep(idleWait)
+                    robotStop = visionTable.getNumber("RobotStop", 0)
+
+                #Resume with nothing carried over from the last match
+                if robotStop != 2:
+
+                    #Start a new telemetry log, the current one has a fixed size
+                    runNumber += 1
+                    telemetry.log_message(SOURCE_MAIN, 'Run continues in a new log')
+                    telemetry.rotate(getLogFilename(navx, runNumber))
+                    telemetry.log_message(SOURCE_MAIN, 'Run %d started on %s' % (runNumber, datetime.datetime.now()))
+                    if useNavx == True:
+                        navx.logSamples = True
+
+                    resumeTime = time.monotonic()
+                    firstDetectionPending = True
+                    fieldGate.reset()
+                    goalGate.reset()
+                    if findBalls == True:
+                        ballLayout.reset()
+                        ballLayoutPublished = False
+                    if (findBalls == True) or (findMarkers == True):
+                        fieldCamera.check_controls()
+                    if findGoal == True:
+                        goalCamera.check_controls()
+                    visionTable.putBoolean("VisionIdle", False)
+                    telemetry.log_message(SOURCE_MAIN, 'Pipeline resumed')
+
+            if (robotStop == 2) or ((robotStop == 1) and (serviceMode == False)):
                 break
 
         #Pause before next analysis
@@ -540,11 +793,22 @@ def main():
     if findGoal == True:
         goalCamera.release_cam()
 
-    #Close the log file
-    log_file.write('Run stopped on %s.' % datetime.datetime.now())
-    log_file.close()
+    #Stop Navx sampling
+    if useNavx == True:
+        navx.stop_navx_thread()
+
+    #Close the telemetry log
+    telemetry.log_message(SOURCE_MAIN, 'Run stopped on %s' % datetime.datetime.now())
+    telemetry.close()
 
 
 #define main function
 if __name__ == '__main__':
+
+    #Parse command line options
+    parser = argparse.ArgumentParser(description='Team 4121 vision and motion processing')
+    parser.add_argument('--profile-startup', action='store_true', help='report time spent in each startup phase')
+    args = parser.parse_args()
+    profileStartup = profileStartup or args.profile_startup
+
     main()
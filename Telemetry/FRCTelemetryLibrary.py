@@ -0,0 +1,284 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/env python3
+
+####################################################################
+#                                                                  #
+#                     FRC Telemetry Library                        #
+#                                                                  #
+#  This class provides a compact binary telemetry log for vision   #
+#  and motion processing.  Every record is a fixed 64 byte block   #
+#  (detections, gyro samples, stage timings or messages).  Long    #
+#  messages run on in continuation records written together.       #
+#  Records are packed by the caller and copied into a memory       #
+#  mapped, preallocated file by a background writer thread so the  #
+#  processing loop never waits on disk I/O.  A long running        #
+#  process can rotate to a new file, for example once per match.   #
+#                                                                  #
+#  @Version: 1.0                                                   #
+#  @Created: 2021-03-22                                            #
+#  @Author: Team 4121                                              #
+#                                                                  #
+####################################################################
+
+'''FRC Telemetry Library - Provides binary telemetry logging'''
+
+# System imports
+import os
+import mmap
+import struct
+import time
+import logging
+
+# Module imports
+import numpy as np
+from queue import SimpleQueue
+from threading import Thread
+
+# File layout
+file_magic = b'T4121TLM'
+file_version = 1
+header_struct = struct.Struct('<8sIIQQ')  # magic, version, record size, capacity, count
+header_size = 64
+
+# Record layout (type, source, code, frame, time, 12 values)
+record_struct = struct.Struct('<BBHId12f')
+message_struct = struct.Struct('<BBHId48s')
+message_size = 48
+record_size = record_struct.size
+record_dtype = np.dtype([('type', 'u1'), ('source', 'u1'), ('code', '<u2'),
+                         ('frame', '<u4'), ('time', '<f8'), ('values', '<f4', (12,))])
+
+# Record types (zero marks an unused record)
+RECORD_MESSAGE = 1
+RECORD_DETECTION = 2
+RECORD_GYRO = 3
+RECORD_TIMING = 4
+record_names = {RECORD_MESSAGE: 'messages', RECORD_DETECTION: 'detections',
+                RECORD_GYRO: 'gyro', RECORD_TIMING: 'timing'}
+
+# Record sources
+SOURCE_MAIN = 0
+SOURCE_CAMERA = 1
+SOURCE_NAVX = 2
+SOURCE_FIELDCAM = 3
+SOURCE_GOALCAM = 4
+source_names = {SOURCE_MAIN: 'main', SOURCE_CAMERA: 'camera', SOURCE_NAVX: 'navx',
+                SOURCE_FIELDCAM: 'fieldcam', SOURCE_GOALCAM: 'goalcam'}
+
+# Timing stages
+STAGE_LOOP = 0
+STAGE_READ = 1
+STAGE_DETECT = 2
+STAGE_PUBLISH = 3
+STAGE_VIDEO = 4
+stage_names = {STAGE_LOOP: 'loop', STAGE_READ: 'read', STAGE_DETECT: 'detect',
+               STAGE_PUBLISH: 'publish', STAGE_VIDEO: 'video'}
+
+# Detection targets
+TARGET_BALL = 1
+TARGET_MARKER = 2
+TARGET_TAPE = 3
+target_names = {TARGET_BALL: 'ball', TARGET_MARKER: 'marker', TARGET_TAPE: 'tape'}
+
+# Value names for each record type
+detection_fields = ('found', 'lock', 'index', 'distance', 'angle', 'offset',
+                    'bearing', 'x', 'y', 'w', 'h', 'percent')
+gyro_fields = ('angle', 'yaw', 'pitch')
+timing_fields = ('milliseconds',)
+
+
+# Define the telemetry logger class
+class FRCTelemetry:
+
+    # Define initialization
+    def __init__(self, filename, capacity=262144):
+
+        # Store file values and open the log file
+        self.capacity = int(capacity)
+        self.open_file(filename)
+
+        # Start background writer
+        self.queue = SimpleQueue()
+        self.stopped = False
+        self.writerThread = Thread(target=self.update, name='Telemetry', args=())
+        self.writerThread.daemon = True
+        self.writerThread.start()
+
+
+    # Define file open method (creates, preallocates and maps the log file)
+    def open_file(self, filename):
+
+        # Create and preallocate the log file
+        self.filename = filename
+        self.count = 0
+        self.dropped = 0
+        fileSize = header_size + self.capacity * record_size
+        self.fd = os.open(filename, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+        os.ftruncate(self.fd, fileSize)
+        if hasattr(os, 'posix_fallocate'):
+            try:
+                os.posix_fallocate(self.fd, 0, fileSize)
+            except OSError:
+                pass
+
+        # Memory map the file and write the header
+        self.map = mmap.mmap(self.fd, fileSize)
+        self.write_header()
+
+
+    # Define file close method (finalizes the header and releases the file)
+    def close_file(self):
+
+        self.write_header()
+        self.map.flush()
+        self.map.close()
+        os.close(self.fd)
+
+
+    # Define header write method
+    def write_header(self):
+
+        self.map[0:header_struct.size] = header_struct.pack(file_magic, file_version, record_size,
+                                                            self.capacity, self.count)
+
+
+    # Define threaded writer method
+    def update(self):
+
+        # Main thread loop
+        while True:
+
+            # Wait for next packed record (None means stop, a filename means rotate)
+            record = self.queue.get()
+            if record is None:
+                return
+            if isinstance(record, str):
+                self.close_file()
+                self.open_file(record)
+                continue
+
+            # Copy records into the map (a long message is written whole or dropped whole)
+            records = len(record) // record_size
+            if self.count + records <= self.capacity:
+                offset = header_size + self.count * record_size
+                self.map[offset:offset + len(record)] = record
+                self.count += records
+
+                # Keep the header count current so a crashed run is still readable
+                if self.count % 256 < records:
+                    self.write_header()
+            else:
+                self.dropped += records
+
+
+    # Define rotate method (records logged after this go to a new file)
+    def rotate(self, filename):
+
+        self.queue.put(str(filename))
+
+
+    # Define message logging method (the code holds how many continuation records follow)
+    def log_message(self, source, message, timestamp=None):
+
+        if timestamp is None:
+            timestamp = time.monotonic()
+        text = str(message).encode('utf-8', 'replace')
+        parts = max(1, (len(text) + message_size - 1) // message_size)
+        self.queue.put(b''.join(message_struct.pack(RECORD_MESSAGE, source, parts - 1 - i, 0, timestamp,
+                                                    text[i * message_size:(i + 1) * message_size])
+                                for i in range(parts)))
+
+
+    # Define detection logging method (values in detection_fields order)
+    def log_detection(self, source, target, frame, timestamp, values):
+
+        values = list(values[0:12]) + [0.0] * (12 - len(values))
+        self.queue.put(record_struct.pack(RECORD_DETECTION, source, target, frame, timestamp, *values))
+
+
+    # Define gyro sample logging method
+    def log_gyro(self, timestamp, angle, yaw, pitch):
+
+        self.queue.put(record_struct.pack(RECORD_GYRO, SOURCE_NAVX, 0, 0, timestamp,
+                                          angle, yaw, pitch, 0, 0, 0, 0, 0, 0, 0, 0, 0))
+
+
+    # Define stage timing logging method
+    def log_timing(self, source, stage, frame, seconds, timestamp=None):
+
+        if timestamp is None:
+            timestamp = time.monotonic()
+        self.queue.put(record_struct.pack(RECORD_TIMING, source, stage, frame, timestamp,
+                                          1000.0 * seconds, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0, 0))
+
+
+    # Define close method
+    def close(self):
+
+        # Stop writer after it drains the queue
+        if self.stopped is False:
+            self.stopped = True
+            self.queue.put(None)
+            self.writerThread.join()
+
+            # Finalize header and release file
+            self.close_file()
+
+        return self.count, self.dropped
+
+
+# Define message routing function (telemetry if available, otherwise logging)
+def log_message(telemetry, source, message):
+
+    if telemetry is not None:
+        telemetry.log_message(source, message)
+    else:
+        logging.info(str(message))
+
+
+# Define telemetry file read function
+def read_telemetry_file(filename):
+
+    # Read header
+    with open(filename, 'rb') as in_file:
+        magic, version, size, capacity, count = header_struct.unpack(in_file.read(header_struct.size))
+    if magic != file_magic or size != record_size:
+        raise ValueError('Not a telemetry file: ' + filename)
+
+    # Map records without copying
+    records = np.memmap(filename, dtype=record_dtype, mode='r', offset=header_size, shape=(capacity,))
+
+    # Recover count from the records if the run didn't close the file
+    used = np.flatnonzero(records['type'] == 0)
+    if len(used) > 0:
+        count = max(count, int(used[0]))
+    else:
+        count = capacity
+
+    return records[0:count]
+
+
+# Define message decode function (text of one record)
+def decode_message(record):
+
+    text = record.tobytes()[16:64]
+    return text.split(b'\x00', 1)[0].decode('utf-8', 'replace')
+
+
+# Define messages decode function (first record and full text of each message)
+def decode_messages(records):
+
+    selected = records[records['type'] == RECORD_MESSAGE]
+    first = []
+    texts = []
+    i = 0
+    while i < len(selected):
+
+        # Continuation records follow their first record (counting down to zero)
+        parts = int(selected[i]['code']) + 1
+        text = b''.join(r.tobytes()[16:64].split(b'\x00', 1)[0] for r in selected[i:i + parts])
+        first.append(i)
+        texts.append(text.decode('utf-8', 'replace'))
+        i += parts
+
+    return selected[first], texts
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/env python3
+
+####################################################################
+#                                                                  #
+#                  FRC Synthetic Frame Library                     #
+#                                                                  #
+#  This class renders camera frames with game balls, field         #
+#  markers and the vision tape goal placed at known positions so   #
+#  the vision detectors can be benchmarked and checked without a   #
+#  camera.  Targets are drawn through the same pinhole camera      #
+#  model (mount height and tilt included) that FRCProjection uses, #
+#  in the middle of each target's HSV range from the vision        #
+#  settings.  Background texture and sensor noise are adjustable.  #
+#                                                                  #
+#  @Version: 1.0                                                   #
+#  @Created: 2021-03-27                                            #
+#  @Author: Team 4121                                              #
+#                                                                  #
+####################################################################
+
+'''FRC Synthetic Frame Library - Renders frames with known targets'''
+
+# System imports
+import math
+
+# Module Imports
+import cv2 as cv
+import numpy as np
+
+# Team 4121 module imports
+from FRCVisionLibrary import VisionLibrary
+from FRCProjectionLibrary import FRCProjection
+
+
+# Define HSV range center color method (returns BGR)
+def range_color(values):
+
+    hsv = [(int(values[lo]) + int(values[hi])) // 2 for lo, hi in (('HMIN', 'HMAX'), ('SMIN', 'SMAX'), ('VMIN', 'VMAX'))]
+    return tuple(int(c) for c in cv.cvtColor(np.uint8([[hsv]]), cv.COLOR_HSV2BGR)[0, 0])
+
+
+# Define the synthetic camera class
+class FRCSyntheticCamera:
+
+    # Define initialization
+    def __init__(self, vision, width, height, fov, mountAngle=0.0, mountHeight=0.0, seed=0):
+
+        # Store camera values
+        self.vision = vision
+        self.width = int(width)
+        self.height = int(height)
+        self.fov = fov
+        self.mountAngle = mountAngle
+        self.mountHeight = mountHeight
+        self.projection = FRCProjection(width, height, fov)
+        self.random = np.random.default_rng(seed)
+
+        # Camera tilt (level frame -> camera frame, camera pitched up)
+        tilt = math.radians(mountAngle)
+        self.levelToCamera = np.array([[1, 0, 0],
+                                       [0, math.cos(tilt), math.sin(tilt)],
+                                       [0, -math.sin(tilt), math.cos(tilt)]])
+
+        # Target colors from the vision settings
+        self.ballColor = range_color(VisionLibrary.ball_values)
+        self.markerColor = range_color(VisionLibrary.marker_values)
+        self.tapeColor = range_color(VisionLibrary.tape_values)
+
+
+    # Define point projection method (x right, y up from the floor, z forward; inches)
+    def project(self, points):
+
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 3)
+        level = np.column_stack((points[:, 0], self.mountHeight - points[:, 1], points[:, 2]))
+        camera = level @ self.levelToCamera.T
+        pixels = camera[:, 0:2] / camera[:, 2:3]
+        pixels = pixels * self.projection.cam_matrix[0, 0] + self.projection.cam_matrix[0:2, 2]
+        return pixels, camera[:, 2]
+
+
+    # Define background method (low frequency texture)
+    def background(self, texture=20):
+
+        base = self.random.normal(70, texture, (self.height // 16 + 1, self.width // 16 + 1, 3))
+        base[:, :, 1] = base[:, :, 0] + self.random.normal(0, texture / 4, base.shape[0:2])
+        base[:, :, 2] = base[:, :, 0] + self.random.normal(0, texture / 4, base.shape[0:2])
+        img = cv.resize(np.clip(base, 0, 255).astype(np.uint8), (self.width, self.height),
+                        interpolation=cv.INTER_CUBIC)
+        return img
+
+
+    # Define sensor noise method
+    def add_noise(self, img, sigma):
+
+        if sigma <= 0:
+            return img
+        noise = self.random.normal(0, sigma, img.shape)
+        return np.clip(img.astype(np.float32) + noise, 0, 255).astype(np.uint8)
+
+
+    # Define ball drawing method (ball resting on the floor)
+    def draw_ball(self, img, lateral, distance):
+
+        radius = float(VisionLibrary.ball_values['RADIUS'])
+        pixels, depth = self.project([(lateral, radius, distance)])
+        pixelRadius = self.projection.cam_matrix[0, 0] * radius / depth[0]
+        cv.circle(img, tuple(int(round(16 * p)) for p in pixels[0]), int(round(16 * pixelRadius)),
+                  self.ballColor, -1, cv.LINE_AA, 4)
+
+        return {'x': float(pixels[0, 0]), 'y': float(pixels[0, 1]), 'radius': float(pixelRadius),
+                'distance': math.hypot(lateral, distance),
+                'angle': math.degrees(math.atan2(lateral, distance)), 'offset': -lateral}
+
+
+    # Define field marker drawing method (upright marker facing the camera)
+    def draw_marker(self, img, lateral, distance):
+
+        width = float(VisionLibrary.marker_values['WIDTH'])
+        height = float(VisionLibrary.marker_values['HEIGHT'])
+        corners = [(lateral - width / 2, height, distance), (lateral + width / 2, height, distance),
+                   (lateral + width / 2, 0, distance), (lateral - width / 2, 0, distance)]
+        pixels, depth = self.project(corners)
+        cv.fillPoly(img, [np.round(pixels * 16).astype(np.int32)], self.markerColor, cv.LINE_AA, 4)
+
+        x, y = pixels.min(axis=0)
+        w, h = pixels.max(axis=0) - (x, y)
+        return {'x': float(x), 'y': float(y), 'w': float(w), 'h': float(h),
+                'distance': math.hypot(lateral, distance),
+                'angle': math.degrees(math.atan2(lateral, distance)), 'offset': -lateral}
+
+
+    # Define tape drawing method (goal outline, robot turned by yaw degrees)
+    def draw_tape(self, img, lateral, distance, yaw=0.0, topHeight=98.25, lineWidth=2.0):
+
+        # Tape corners in the goal frame (top center origin, y down, z into the wall)
+        outer = self.vision.tape_model_points()
+        inner = outer.copy()
+        inner[:, 0] *= (np.abs(outer[:, 0]) - lineWidth) / np.abs(outer[:, 0])
+        inner[0:2, 1] += lineWidth
+        inner[2:4, 1] -= lineWidth
+
+        # Goal frame -> robot level frame (x right, y up, z forward)
+        a = math.radians(yaw)
+        turn = np.array([[math.cos(a), 0, -math.sin(a)], [0, 1, 0], [math.sin(a), 0, math.cos(a)]])
+        for points, color in ((outer, self.tapeColor), (inner, None)):
+            goal = np.column_stack((points[:, 0] - lateral, topHeight - points[:, 1], points[:, 2] + distance))
+            pixels, depth = self.project(goal @ turn.T)
+            if color is None:
+                color = tuple(int(c) for c in img[min(max(int(pixels[:, 1].mean()), 0), self.height - 1),
+                                                  min(max(int(pixels[:, 0].mean()), 0), self.width - 1)])
+            cv.fillPoly(img, [np.round(pixels * 16).astype(np.int32)], color, cv.LINE_AA, 4)
+
+        # True goal position and yaw in the robot level frame
+        center = turn @ np.array([-lateral, 0.0, distance])
+        return {'x': float(center[0]), 'z': float(center[2]), 'yaw': -yaw,
+                'distance': math.hypot(center[0], center[2]),
+                'angle': math.degrees(math.atan2(center[0], center[2])), 'offset': -float(center[0])}
+
+
+    # Define frame rendering method (positions are (lateral, distance) in inches)
+    def render(self, balls=(), markers=(), tape=None, noise=0.0, texture=20):
+
+        img = self.background(texture)
+        truth = {'balls': [], 'markers': [], 'tape': None}
+
+        # Draw farthest targets first so nearer ones cover them
+        for lateral, distance in sorted(balls, key=lambda b: -b[1]):
+            truth['balls'].insert(0, self.draw_ball(img, lateral, distance))
+        for lateral, distance in sorted(markers, key=lambda m: -m[1]):
+            truth['markers'].insert(0, self.draw_marker(img, lateral, distance))
+        if tape is not None:
+            truth['tape'] = self.draw_tape(img, *tape)
+
+        return self.add_noise(img, noise), truth
@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/env python3
+
+####################################################################
+#                                                                  #
+#                    FRC Ball Layout Test App                      #
+#                                                                  #
+#  This program checks the Galactic Search layout classifier.      #
+#  Each path is rendered from start poses moved off the nominal    #
+#  one, frames are run through detect_game_balls, and the balls    #
+#  found are voted on until a layout is decided.  Some frames      #
+#  lose a ball, as when one hides another or is missed.  Reports   #
+#  correct and confident decisions, the time to decide in camera   #
+#  time, and the cost of scoring a frame against every layout.     #
+#                                                                  #
+#  Usage: TestBallLayoutApp.py [--settings file] [--runs n]        #
+#                                                                  #
+#  @Version: 1.0                                                   #
+#  @Created: 2021-04-03                                            #
+#  @Author: Team 4121                                              #
+#                                                                  #
+####################################################################
+
+"""Ball layout classifier test application"""
+
+# System imports
+import sys
+import math
+import time
+import argparse
+
+# Setup paths
+sys.path.append('/home/pi/Team4121/Libraries')
+
+# Module imports
+import numpy as np
+
+# Team 4121 module imports
+from FRCVisionLibrary import VisionLibrary
+from FRCBallLayoutLibrary import FRCBallLayout, field_position, galactic_search_layouts
+from FRCSyntheticFrameLibrary import FRCSyntheticCamera
+
+# Set test values
+visionFile = '/home/pi/Team4121/Config/2021VisionSettings.txt'
+imageWidth = 320
+imageHeight = 240
+cameraFOV = 27.3
+cameraFPS = 15.0
+poseError = (6.0, 12.0, 3.0)
+dropRate = 0.15
+maxFrames = 45
+
+
+# Define ball placement method (field cells -> lateral and distance from a start pose)
+def place_balls(cells, startX, startY, heading):
+
+    balls = []
+    a = math.radians(heading)
+    for cell in cells:
+        x, y = field_position(cell)
+        ahead = x - startX
+        right = y - startY
+        balls.append((right * math.cos(a) - ahead * math.sin(a), ahead * math.cos(a) + right * math.sin(a)))
+
+    return balls
+
+
+# Define run method (returns layout number, confident flag and decision time, or None)
+def run_layout(vision, camera, random, layout, cells):
+
+    values = VisionLibrary.layout_values
+    startX = float(values.get('STARTX', 30.0)) + random.uniform(-poseError[0], poseError[0])
+    startY = float(values.get('STARTY', 0.0)) + random.uniform(-poseError[1], poseError[1])
+    heading = float(values.get('STARTHEADING', 0.0)) + random.uniform(-poseError[2], poseError[2])
+    balls = place_balls(cells, startX, startY, heading)
+
+    layout.reset()
+    for n in range(maxFrames):
+        shown = [b for b in balls if random.uniform() > dropRate]
+        img, truth = camera.render(shown, noise=random.uniform(2, 6))
+        ballsFound, ballData = vision.detect_game_balls(img, imageWidth, imageHeight, cameraFOV, camera.projection)
+        if layout.update(ballData, n / cameraFPS) == True:
+            return layout.number, layout.confident, layout.decisionTime
+
+    return None
+
+
+# Define loop scoring method (one template and ball at a time, for comparison)
+def loop_score(layout, angles, distances):
+
+    detections = layout.features(angles, distances)
+    scores = []
+    for k in range(len(layout.templates)):
+        missed = []
+        extra = [layout.cap] * len(detections)
+        for m in range(len(layout.templates[k])):
+            if layout.visible[k, m] == False:
+                continue
+            nearest = layout.cap
+            for j, detection in enumerate(detections):
+                gap = min(math.hypot(*(layout.templates[k, m] - detection)), layout.cap)
+                nearest = min(nearest, gap)
+                extra[j] = min(extra[j], gap)
+            missed.append(nearest)
+        scores.append((np.mean(missed) if missed else 0.0) / 2 + np.mean(extra) / 2)
+
+    return np.array(scores).reshape(-1, layout.poseCount).min(axis=1)
+
+
+# Define main method
+def main():
+
+    # Parse arguments
+    parser = argparse.ArgumentParser(description='Check the Galactic Search layout classifier')
+    parser.add_argument('--settings', default=visionFile, help='vision settings file')
+    parser.add_argument('--runs', type=int, default=10, help='runs per layout')
+    args = parser.parse_args()
+
+    vision = VisionLibrary(args.settings)
+    vision.segmenter = None
+    camera = FRCSyntheticCamera(vision, imageWidth, imageHeight, cameraFOV, seed=4121)
+    random = np.random.default_rng(4121)
+    layout = FRCBallLayout(VisionLibrary.layout_values, cameraFOV)
+
+    # Decide every layout from moved start poses
+    failures = 0
+    decisionTimes = []
+    print('%-8s %8s %10s %10s %12s' % ('layout', 'correct', 'confident', 'undecided', 'mean time s'))
+    for number, name, cells in galactic_search_layouts:
+        correct = 0
+        confident = 0
+        undecided = 0
+        times = []
+        for r in range(args.runs):
+            result = run_layout(vision, camera, random, layout, cells)
+            if result is None:
+                undecided += 1
+                continue
+            correct += result[0] == number
+            confident += result[1]
+            times.append(result[2])
+        decisionTimes.extend(times)
+        print('%-8s %4d/%-3d %10d %10d %12.2f' % (name, correct, args.runs, confident, undecided,
+                                                  np.mean(times) if times else 0.0))
+        failures += args.runs - correct
+
+    # Time the scoring of one frame
+    angles = layout.templates[0, :, 0] * layout.angleTolerance
+    distances = np.exp(layout.templates[0, :, 1] * layout.rangeTolerance)
+    start = time.perf_counter()
+    for n in range(100):
+        layout.score(angles, distances)
+    vectorTime = (time.perf_counter() - start) / 100
+    start = time.perf_counter()
+    for n in range(10):
+        loop_score(layout, angles, distances)
+    loopTime = (time.perf_counter() - start) / 10
+    if np.max(np.abs(layout.score(angles, distances) - loop_score(layout, angles, distances))) > 1e-9:
+        failures += 1
+    print('Scoring %d templates %.1f us per frame (%.1f us one ball at a time)' %
+          (len(layout.templates), 1e6 * vectorTime, 1e6 * loopTime))
+    print('Decided after %.2f s on average, %.2f s at most' % (np.mean(decisionTimes), np.max(decisionTimes)))
+
+    print('%d wrong or undecided layouts' % failures)
+    if failures > 0:
+        sys.exit(1)
+
+
+#define main function
+if __name__ == '__main__':
+    main()
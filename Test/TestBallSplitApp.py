@@ -0,0 +1,176 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/env python3
+
+####################################################################
+#                                                                  #
+#                    FRC Ball Split Test App                       #
+#                                                                  #
+#  This program checks the split modes of detect_game_balls.       #
+#  Field camera frames are rendered with pairs of touching balls   #
+#  (side by side, or one partly behind the other) and with single  #
+#  balls only.  For each split mode the balls found, extra balls   #
+#  and distance error are reported against the rendered balls,     #
+#  with the time per frame.  Frames without touching balls must    #
+#  cost the same as before, since no blob there is split.          #
+#                                                                  #
+#  Usage: TestBallSplitApp.py [--settings file] [--frames n]       #
+#                                                                  #
+#  @Version: 1.0                                                   #
+#  @Created: 2021-04-02                                            #
+#  @Author: Team 4121                                              #
+#                                                                  #
+####################################################################
+
+"""Ball split test application"""
+
+# System imports
+import sys
+import math
+import time
+import argparse
+
+# Setup paths
+sys.path.append('/home/pi/Team4121/Libraries')
+
+# Module imports
+import numpy as np
+
+# Team 4121 module imports
+from FRCVisionLibrary import VisionLibrary
+from FRCSyntheticFrameLibrary import FRCSyntheticCamera
+
+# Set test values
+visionFile = '/home/pi/Team4121/Config/2021VisionSettings.txt'
+imageWidth = 320
+imageHeight = 240
+cameraFOV = 27.3
+modes = ['none', 'distance', 'hough']
+minFound = 0.9
+maxSingleOverhead = 1.15
+
+
+# Define frame method (pairs of touching balls, or single balls apart, placed by bearing)
+def make_frames(camera, random, count, pairs):
+
+    diameter = 2 * float(VisionLibrary.ball_values['RADIUS'])
+    frames = []
+    for n in range(count):
+        balls = []
+        if pairs:
+            for bearing in (-12, 8):
+                distance = random.uniform(40, 200)
+                balls.append((distance * math.tan(math.radians(bearing + random.uniform(-3, 3))), distance))
+                balls.append((balls[-1][0] + diameter * random.uniform(1.0, 1.2), distance + random.uniform(0, 20)))
+        else:
+            for bearing in (-18, 0, 18):
+                distance = random.uniform(40, 200)
+                balls.append((distance * math.tan(math.radians(bearing + random.uniform(-3, 3))), distance))
+        img, truth = camera.render(balls, noise=random.uniform(2, 6))
+
+        # Only balls wholly in the frame are counted
+        truth['balls'] = [b for b in truth['balls'] if b['radius'] <= b['x'] <= imageWidth - b['radius'] and
+                          b['radius'] <= b['y'] <= imageHeight - b['radius']]
+        frames.append((img, truth))
+
+    return frames
+
+
+# Define match method (returns balls found, extra balls and distance errors in percent)
+def match_balls(ballData, truth):
+
+    found = 0
+    errors = []
+    used = set()
+    for ball in truth:
+        best = None
+        for i, detected in enumerate(ballData):
+            gap = math.hypot(detected['x'] - ball['x'], detected['y'] - ball['y'])
+            if i not in used and gap < ball['radius'] and (best is None or gap < best[0]):
+                best = (gap, i)
+        if best is not None:
+            used.add(best[1])
+            found += 1
+            errors.append(100.0 * abs(ballData[best[1]]['distance'] - ball['distance']) / ball['distance'])
+
+    return found, len(ballData) - len(used), errors
+
+
+# Define mode run method (returns found share, extra balls, distance error p95 and ms per frame)
+def run_mode(vision, camera, frames, mode):
+
+    VisionLibrary.ball_values['SPLIT'] = mode
+    found = 0
+    total = 0
+    extra = 0
+    errors = []
+    for img, truth in frames:
+        ballsFound, ballData = vision.detect_game_balls(img, imageWidth, imageHeight, cameraFOV, camera.projection)
+        matched, unmatched, frameErrors = match_balls(ballData, truth['balls'])
+        found += matched
+        total += len(truth['balls'])
+        extra += unmatched
+        errors.extend(frameErrors)
+
+    # Best of three runs
+    frameTime = None
+    for r in range(3):
+        start = time.perf_counter()
+        for img, truth in frames:
+            vision.detect_game_balls(img, imageWidth, imageHeight, cameraFOV, camera.projection)
+        seconds = (time.perf_counter() - start) / len(frames)
+        frameTime = seconds if frameTime is None else min(frameTime, seconds)
+    frameTime = 1000 * frameTime
+
+    return found / float(total), extra, np.percentile(errors, 95) if errors else 0.0, frameTime
+
+
+# Define main method
+def main():
+
+    # Parse arguments
+    parser = argparse.ArgumentParser(description='Check splitting of touching balls')
+    parser.add_argument('--settings', default=visionFile, help='vision settings file')
+    parser.add_argument('--frames', type=int, default=40, help='frames per scene type')
+    args = parser.parse_args()
+
+    vision = VisionLibrary(args.settings)
+    vision.segmenter = None
+    camera = FRCSyntheticCamera(vision, imageWidth, imageHeight, cameraFOV, seed=4121)
+    random = np.random.default_rng(4121)
+    pairFrames = make_frames(camera, random, args.frames, True)
+    singleFrames = make_frames(camera, random, args.frames, False)
+    split = VisionLibrary.ball_values.get('SPLIT')
+
+    failures = 0
+    for name, frames in (('touching pairs', pairFrames), ('single balls', singleFrames)):
+        print('%s, %d frames' % (name, len(frames)))
+        print('%-10s %8s %8s %14s %8s' % ('mode', 'found', 'extra', 'p95 error %', 'ms'))
+        for mode in modes:
+            found, extra, error, frameTime = run_mode(vision, camera, frames, mode)
+            print('%-10s %7.0f%% %8d %14.2f %8.3f' % (mode, 100 * found, extra, error, frameTime))
+            if mode == 'none':
+                reference = (found, extra, error, frameTime)
+                continue
+
+            # Split modes must find touching balls and measure them better than one merged ball
+            if frames is pairFrames and (found < minFound or error >= reference[2]):
+                failures += 1
+
+            # With nothing to split the results must not change, at about the same cost
+            if frames is singleFrames and ((found, extra, error) != reference[0:3] or
+                                           frameTime > maxSingleOverhead * reference[3]):
+                failures += 1
+        print('')
+
+    if split is None:
+        VisionLibrary.ball_values.pop('SPLIT')
+    else:
+        VisionLibrary.ball_values['SPLIT'] = split
+    print('%d split mode checks failed' % failures)
+    if failures > 0:
+        sys.exit(1)
+
+
+#define main function
+if __name__ == '__main__':
+    main()
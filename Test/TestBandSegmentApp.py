@@ -0,0 +1,172 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/env python3
+
+####################################################################
+#                                                                  #
+#                  FRC Band Segment Test App                       #
+#                                                                  #
+#  This program checks and benchmarks band parallel segmentation.  #
+#  Synthetic frames with balls and field markers are rendered at   #
+#  320x240 up to 1280x960.  For each HSV range the mask            #
+#  and contours from the band segmenter are checked against the    #
+#  single threaded VisionLibrary chain, and the time per frame is  #
+#  reported for 1, 2 and 4 bands next to the number of CPU cores.  #
+#  The segmenter with its default settings (as the main program    #
+#  makes it) is timed last and must not be more than 15% slower    #
+#  than the single threaded chain at any size.                     #
+#                                                                  #
+#  Usage: TestBandSegmentApp.py [--settings file] [--frames n]     #
+#                                                                  #
+#  @Version: 1.0                                                   #
+#  @Created: 2021-03-29                                            #
+#  @Author: Team 4121                                              #
+#                                                                  #
+####################################################################
+
+"""Band segmentation test application"""
+
+# System imports
+import sys
+import os
+import time
+import argparse
+
+# Setup paths
+sys.path.append('/home/pi/Team4121/Libraries')
+
+# Module imports
+import cv2 as cv
+import numpy as np
+
+# Team 4121 module imports
+from FRCVisionLibrary import VisionLibrary
+from FRCBandSegmentLibrary import FRCBandSegmenter
+from FRCSyntheticFrameLibrary import FRCSyntheticCamera
+
+# Set test values
+visionFile = '/home/pi/Team4121/Config/2021VisionSettings.txt'
+resolutions = [(320, 240), (640, 480), (1280, 960)]
+bandCounts = [1, 2, 4]
+cameraFOV = 27.3
+
+
+# Define HSV range method
+def hsv_range(values):
+
+    return (tuple(int(values[k]) for k in ('HMIN', 'SMIN', 'VMIN')),
+            tuple(int(values[k]) for k in ('HMAX', 'SMAX', 'VMAX')))
+
+
+# Define frame method (targets placed so some cross band seams)
+def make_frames(vision, width, height, count):
+
+    camera = FRCSyntheticCamera(vision, width, height, cameraFOV, 0.0, 0.0, 4121)
+    random = np.random.default_rng(4121)
+    frames = []
+    for n in range(count):
+        balls = [(random.uniform(-30, 30), random.uniform(30, 200)) for i in range(4)]
+        markers = [(random.uniform(-40, 40), random.uniform(40, 200)) for i in range(2)]
+        img, truth = camera.render(balls, markers, noise=random.uniform(0, 8))
+        frames.append(img)
+
+    return frames
+
+
+# Define serial mask method (the VisionLibrary chain without contours)
+def serial_mask(img, hsvMin, hsvMax, erodeDilate):
+
+    blur = cv.GaussianBlur(img, (13, 13), 0)
+    mask = cv.inRange(cv.cvtColor(blur, cv.COLOR_BGR2HSV), hsvMin, hsvMax)
+    if erodeDilate:
+        kernel = np.ones((3, 3), np.uint8)
+        mask = cv.dilate(cv.erode(mask, kernel, iterations=2), kernel, iterations=2)
+    return mask
+
+
+# Define contour comparison key (order does not matter)
+def contour_key(contours):
+
+    return sorted((cv.boundingRect(c), cv.contourArea(c)) for c in contours)
+
+
+# Define timing method (seconds per frame)
+def time_frames(call, frames):
+
+    call(frames[0])
+    start = time.perf_counter()
+    for img in frames:
+        call(img)
+    return (time.perf_counter() - start) / len(frames)
+
+
+# Define main method
+def main():
+
+    # Parse arguments
+    parser = argparse.ArgumentParser(description='Check and benchmark band segmentation')
+    parser.add_argument('--settings', default=visionFile, help='vision settings file')
+    parser.add_argument('--frames', type=int, default=20, help='frames per resolution')
+    args = parser.parse_args()
+
+    vision = VisionLibrary(args.settings)
+    targets = [('balls', hsv_range(VisionLibrary.ball_values), True),
+               ('markers', hsv_range(VisionLibrary.marker_values), False),
+               ('tape', hsv_range(VisionLibrary.tape_values), True)]
+    mismatches = 0
+    slower = 0
+    print('%d CPU cores, OpenCV threads %d' % (os.cpu_count() or 1, cv.getNumThreads()))
+
+    for width, height in resolutions:
+
+        frames = make_frames(vision, width, height, args.frames)
+        line = '%4dx%-4d' % (width, height)
+        vision.segmenter = None
+        serial = time_frames(lambda img: vision.process_image_contours(img, targets[0][1][0], targets[0][1][1], True),
+                             frames)
+        line += '  serial %6.2f ms' % (1000 * serial)
+
+        for bands in bandCounts:
+            segmenter = FRCBandSegmenter(bands, minFrameRows=0)
+
+            # Masks and contours must match the single threaded chain
+            for img in frames:
+                for name, (hsvMin, hsvMax), erodeDilate in targets:
+                    expected = serial_mask(img, hsvMin, hsvMax, erodeDilate)
+                    if np.any(segmenter.segment(img, hsvMin, hsvMax, erodeDilate) != expected):
+                        mismatches += 1
+                    vision.segmenter = None
+                    serialContours = vision.process_image_contours(img, hsvMin, hsvMax, erodeDilate)
+                    vision.segmenter = segmenter
+                    if contour_key(vision.process_image_contours(img, hsvMin, hsvMax, erodeDilate)) != \
+                       contour_key(serialContours):
+                        mismatches += 1
+
+            vision.segmenter = segmenter
+            banded = time_frames(lambda img: vision.process_image_contours(img, targets[0][1][0], targets[0][1][1], True),
+                                 frames)
+            line += '  %d bands %6.2f ms (%.1fx)' % (bands, 1000 * banded, serial / banded)
+            segmenter.close()
+
+        # Default settings only split frames that pay off
+        segmenter = FRCBandSegmenter()
+        vision.segmenter = segmenter
+        banded = time_frames(lambda img: vision.process_image_contours(img, targets[0][1][0], targets[0][1][1], True),
+                             frames)
+        line += '  default %6.2f ms (%.1fx, %d bands)' % (1000 * banded, serial / banded,
+                                                        len(segmenter.band_rows(height)))
+        if banded > 1.15 * serial:
+            slower += 1
+        segmenter.close()
+
+        vision.segmenter = None
+        print(line)
+
+    print('%d masks or contour sets differ from the single threaded chain' % mismatches)
+    print('%d sizes slower with the default segmenter' % slower)
+    if mismatches > 0 or slower > 0:
+        sys.exit(1)
+
+
+#define main function
+if __name__ == '__main__':
+    main()
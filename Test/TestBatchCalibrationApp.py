@@ -0,0 +1,171 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/env python3
+
+####################################################################
+#                                                                  #
+#                FRC Batch Calibration Test App                    #
+#                                                                  #
+#  This program checks the batch camera calibration utility.       #
+#  Chessboard views are rendered from a known camera, plus a few   #
+#  views through a strongly distorted lens that the camera model   #
+#  cannot fit.  The folder is calibrated across the process pool   #
+#  and the result must match cv.calibrateCamera run in this        #
+#  process on the same images.  With --max-error the distorted     #
+#  views must be the ones dropped, and the recalibration must      #
+#  match a single process calibration of the good views and come   #
+#  back close to the true camera.                                  #
+#                                                                  #
+#  Usage: TestBatchCalibrationApp.py [--views n] [--workers n]     #
+#                                                                  #
+#  @Version: 1.0                                                   #
+#  @Created: 2021-04-02                                            #
+#  @Author: Team 4121                                              #
+#                                                                  #
+####################################################################
+
+"""Batch camera calibration test application"""
+
+# System imports
+import sys
+import os
+import tempfile
+import argparse
+
+# Setup paths (the calibration program is a utility, next to this folder)
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Utilities'))
+
+# Module imports
+import cv2 as cv
+import numpy as np
+
+# Team 4121 module imports
+from Batch_Camera_Calibration import calibrate_folders, board_points, list_images
+
+# Set test values
+imageWidth = 640
+imageHeight = 480
+boardSize = (9, 6)
+squarePixels = 40
+camMatrix = np.array([[480.0, 0, 320.0], [0, 480.0, 240.0], [0, 0, 1]])
+distortCoeffs = np.array([-0.05, 0.01, 0, 0, 0])
+outlierCoeffs = np.array([-0.45, 0.2, 0, 0, 0])
+outlierViews = (3, 8)
+maxError = 0.35
+maxPoolDifference = 1e-6
+maxFocalError = 0.01
+
+
+# Define chessboard method (squares of squarePixels with a one square white border)
+def make_board():
+
+    squares = np.indices((boardSize[1] + 1, boardSize[0] + 1)).sum(axis=0) % 2
+    board = np.where(squares == 0, 0, 255).astype(np.uint8)
+    board = cv.resize(board, None, fx=squarePixels, fy=squarePixels, interpolation=cv.INTER_NEAREST)
+    return cv.copyMakeBorder(board, squarePixels, squarePixels, squarePixels, squarePixels,
+                             cv.BORDER_CONSTANT, value=255)
+
+
+# Define view rendering method (board turned and placed in front of the lens, in squares)
+def render_view(board, random, coeffs):
+
+    # Board pose (centered on the board, tilted up to 30 degrees)
+    rvec = np.array([random.uniform(-0.5, 0.5), random.uniform(-0.5, 0.5), random.uniform(-0.2, 0.2)])
+    rotation = cv.Rodrigues(rvec)[0]
+    center = np.array([(boardSize[0] + 1) / 2.0, (boardSize[1] + 1) / 2.0, 0])
+    tvec = np.array([random.uniform(-1, 1), random.uniform(-0.5, 0.5), random.uniform(14, 18)]) - rotation @ center
+
+    # Ideal ray of every pixel through the lens, then the board point it lands on
+    pixels = np.indices((imageHeight, imageWidth))[::-1].reshape(2, -1).T.astype(np.float64)
+    rays = cv.undistortPoints(pixels.reshape(-1, 1, 2), camMatrix, coeffs).reshape(-1, 2)
+    plane = np.linalg.inv(np.column_stack((rotation[:, 0], rotation[:, 1], tvec)))
+    points = np.column_stack((rays, np.ones(len(rays)))) @ plane.T
+    mapX = (points[:, 0] / points[:, 2] * squarePixels + squarePixels).astype(np.float32)
+    mapY = (points[:, 1] / points[:, 2] * squarePixels + squarePixels).astype(np.float32)
+
+    img = cv.remap(board, mapX.reshape(imageHeight, imageWidth), mapY.reshape(imageHeight, imageWidth),
+                   cv.INTER_LINEAR, borderMode=cv.BORDER_CONSTANT, borderValue=128)
+    img = cv.GaussianBlur(img, (3, 3), 0)
+    noise = random.normal(0, 2.0, img.shape)
+    return np.clip(img + noise, 0, 255).astype(np.uint8)
+
+
+# Define single process calibration method (returns RMS, camera matrix and coefficients)
+def calibrate_single(filenames):
+
+    imgpoints = []
+    for filename in filenames:
+        gray = cv.imread(filename, cv.IMREAD_GRAYSCALE)
+        found, corners = cv.findChessboardCorners(gray, boardSize, cv.CALIB_CB_ADAPTIVE_THRESH +
+                                                  cv.CALIB_CB_NORMALIZE_IMAGE + cv.CALIB_CB_FAST_CHECK)
+        if found == True:
+            imgpoints.append(cv.cornerSubPix(gray, corners, (11, 11), (-1, -1),
+                                             (cv.TERM_CRITERIA_EPS + cv.TERM_CRITERIA_MAX_ITER, 30, 0.001)))
+    objp = board_points(boardSize, 1.0)
+    rms, cam_matrix, dist_coeffs, rotate_vecs, translate_vecs = cv.calibrateCamera(
+        [objp] * len(imgpoints), imgpoints, (imageWidth, imageHeight), None, None)
+
+    return rms, cam_matrix, dist_coeffs
+
+
+# Define result difference method (largest relative difference of the camera matrix and RMS)
+def difference(poolResult, single):
+
+    camId, imageSize, filenames, rms, cam_matrix, dist_coeffs, errors = poolResult
+    matrixDifference = np.max(np.abs(cam_matrix - single[1])) / camMatrix[0, 0]
+    return max(matrixDifference, abs(rms - single[0]) / max(single[0], 1e-9))
+
+
+# Define main method
+def main():
+
+    # Parse arguments
+    parser = argparse.ArgumentParser(description='Check the batch camera calibration utility')
+    parser.add_argument('--views', type=int, default=14, help='chessboard views to render')
+    parser.add_argument('--workers', type=int, default=2, help='worker processes')
+    args = parser.parse_args()
+
+    failures = 0
+    random = np.random.default_rng(4121)
+    board = make_board()
+    with tempfile.TemporaryDirectory() as folder:
+
+        # Render the views (a few through the wrong lens)
+        outliers = []
+        for n in range(args.views):
+            coeffs = outlierCoeffs if n in outlierViews else distortCoeffs
+            filename = os.path.join(folder, 'view_%03d.png' % n)
+            cv.imwrite(filename, render_view(board, random, coeffs))
+            if n in outlierViews:
+                outliers.append(filename)
+        filenames = list_images(folder)
+        print('Rendered %d views, %d through a distorted lens' % (len(filenames), len(outliers)))
+
+        # Pool against a single process calibration of every view
+        result = calibrate_folders(['0=' + folder], boardSize, 1.0, args.workers)[0]
+        single = calibrate_single(filenames)
+        change = difference(result, single)
+        print('All views: pool RMS %.3f px, single process RMS %.3f px, largest difference %.2e' %
+              (result[3], single[0], change))
+        if len(result[2]) != len(filenames) or change > maxPoolDifference:
+            failures += 1
+
+        # Outliers dropped by the recalibration pass
+        result = calibrate_folders(['0=' + folder], boardSize, 1.0, args.workers, maxError)[0]
+        dropped = sorted(set(filenames) - set(result[2]))
+        single = calibrate_single(sorted(set(filenames) - set(outliers)))
+        change = difference(result, single)
+        focalError = abs(result[4][0, 0] / camMatrix[0, 0] - 1)
+        print('Max error %.2f px: dropped %s' % (maxError, ', '.join(os.path.basename(f) for f in dropped)))
+        print('  pool RMS %.3f px, single process RMS %.3f px, largest difference %.2e, focal length error %.2f%%' %
+              (result[3], single[0], change, 100 * focalError))
+        if dropped != sorted(outliers) or change > maxPoolDifference or focalError > maxFocalError:
+            failures += 1
+
+    print('%d calibration checks failed' % failures)
+    if failures > 0:
+        sys.exit(1)
+
+
+#define main function
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/env python3
+
+####################################################################
+#                                                                  #
+#                FRC Calibration Store Test App                    #
+#                                                                  #
+#  This program checks the binary calibration store.  Text         #
+#  calibration files are written to a scratch folder and loaded    #
+#  with the capture size given, which must write the store with    #
+#  the remap tables for that size.  Undistorting frames (at that   #
+#  size and at one not set up) must never write the store, and a   #
+#  second load must use the store as it is.  When the text files   #
+#  are newer than the store it must be rebuilt from them, tables   #
+#  included.  The first frame undistort time is reported with and  #
+#  without the tables built at startup.                            #
+#                                                                  #
+#  Usage: TestCalibrationStoreApp.py                               #
+#                                                                  #
+#  @Version: 1.0                                                   #
+#  @Created: 2021-04-02                                            #
+#  @Author: Team 4121                                              #
+#                                                                  #
+####################################################################
+
+"""Calibration store test application"""
+
+# System imports
+import sys
+import os
+import time
+import tempfile
+
+# Setup paths
+sys.path.append('/home/pi/Team4121/Libraries')
+
+# Module imports
+import numpy as np
+
+# Team 4121 module imports
+from FRCCalibrationLibrary import FRCCalibration
+
+# Set test values
+camId = 7
+frameWidth = 320
+frameHeight = 240
+camMatrix = np.array([[300.0, 0, 160.0], [0, 300.0, 120.0], [0, 0, 1]])
+distortCoeffs = np.array([-0.2, 0.05, 0, 0, 0])
+
+
+# Define text calibration method (written the way the calibration utilities do)
+def write_text(folder, matrix, coeffs):
+
+    np.savetxt(os.path.join(folder, 'Camera_Matrix_Cam%d.txt' % camId), matrix)
+    np.savetxt(os.path.join(folder, 'Distortion_Coeffs_Cam%d.txt' % camId), coeffs)
+
+
+# Define store identity method (a save swaps in a new file)
+def store_identity(calibration):
+
+    stat = os.stat(calibration.storeFilename)
+    return stat.st_ino, stat.st_mtime_ns, stat.st_size
+
+
+# Define first frame timing method (milliseconds)
+def time_first_frame(calibration, frame):
+
+    start = time.perf_counter()
+    calibration.undistort(frame)
+    return 1000 * (time.perf_counter() - start)
+
+
+# Define main method
+def main():
+
+    failures = 0
+    frame = np.random.default_rng(4121).integers(0, 255, (frameHeight, frameWidth, 3)).astype(np.uint8)
+    with tempfile.TemporaryDirectory() as folder:
+
+        # First load writes the store with the capture size tables
+        write_text(folder, camMatrix, distortCoeffs)
+        calibration = FRCCalibration(camId, folder, resolutions=[(frameWidth, frameHeight)])
+        stored = os.path.isfile(calibration.storeFilename)
+        with np.load(calibration.storeFilename) as store:
+            hasTables = '%dx%d_map1' % (frameWidth, frameHeight) in store.files
+        print('Store written at startup: %s, with %dx%d tables: %s' % (stored, frameWidth, frameHeight, hasTables))
+        if stored == False or hasTables == False:
+            failures += 1
+
+        # Undistorting never writes the store (not even for a size not set up at startup)
+        before = store_identity(calibration)
+        setUp = time_first_frame(calibration, frame)
+        undistorted = calibration.undistort(frame)
+        notSetUp = time_first_frame(calibration, np.zeros((2 * frameHeight, 2 * frameWidth, 3), dtype=np.uint8))
+        written = store_identity(calibration) != before
+        print('First frame undistort: %.2f ms set up at startup, %.2f ms not set up' % (setUp, notSetUp))
+        print('Store written while undistorting: %s' % written)
+        if written == True:
+            failures += 1
+
+        # A second load uses the store as it is and gives the same frames
+        calibration = FRCCalibration(camId, folder, resolutions=[(frameWidth, frameHeight)])
+        written = store_identity(calibration) != before
+        same = np.array_equal(calibration.undistort(frame), undistorted)
+        print('Second load: store written %s, same frames %s' % (written, same))
+        if written == True or same == False:
+            failures += 1
+
+        # Newer text files rebuild the store, tables included
+        write_text(folder, camMatrix * [[1.2], [1.2], [1]], distortCoeffs * 0.5)
+        newer = os.path.getmtime(calibration.storeFilename) + 10
+        for filename in (calibration.matrixFilename, calibration.coeffsFilename):
+            os.utime(filename, (newer, newer))
+        calibration = FRCCalibration(camId, folder, resolutions=[(frameWidth, frameHeight)])
+        with np.load(calibration.storeFilename) as store:
+            rebuiltMatrix = np.allclose(store['cam_matrix'], np.loadtxt(calibration.matrixFilename))
+            rebuiltTables = '%dx%d_map1' % (frameWidth, frameHeight) in store.files
+        changed = np.array_equal(calibration.undistort(frame), undistorted) == False
+        print('Newer text files: store rebuilt %s, with tables %s, frames changed %s' %
+              (rebuiltMatrix, rebuiltTables, changed))
+        if rebuiltMatrix == False or rebuiltTables == False or changed == False:
+            failures += 1
+
+    print('%d calibration store checks failed' % failures)
+    if failures > 0:
+        sys.exit(1)
+
+
+#define main function
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/env python3
+
+####################################################################
+#                                                                  #
+#                  FRC Camera Control Test App                     #
+#                                                                  #
+#  This program checks the camera control cache and times profile  #
+#  switches.  By default it runs against a simulated V4L2 camera   #
+#  that rounds and clamps values, ignores exposure while auto      #
+#  exposure is on, takes time for every control write and much     #
+#  longer to renegotiate the stream, and can fall back to auto     #
+#  exposure on its own.  With --device it applies the tracking and #
+#  driver profiles to a real camera and prints what it read back.  #
+#                                                                  #
+#  Usage: TestCameraControlApp.py [--device path]                  #
+#                                                                  #
+#  @Version: 1.0                                                   #
+#  @Created: 2021-03-30                                            #
+#  @Author: Team 4121                                              #
+#                                                                  #
+####################################################################
+
+"""Camera control test application"""
+
+# System imports
+import sys
+import time
+import argparse
+
+# Setup paths
+sys.path.append('/home/pi/Team4121/Libraries')
+
+# Module imports
+import cv2 as cv
+
+# Team 4121 module imports
+from FRCCameraControlLibrary import FRCCameraControl, AUTO_EXPOSURE_MANUAL, AUTO_EXPOSURE_AUTO
+
+# Set test values
+trackingSettings = {'Width': 320, 'Height': 240, 'FPS': 15,
+                    'AutoExposure': AUTO_EXPOSURE_MANUAL, 'Exposure': 8, 'Brightness': 20}
+driverSettings = {'Width': 320, 'Height': 240, 'FPS': 15,
+                  'AutoExposure': AUTO_EXPOSURE_AUTO, 'Brightness': 55.4}
+controlDelay = 0.002
+streamDelay = 0.03
+switchCount = 10
+
+
+# Define the simulated camera class
+class SimulatedCamera:
+
+    # Define initialization
+    def __init__(self):
+
+        self.values = {cv.CAP_PROP_FRAME_WIDTH: 640.0, cv.CAP_PROP_FRAME_HEIGHT: 480.0, cv.CAP_PROP_FPS: 30.0,
+                       cv.CAP_PROP_AUTO_EXPOSURE: float(AUTO_EXPOSURE_AUTO), cv.CAP_PROP_EXPOSURE: 156.0,
+                       cv.CAP_PROP_BRIGHTNESS: 0.0, cv.CAP_PROP_GAIN: 0.0}
+        self.writes = 0
+        self.renegotiations = 0
+
+
+    # Define property set method (rounds, clamps and ignores like a UVC camera)
+    def set(self, prop, value):
+
+        self.writes += 1
+        if prop in (cv.CAP_PROP_FRAME_WIDTH, cv.CAP_PROP_FRAME_HEIGHT, cv.CAP_PROP_FPS):
+            self.renegotiations += 1
+            time.sleep(streamDelay)
+        else:
+            time.sleep(controlDelay)
+
+        if prop == cv.CAP_PROP_EXPOSURE:
+            if self.values[cv.CAP_PROP_AUTO_EXPOSURE] != AUTO_EXPOSURE_MANUAL:
+                return False
+            value = min(max(value, 3), 2047)
+        if prop == cv.CAP_PROP_BRIGHTNESS:
+            value = min(max(value, -64), 64)
+        self.values[prop] = float(round(value))
+        return True
+
+
+    # Define property get method
+    def get(self, prop):
+
+        return self.values.get(prop, 0.0)
+
+
+    # Define auto exposure fallback method (what some cameras do after a replug)
+    def fall_back(self):
+
+        self.values[cv.CAP_PROP_AUTO_EXPOSURE] = float(AUTO_EXPOSURE_AUTO)
+        self.values[cv.CAP_PROP_EXPOSURE] = 156.0
+
+
+# Define check method
+def check(name, passed, failures):
+
+    print('%-52s %s' % (name, 'pass' if passed else 'FAIL'))
+    if not passed:
+        failures.append(name)
+
+
+# Define naive switch method (sets every value, like FRCWebCam did before)
+def naive_switch(settings):
+
+    start = time.perf_counter()
+    control = FRCCameraControl(SimulatedCamera())
+    for name, value in settings.items():
+        control.apply({name: value})
+
+    return time.perf_counter() - start
+
+
+# Define simulated test method
+def run_simulated():
+
+    failures = []
+    camera = SimulatedCamera()
+    control = FRCCameraControl(camera, print)
+    control.add_profile('tracking', trackingSettings)
+    control.add_profile('driver', driverSettings)
+
+    # Tracking profile is confirmed, exposure is written after auto exposure is off
+    failed = control.use_profile('tracking')
+    check('tracking profile confirmed', len(failed) == 0 and camera.get(cv.CAP_PROP_EXPOSURE) == 8, failures)
+
+    # Applying it again sends nothing
+    writes = camera.writes
+    control.use_profile('tracking')
+    check('cached profile sends no writes', camera.writes == writes, failures)
+
+    # Switching profiles only touches controls
+    renegotiations = camera.renegotiations
+    writes = camera.writes
+    switchTimes = []
+    for n in range(switchCount):
+        for profile in ('driver', 'tracking'):
+            failed = control.use_profile(profile)
+            switchTimes.append(control.switch_time)
+            if len(failed) > 0:
+                failures.append('switch to ' + profile)
+    check('profile switches never renegotiate the stream', camera.renegotiations == renegotiations, failures)
+    writesPerSwitch = (camera.writes - writes) / float(len(switchTimes))
+    naiveTimes = [naive_switch(driverSettings) for n in range(3)]
+    print('Profile switch %.1f ms (%.1f writes), setting everything %.1f ms' %
+          (1000 * sum(switchTimes) / len(switchTimes), writesPerSwitch, 1000 * min(naiveTimes)))
+    check('profile switch faster than setting everything', max(switchTimes) < min(naiveTimes), failures)
+
+    # Values the camera refuses or rounds away are reported
+    failed = control.apply({'Exposure': 5000})
+    check('out of range exposure reported', 'Exposure' in failed and failed['Exposure'][1] == 2047, failures)
+    control.use_profile('tracking')
+
+    # A camera that falls back to auto exposure is caught and fixed
+    camera.fall_back()
+    drifted = control.verify()
+    check('auto exposure fallback detected', 'AutoExposure' in drifted, failures)
+    camera.fall_back()
+    failed = control.check()
+    check('check restores tracking exposure', len(failed) == 0 and camera.get(cv.CAP_PROP_EXPOSURE) == 8 and
+          camera.get(cv.CAP_PROP_AUTO_EXPOSURE) == AUTO_EXPOSURE_MANUAL, failures)
+
+    return failures
+
+
+# Define device test method
+def run_device(device):
+
+    stream = cv.VideoCapture(device, cv.CAP_V4L2)
+    if stream.isOpened() == False:
+        print('Unable to open camera: ' + str(device))
+        return ['open camera']
+
+    control = FRCCameraControl(stream, print)
+    control.add_profile('tracking', trackingSettings)
+    control.add_profile('driver', driverSettings)
+    failures = []
+    for profile in ('tracking', 'driver', 'tracking'):
+        failed = control.use_profile(profile)
+        print('%-10s %6.1f ms  confirmed %s' % (profile, 1000 * control.switch_time, control.confirmed))
+        failures += [profile + ' ' + name for name in failed]
+        stream.read()
+    stream.release()
+
+    return failures
+
+
+# Define main method
+def main():
+
+    # Parse arguments
+    parser = argparse.ArgumentParser(description='Check camera settings and profile switching')
+    parser.add_argument('--device', default=None, help='camera device to test instead of the simulation')
+    args = parser.parse_args()
+
+    if args.device is None:
+        failures = run_simulated()
+    else:
+        failures = run_device(args.device)
+
+    print('%d checks failed' % len(failures))
+    if len(failures) > 0:
+        sys.exit(1)
+
+
+#define main function
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/env python3
+
+####################################################################
+#                                                                  #
+#                 FRC Channel Segment Test App                     #
+#                                                                  #
+#  This program compares single channel tape segmentation with the #
+#  HSV chain.  Frames come from a recorded goal camera clip or are #
+#  rendered as low exposure frames with tape and some white lights #
+#  (bright but not green, which the green channel alone lets       #
+#  through).  For each single channel mode the cleaned mask is     #
+#  compared with the HSV mask (intersection over union), the tape  #
+#  found by detect_tape_rectangle is compared with the HSV result, #
+#  and the time per frame is reported.  A mode matches only if its #
+#  worst frame does too.  The green channel modes let the white    #
+#  lights through, so on synthetic frames they must be rejected.   #
+#                                                                  #
+#  Usage: TestChannelSegmentApp.py [--settings file] [--video f]   #
+#                                                                  #
+#  @Version: 1.0                                                   #
+#  @Created: 2021-03-30                                            #
+#  @Author: Team 4121                                              #
+#                                                                  #
+####################################################################
+
+"""Single channel segmentation test application"""
+
+# System imports
+import sys
+import time
+import argparse
+
+# Setup paths
+sys.path.append('/home/pi/Team4121/Libraries')
+
+# Module imports
+import cv2 as cv
+import numpy as np
+
+# Team 4121 module imports
+from FRCVisionLibrary import VisionLibrary
+from FRCIncrementalMaskLibrary import FRCIncrementalMask
+from FRCSyntheticFrameLibrary import FRCSyntheticCamera
+
+# Set test values
+visionFile = '/home/pi/Team4121/Config/2021VisionSettings.txt'
+imageWidth = 320
+imageHeight = 240
+cameraFOV = 23.5
+cameraFocalLength = 340.0
+cameraMountAngle = 25.0
+cameraMountHeight = 26.0
+frameCount = 60
+modes = [('green', None, False), ('green', 'otsu', False), ('greendiff', None, True), ('greendiff', 'otsu', True)]
+minOverlap = 0.85
+minWorstOverlap = 0.7
+minAgreement = 0.95
+maxBoxError = 3
+
+
+# Define frame method (low exposure frames, some with white lights)
+def make_frames(vision, count):
+
+    camera = FRCSyntheticCamera(vision, imageWidth, imageHeight, cameraFOV, cameraMountAngle, cameraMountHeight, 4121)
+    random = np.random.default_rng(4121)
+    frames = []
+    for n in range(count):
+        img = (camera.background() * 0.25).astype(np.uint8)
+        if n % 3 == 0:
+            for i in range(2):
+                center = (int(random.uniform(0, imageWidth)), int(random.uniform(0, imageHeight // 3)))
+                cv.circle(img, center, int(random.uniform(3, 8)), (235, 240, 238), -1, cv.LINE_AA)
+        if n % 10 != 9:
+            camera.draw_tape(img, random.uniform(-40, 40), random.uniform(120, 360), random.uniform(-20, 20))
+        frames.append(camera.add_noise(img, 3.0))
+
+    return frames
+
+
+# Define video method (frames of a recorded clip)
+def read_frames(videofile, count):
+
+    stream = cv.VideoCapture(videofile)
+    frames = []
+    while len(frames) < count:
+        grabbed, frame = stream.read()
+        if grabbed == False:
+            break
+        frames.append(frame)
+    stream.release()
+
+    return frames
+
+
+# Define HSV mask method (the VisionLibrary chain)
+def hsv_mask(img, opener):
+
+    hsvMin = tuple(int(VisionLibrary.tape_values[k]) for k in ('HMIN', 'SMIN', 'VMIN'))
+    hsvMax = tuple(int(VisionLibrary.tape_values[k]) for k in ('HMAX', 'SMAX', 'VMAX'))
+    blur = cv.GaussianBlur(img, (13, 13), 0)
+    return opener.open_mask(cv.inRange(cv.cvtColor(blur, cv.COLOR_BGR2HSV), hsvMin, hsvMax))
+
+
+# Define overlap method (intersection over union, 1 when both are empty)
+def overlap(first, second):
+
+    union = cv.countNonZero(cv.bitwise_or(first, second))
+    if union == 0:
+        return 1.0
+    return cv.countNonZero(cv.bitwise_and(first, second)) / float(union)
+
+
+# Define tape detection method (returns the box or None)
+def detect_box(vision, img):
+
+    tapeCameraValues, tapeRealWorldValues, foundTape, targetLock, rect, box = vision.detect_tape_rectangle(
+        img, imageWidth, imageHeight, cameraFOV, cameraFocalLength, cameraMountAngle, cameraMountHeight)
+    if foundTape == False:
+        return None
+    return np.array([tapeCameraValues[k] for k in ('TargetX', 'TargetY', 'TargetW', 'TargetH')])
+
+
+# Define timing method (seconds per frame)
+def time_frames(call, frames):
+
+    call(frames[0])
+    start = time.perf_counter()
+    for img in frames:
+        call(img)
+    return (time.perf_counter() - start) / len(frames)
+
+
+# Define main method
+def main():
+
+    # Parse arguments
+    parser = argparse.ArgumentParser(description='Compare single channel and HSV tape segmentation')
+    parser.add_argument('--settings', default=visionFile, help='vision settings file')
+    parser.add_argument('--video', default=None, help='recorded goal camera clip to use instead of synthetic frames')
+    parser.add_argument('--frames', type=int, default=frameCount, help='frames to compare')
+    args = parser.parse_args()
+
+    vision = VisionLibrary(args.settings)
+    vision.segmenter = None
+    if args.video is None:
+        frames = make_frames(vision, args.frames)
+    else:
+        frames = read_frames(args.video, args.frames)
+    opener = FRCIncrementalMask()
+    tapeValues = dict(VisionLibrary.tape_values)
+    hsvMin = tuple(int(tapeValues[k]) for k in ('HMIN', 'SMIN', 'VMIN'))
+    hsvMax = tuple(int(tapeValues[k]) for k in ('HMAX', 'SMAX', 'VMAX'))
+
+    # HSV reference masks, boxes and time
+    VisionLibrary.tape_values['SEGMENT'] = 'hsv'
+    referenceMasks = [hsv_mask(img, opener) for img in frames]
+    referenceBoxes = [detect_box(vision, img) for img in frames]
+    hsvTime = time_frames(lambda img: vision.process_image_contours(img, hsvMin, hsvMax, True), frames)
+    print('%d frames, HSV chain %.3f ms per frame, tape found in %d' %
+          (len(frames), 1000 * hsvTime, sum(box is not None for box in referenceBoxes)))
+    print('%-20s %8s %8s %10s %10s %8s %8s' % ('mode', 'ms', 'speedup', 'mean IoU', 'worst IoU', 'boxes', 'matches'))
+
+    failures = 0
+    for mode, threshold, expected in modes:
+
+        # Select the mode the way the vision file would
+        VisionLibrary.tape_values.clear()
+        VisionLibrary.tape_values.update(tapeValues)
+        VisionLibrary.tape_values['SEGMENT'] = mode
+        if threshold is not None:
+            VisionLibrary.tape_values['THRESHOLD'] = threshold
+        segment = vision.segment_settings(VisionLibrary.tape_values)
+
+        # Masks and boxes against the HSV chain
+        overlaps = [overlap(opener.open_mask(vision.threshold_channel(img, segment)), reference)
+                    for img, reference in zip(frames, referenceMasks)]
+        agree = 0
+        for img, reference in zip(frames, referenceBoxes):
+            box = detect_box(vision, img)
+            if (box is None and reference is None) or \
+               (box is not None and reference is not None and np.max(np.abs(box - reference)) <= maxBoxError):
+                agree += 1
+        channelTime = time_frames(lambda img: vision.process_image_contours(img, hsvMin, hsvMax, True, segment), frames)
+
+        # Modes expected to match must, and the synthetic white lights must catch the others
+        matches = np.mean(overlaps) >= minOverlap and np.min(overlaps) >= minWorstOverlap and \
+                  agree >= minAgreement * len(frames)
+        name = mode + ' ' + str(segment[1])
+        print('%-20s %8.3f %7.1fx %10.3f %10.3f %4d/%-3d %8s' % (name, 1000 * channelTime, hsvTime / channelTime,
+                                                              np.mean(overlaps), np.min(overlaps), agree, len(frames),
+                                                              'yes' if matches else 'no'))
+        if (expected == True and (matches == False or channelTime >= hsvTime)) or \
+           (expected == False and matches == True and args.video is None):
+            failures += 1
+
+    VisionLibrary.tape_values.clear()
+    VisionLibrary.tape_values.update(tapeValues)
+    print('%d modes differ from the HSV chain, are not faster or were not caught by the white lights' % failures)
+    if failures > 0:
+        sys.exit(1)
+
+
+#define main function
+if __name__ == '__main__':
+    main()
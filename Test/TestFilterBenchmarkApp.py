@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/env python3
+
+####################################################################
+#                                                                  #
+#                 FRC Filter Benchmark Test App                    #
+#                                                                  #
+#  This program reports the cost of each blur and morphology       #
+#  configuration the vision file can select.  Synthetic field      #
+#  camera frames with balls are thresholded with the old chain     #
+#  (13x13 Gaussian, two 3x3 erodes and two 3x3 dilates) and with   #
+#  each configuration through process_image_contours.  Time per    #
+#  frame is reported next to how closely the mask matches the old  #
+#  chain.  The single opening must match the old erode and dilate  #
+#  passes exactly.  The half size row stands in for a reduced size #
+#  JPEG decode with no blur.                                       #
+#                                                                  #
+#  Usage: TestFilterBenchmarkApp.py [--settings file] [--frames n] #
+#                                                                  #
+#  @Version: 1.0                                                   #
+#  @Created: 2021-03-31                                            #
+#  @Author: Team 4121                                              #
+#                                                                  #
+####################################################################
+
+"""Blur and morphology benchmark application"""
+
+# System imports
+import sys
+import time
+import argparse
+
+# Setup paths
+sys.path.append('/home/pi/Team4121/Libraries')
+
+# Module imports
+import cv2 as cv
+import numpy as np
+
+# Team 4121 module imports
+from FRCVisionLibrary import VisionLibrary
+from FRCFilterLibrary import blur_image, open_mask, filter_settings
+from FRCSyntheticFrameLibrary import FRCSyntheticCamera
+
+# Set test values
+visionFile = '/home/pi/Team4121/Config/2021VisionSettings.txt'
+resolutions = [(320, 240), (640, 480)]
+cameraFOV = 27.3
+configurations = [('gaussian 13, open 5', {'BLUR': 13, 'BLURTYPE': 'gaussian'}, 1),
+                  ('box 9, open 5', {'BLUR': 13, 'BLURTYPE': 'box'}, 1),
+                  ('stack 13, open 5', {'BLUR': 13, 'BLURTYPE': 'stack'}, 1),
+                  ('gaussian 7, open 5', {'BLUR': 7, 'BLURTYPE': 'gaussian'}, 1),
+                  ('no blur, open 5', {'BLUR': 0}, 1),
+                  ('half size, no blur, open 3', {'BLUR': 0, 'ITERATIONS': 1}, 2)]
+
+
+# Define frame method
+def make_frames(vision, width, height, count):
+
+    camera = FRCSyntheticCamera(vision, width, height, cameraFOV, seed=4121)
+    random = np.random.default_rng(4121)
+    frames = []
+    for n in range(count):
+        balls = [(random.uniform(-30, 30), random.uniform(30, 200)) for i in range(5)]
+        img, truth = camera.render(balls, noise=random.uniform(2, 8))
+        frames.append(img)
+
+    return frames
+
+
+# Define old chain method (what process_image_contours did before filters were configurable)
+def old_mask(img, hsvMin, hsvMax):
+
+    kernel = np.ones((3, 3), np.uint8)
+    mask = cv.inRange(cv.cvtColor(cv.GaussianBlur(img, (13, 13), 0), cv.COLOR_BGR2HSV), hsvMin, hsvMax)
+    return cv.dilate(cv.erode(mask, kernel, iterations=2), kernel, iterations=2)
+
+
+# Define configured chain method
+def new_mask(img, hsvMin, hsvMax, filters):
+
+    blurSize, blurType, openSize = filters
+    mask = cv.inRange(cv.cvtColor(blur_image(img, blurSize, blurType), cv.COLOR_BGR2HSV), hsvMin, hsvMax)
+    return open_mask(mask, openSize)
+
+
+# Define overlap method (intersection over union, 1 when both are empty)
+def overlap(first, second):
+
+    union = cv.countNonZero(cv.bitwise_or(first, second))
+    if union == 0:
+        return 1.0
+    return cv.countNonZero(cv.bitwise_and(first, second)) / float(union)
+
+
+# Define timing method (milliseconds per frame, best of three)
+def time_frames(call, frames):
+
+    best = None
+    for r in range(3):
+        start = time.perf_counter()
+        for img in frames:
+            call(img)
+        seconds = (time.perf_counter() - start) / len(frames)
+        best = seconds if best is None else min(best, seconds)
+
+    return 1000 * best
+
+
+# Define main method
+def main():
+
+    # Parse arguments
+    parser = argparse.ArgumentParser(description='Benchmark blur and morphology configurations')
+    parser.add_argument('--settings', default=visionFile, help='vision settings file')
+    parser.add_argument('--frames', type=int, default=30, help='frames per resolution')
+    args = parser.parse_args()
+
+    vision = VisionLibrary(args.settings)
+    vision.segmenter = None
+    hsvMin = tuple(int(VisionLibrary.ball_values[k]) for k in ('HMIN', 'SMIN', 'VMIN'))
+    hsvMax = tuple(int(VisionLibrary.ball_values[k]) for k in ('HMAX', 'SMAX', 'VMAX'))
+    failures = 0
+
+    for width, height in resolutions:
+
+        frames = make_frames(vision, width, height, args.frames)
+        oldMasks = [old_mask(img, hsvMin, hsvMax) for img in frames]
+        oldTime = time_frames(lambda img: cv.findContours(old_mask(img, hsvMin, hsvMax), cv.RETR_EXTERNAL,
+                                                          cv.CHAIN_APPROX_SIMPLE), frames)
+        print('%dx%d' % (width, height))
+        print('%-28s %8s %8s %10s %10s' % ('configuration', 'ms', 'speedup', 'mean IoU', 'worst IoU'))
+        print('%-28s %8.3f %7.1fx %10.3f %10.3f' % ('old chain', oldTime, 1.0, 1.0, 1.0))
+
+        for name, values, scale in configurations:
+
+            # Reduced size decode stands in as an area resize
+            filters = filter_settings(values)
+            if scale > 1:
+                inputs = [cv.resize(img, (width // scale, height // scale), interpolation=cv.INTER_AREA)
+                          for img in frames]
+                references = [cv.resize(mask, (width // scale, height // scale), interpolation=cv.INTER_NEAREST)
+                              for mask in oldMasks]
+            else:
+                inputs = frames
+                references = oldMasks
+
+            overlaps = [overlap(new_mask(img, hsvMin, hsvMax, filters), reference)
+                        for img, reference in zip(inputs, references)]
+            newTime = time_frames(lambda img: vision.process_image_contours(img, hsvMin, hsvMax, True, None, filters),
+                                  inputs)
+            print('%-28s %8.3f %7.1fx %10.3f %10.3f' % (name, newTime, oldTime / newTime,
+                                                        np.mean(overlaps), np.min(overlaps)))
+
+            # Same settings as the old chain must give the same mask
+            if values.get('BLURTYPE') == 'gaussian' and values.get('BLUR') == 13 and np.min(overlaps) < 1.0:
+                failures += 1
+        print('')
+
+    print('%d resolutions where the default configuration differs from the old chain' % failures)
+    if failures > 0:
+        sys.exit(1)
+
+
+#define main function
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/env python3
+
+####################################################################
+#                                                                  #
+#                   FRC Frame Gate Test App                        #
+#                                                                  #
+#  This program checks the frame gate on a synthetic goal camera   #
+#  sequence: the robot sits still (pre-match and aiming), drives   #
+#  toward the goal, then sits still again.  Sensor noise is added  #
+#  to every frame.  It reports how many detections were reused,    #
+#  the time per frame with and without the gate, and the largest   #
+#  difference between a reused tape result and a fresh detection   #
+#  of the same frame.  It fails if the true tape position or width #
+#  moved more than staleLimit pixels between the frame a reused    #
+#  result came from and the frame it was reused for.               #
+#                                                                  #
+#  Usage: TestFrameGateApp.py [--settings file] [--noise sigma]    #
+#                                                                  #
+#  @Version: 1.0                                                   #
+#  @Created: 2021-03-28                                            #
+#  @Author: Team 4121                                              #
+#                                                                  #
+####################################################################
+
+"""Frame gate test application"""
+
+# System imports
+import sys
+import time
+import argparse
+
+# Setup paths
+sys.path.append('/home/pi/Team4121/Libraries')
+
+# Module imports
+import numpy as np
+
+# Team 4121 module imports
+from FRCVisionLibrary import VisionLibrary
+from FRCFrameGateLibrary import FRCFrameGate
+from FRCSyntheticFrameLibrary import FRCSyntheticCamera
+
+# Set test values
+visionFile = '/home/pi/Team4121/Config/2021VisionSettings.txt'
+imageWidth = 320
+imageHeight = 240
+cameraFOV = 23.5
+cameraFocalLength = 340.0
+cameraMountAngle = 25.0
+cameraMountHeight = 26.0
+staleLimit = 2
+
+
+# Define sequence method (still, driving, still; returns frames and true tape pixels)
+def make_sequence(vision, noise):
+
+    camera = FRCSyntheticCamera(vision, imageWidth, imageHeight, cameraFOV, cameraMountAngle, cameraMountHeight)
+    positions = [(10.0, 240.0, 4.0)] * 45
+    positions += [(10.0 - 0.2 * n, 240.0 - 2.0 * n, 4.0 - 0.1 * n) for n in range(1, 46)]
+    positions += [positions[-1]] * 45
+
+    # Render each distinct pose once so still frames differ only by noise
+    background = camera.background()
+    focal = camera.projection.cam_matrix[0, 0]
+    frames = []
+    pixels = []
+    for n, pose in enumerate(positions):
+        camera.random = np.random.default_rng(n)
+        img = background.copy()
+        truth = camera.draw_tape(img, *pose)
+        frames.append(camera.add_noise(img, noise))
+        pixels.append((focal * truth['x'] / truth['z'],
+                       focal * float(VisionLibrary.tape_values['TAPEWIDTH']) / truth['distance']))
+
+    return frames, np.array(pixels)
+
+
+# Define main method
+def main():
+
+    # Parse arguments
+    parser = argparse.ArgumentParser(description='Check the frame gate')
+    parser.add_argument('--settings', default=visionFile, help='vision settings file')
+    parser.add_argument('--noise', type=float, default=6.0, help='sensor noise sigma')
+    args = parser.parse_args()
+
+    vision = VisionLibrary(args.settings)
+    frames, pixels = make_sequence(vision, args.noise)
+
+    def detect(img):
+        return vision.detect_tape_rectangle(img, imageWidth, imageHeight, cameraFOV, cameraFocalLength,
+                                            cameraMountAngle, cameraMountHeight)
+
+    # Every frame processed
+    start = time.perf_counter()
+    fresh = [detect(img) for img in frames]
+    freshTime = (time.perf_counter() - start) / len(frames)
+
+    # Gated
+    gate = FRCFrameGate()
+    results = []
+    reused = []
+    sources = []
+    start = time.perf_counter()
+    for n, img in enumerate(frames):
+        results.append(gate.process(img, detect))
+        reused.append(gate.reused)
+        sources.append(sources[-1] if gate.reused else n)
+    gatedTime = (time.perf_counter() - start) / len(frames)
+
+    # Compare reused values with a fresh detection of the same frame
+    distanceErrors = [abs(r[1]['TapeDistance'] - f[1]['TapeDistance']) for r, f, u in zip(results, fresh, reused) if u]
+    angleErrors = [abs(r[1]['HAngle'] - f[1]['HAngle']) for r, f, u in zip(results, fresh, reused) if u]
+    staleness = np.abs(pixels - pixels[sources]).max(axis=1)
+    movingReused = sum(1 for n, u in enumerate(reused) if u and n > 0 and np.any(pixels[n] != pixels[n - 1]))
+    staleFrames = int(np.count_nonzero(staleness > staleLimit))
+
+    print('%d frames, %d reused (%d while moving)' % (len(frames), sum(reused), movingReused))
+    print('Largest true target motion behind a reused result: %.2f px' % staleness.max())
+    print('Every frame: %.2f ms per frame, gated: %.2f ms per frame' % (1000 * freshTime, 1000 * gatedTime))
+    if len(distanceErrors) > 0:
+        print('Reused vs fresh: distance max %.2f in, angle max %.2f deg' % (max(distanceErrors), max(angleErrors)))
+    print('%d reused results more than %d px stale' % (staleFrames, staleLimit))
+    if staleFrames > 0:
+        sys.exit(1)
+
+
+#define main function
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,201 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/env python3
+
+####################################################################
+#                                                                  #
+#                  FRC HSV Auto Tuner Test App                     #
+#                                                                  #
+#  This program checks the HSV range auto tuner.  Field camera     #
+#  frames with balls are rendered and labeled with a polygon just  #
+#  inside each ball, the same way a person would label recorded    #
+#  frames.  The tuner fits the HSV box from the labels and the     #
+#  box is applied to every frame (blurred like the pipeline); the  #
+#  mask must recover the labeled balls within the IoU limits, not  #
+#  counting the unlabeled ring at the blurred ball edge.  The      #
+#  summed volume table is checked against direct histogram sums    #
+#  over random boxes, and a histogram with empty bins around the   #
+#  target must give back its tightest bounds.                      #
+#                                                                  #
+#  Usage: TestHSVAutoTunerApp.py [--settings file] [--frames n]    #
+#                                                                  #
+#  @Version: 1.0                                                   #
+#  @Created: 2021-04-02                                            #
+#  @Author: Team 4121                                              #
+#                                                                  #
+####################################################################
+
+"""HSV auto tuner test application"""
+
+# System imports
+import sys
+import os
+import json
+import math
+import tempfile
+import argparse
+
+# Setup paths (the tuner is a utility, next to this folder)
+sys.path.append('/home/pi/Team4121/Libraries')
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'Utilities'))
+
+# Module imports
+import cv2 as cv
+import numpy as np
+
+# Team 4121 module imports
+from FRCVisionLibrary import VisionLibrary
+from FRCFilterLibrary import filter_settings, blur_image
+from FRCSyntheticFrameLibrary import FRCSyntheticCamera
+from HSV_Auto_Tuner import load_labels, build_histograms, fit_box, summed_volume, box_sum, pick_bound, \
+                           bin_sizes, bin_counts
+
+# Set test values
+visionFile = '/home/pi/Team4121/Config/2021VisionSettings.txt'
+imageWidth = 320
+imageHeight = 240
+cameraFOV = 27.3
+labelShare = 0.85
+minMeanIoU = 0.9
+minWorstIoU = 0.8
+volumeBoxes = 200
+
+
+# Define labeled frame method (writes the frames and labels file, returns the label and edge ring masks)
+def write_labels(vision, folder, count):
+
+    camera = FRCSyntheticCamera(vision, imageWidth, imageHeight, cameraFOV, seed=4121)
+    random = np.random.default_rng(4121)
+    frames = []
+    masks = []
+    rings = []
+    for n in range(count):
+        balls = [(d * math.tan(math.radians(a)), d) for a, d in ((random.uniform(-20, -5), random.uniform(40, 120)),
+                                                                 (random.uniform(5, 20), random.uniform(60, 200)))]
+        img, truth = camera.render(balls=balls, noise=random.uniform(2, 6))
+        filename = 'frame_%03d.png' % n
+        cv.imwrite(os.path.join(folder, filename), img)
+
+        # Label just inside each ball, the rest of the ball is the unlabeled edge ring
+        mask = np.zeros((imageHeight, imageWidth), dtype=np.uint8)
+        ring = np.zeros((imageHeight, imageWidth), dtype=np.uint8)
+        polygons = []
+        for ball in truth['balls']:
+            radius = labelShare * ball['radius']
+            polygons.append([[ball['x'] + radius * math.cos(a), ball['y'] + radius * math.sin(a)]
+                             for a in np.linspace(0, 2 * math.pi, 24, endpoint=False)])
+            cv.circle(ring, (int(round(ball['x'])), int(round(ball['y']))), int(round(ball['radius'])), 255, -1)
+        cv.fillPoly(mask, [np.array(p, dtype=np.int32) for p in polygons], 255)
+        ring[mask > 0] = 0
+        frames.append({'image': filename, 'target': polygons})
+        masks.append(mask)
+        rings.append(ring)
+
+    labelFile = os.path.join(folder, 'labels.json')
+    with open(labelFile, 'w') as out_file:
+        json.dump({'frames': frames}, out_file)
+
+    return labelFile, masks, rings
+
+
+# Define overlap method (intersection over union outside the ignored pixels)
+def overlap(first, second, ignore):
+
+    union = cv.countNonZero(cv.bitwise_and(cv.bitwise_or(first, second), cv.bitwise_not(ignore)))
+    if union == 0:
+        return 1.0
+    return cv.countNonZero(cv.bitwise_and(first, second)) / float(union)
+
+
+# Define summed volume check method (returns the largest difference from direct sums)
+def check_volume(random):
+
+    hist = random.integers(0, 5, bin_counts) * (random.random(bin_counts) < 0.05)
+    table = summed_volume(hist)
+    worst = 0
+    for n in range(volumeBoxes):
+        lo = [int(random.integers(0, c)) for c in bin_counts]
+        hi = [int(random.integers(l, c)) for l, c in zip(lo, bin_counts)]
+        direct = int(hist[lo[0]:hi[0] + 1, lo[1]:hi[1] + 1, lo[2]:hi[2] + 1].sum())
+        worst = max(worst, abs(int(box_sum(table, lo, hi)) - direct))
+
+    # A bound given as an array gives one sum per value (as the box search scans it)
+    lows = np.arange(0, hi[0] + 1)
+    scanned = box_sum(table, [lows, lo[1], lo[2]], hi)
+    for low, total in zip(lows, scanned):
+        direct = int(hist[low:hi[0] + 1, lo[1]:hi[1] + 1, lo[2]:hi[2] + 1].sum())
+        worst = max(worst, abs(int(total) - direct))
+
+    return worst
+
+
+# Define tightest bound check method (returns the fitted and expected HSV boxes)
+def check_tightest():
+
+    # Target bins with empty bins around them, then background further out on every side
+    targetHist = np.zeros(bin_counts, dtype=np.int64)
+    backgroundHist = np.zeros(bin_counts, dtype=np.int64)
+    lo = (40, 30, 20)
+    hi = (50, 40, 30)
+    targetHist[lo[0]:hi[0] + 1, lo[1]:hi[1] + 1, lo[2]:hi[2] + 1] = 10
+    backgroundHist[lo[0] - 10:hi[0] + 11, lo[1] - 10:hi[1] + 11, lo[2] - 10:hi[2] + 11] = 1
+    backgroundHist[lo[0] - 5:hi[0] + 6, lo[1] - 5:hi[1] + 6, lo[2] - 5:hi[2] + 6] = 0
+
+    hsvMin, hsvMax, best, precision, recall = fit_box(targetHist, backgroundHist)
+    expectedMin = [lo[a] * bin_sizes[a] for a in range(3)]
+    expectedMax = [(hi[a] + 1) * bin_sizes[a] - 1 for a in range(3)]
+
+    return (hsvMin, hsvMax), (expectedMin, expectedMax)
+
+
+# Define main method
+def main():
+
+    # Parse arguments
+    parser = argparse.ArgumentParser(description='Check the HSV range auto tuner')
+    parser.add_argument('--settings', default=visionFile, help='vision settings file')
+    parser.add_argument('--frames', type=int, default=8, help='labeled frames to fit')
+    args = parser.parse_args()
+
+    vision = VisionLibrary(args.settings)
+    blurSize, blurType, openSize = filter_settings(VisionLibrary.ball_values)
+    failures = 0
+
+    # Fit labeled frames and apply the box to every frame
+    with tempfile.TemporaryDirectory() as folder:
+        labelFile, masks, rings = write_labels(vision, folder, args.frames)
+        frames = load_labels(labelFile)
+        targetHist, backgroundHist = build_histograms(frames, blurSize, blurType)
+        hsvMin, hsvMax, iou, precision, recall = fit_box(targetHist, backgroundHist)
+        overlaps = []
+        for frame, mask, ring in zip(frames, masks, rings):
+            hsv = cv.cvtColor(blur_image(cv.imread(frame['image']), blurSize, blurType), cv.COLOR_BGR2HSV)
+            overlaps.append(overlap(cv.inRange(hsv, tuple(hsvMin), tuple(hsvMax)), mask, ring))
+    print('Fitted %d frames: HSV min %s  HSV max %s  (labeled IoU %.3f)' %
+          (len(frames), tuple(hsvMin), tuple(hsvMax), iou))
+    print('Labeled ball IoU: mean %.3f  worst %.3f' % (np.mean(overlaps), np.min(overlaps)))
+    if np.mean(overlaps) < minMeanIoU or np.min(overlaps) < minWorstIoU:
+        failures += 1
+
+    # Summed volume table against direct sums
+    worst = check_volume(np.random.default_rng(4121))
+    print('Summed volume table: largest difference from direct sums %d' % worst)
+    if worst != 0:
+        failures += 1
+
+    # Tightest bounds that reach the best score
+    fitted, expected = check_tightest()
+    print('Tightest bounds: fitted %s %s, expected %s %s' % (tuple(fitted[0]), tuple(fitted[1]),
+                                                            tuple(expected[0]), tuple(expected[1])))
+    if [list(b) for b in fitted] != [list(b) for b in expected] or \
+       pick_bound(np.array([0.2, 0.9, 0.9, 0.9, 0.1]), True) != 3 or \
+       pick_bound(np.array([0.2, 0.9, 0.9, 0.9, 0.1]), False) != 1:
+        failures += 1
+
+    print('%d tuner checks failed' % failures)
+    if failures > 0:
+        sys.exit(1)
+
+
+#define main function
+if __name__ == '__main__':
+    main()
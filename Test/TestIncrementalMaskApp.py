@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/env python3
+
+####################################################################
+#                                                                  #
+#                 FRC Incremental Mask Test App                    #
+#                                                                  #
+#  This program checks and benchmarks incremental morphology.      #
+#  Ball masks are made from synthetic frames where a few balls     #
+#  stay still and a growing number of balls move, so the share of  #
+#  the mask that changes each frame goes from nothing to most of   #
+#  it.  For each step the cleaned mask and contours from the       #
+#  incremental path are checked against processing the whole mask  #
+#  and the paths are timed: always incremental, which shows the    #
+#  dirty share where it stops paying off, and with the default     #
+#  fallback to the whole mask, which must not be more than 20%     #
+#  slower than the whole mask when anything moves.                 #
+#                                                                  #
+#  Usage: TestIncrementalMaskApp.py [--settings file]              #
+#                                                                  #
+#  @Version: 1.0                                                   #
+#  @Created: 2021-03-28                                            #
+#  @Author: Team 4121                                              #
+#                                                                  #
+####################################################################
+
+"""Incremental mask test application"""
+
+# System imports
+import sys
+import time
+import argparse
+
+# Setup paths
+sys.path.append('/home/pi/Team4121/Libraries')
+
+# Module imports
+import cv2 as cv
+import numpy as np
+
+# Team 4121 module imports
+from FRCVisionLibrary import VisionLibrary
+from FRCIncrementalMaskLibrary import FRCIncrementalMask
+from FRCSyntheticFrameLibrary import FRCSyntheticCamera
+
+# Set test values
+visionFile = '/home/pi/Team4121/Config/2021VisionSettings.txt'
+resolutions = [(320, 240), (640, 480)]
+cameraFOV = 27.3
+frameCount = 40
+movingCounts = [0, 1, 2, 4, 8, 16, 32, 64]
+
+
+# Define mask sequence method (three still balls plus moving ones)
+def make_masks(vision, width, height, moving, seed):
+
+    camera = FRCSyntheticCamera(vision, width, height, cameraFOV, seed=seed)
+    random = np.random.default_rng(seed)
+    hsvMin = tuple(int(VisionLibrary.ball_values[k]) for k in ('HMIN', 'SMIN', 'VMIN'))
+    hsvMax = tuple(int(VisionLibrary.ball_values[k]) for k in ('HMAX', 'SMAX', 'VMAX'))
+
+    still = [(-20.0, 80.0), (5.0, 120.0), (25.0, 60.0)]
+    starts = [(random.uniform(-60, 60), random.uniform(50, 240)) for i in range(moving)]
+    steps = [(random.uniform(-1, 1), random.uniform(-3, 3)) for i in range(moving)]
+    background = camera.background()
+
+    masks = []
+    for n in range(frameCount):
+        img = background.copy()
+        balls = still + [(x + n * dx, max(z + n * dz, 30.0)) for (x, z), (dx, dz) in zip(starts, steps)]
+        for lateral, distance in sorted(balls, key=lambda b: -b[1]):
+            camera.draw_ball(img, lateral, distance)
+        blur = cv.GaussianBlur(img, (13, 13), 0)
+        masks.append(cv.inRange(cv.cvtColor(blur, cv.COLOR_BGR2HSV), hsvMin, hsvMax))
+
+    return masks
+
+
+# Define contour comparison key (order does not matter)
+def contour_key(contours):
+
+    return sorted((cv.boundingRect(c), cv.contourArea(c)) for c in contours)
+
+
+# Define full mask timing method
+def time_full(masks, opener):
+
+    start = time.perf_counter()
+    for mask in masks:
+        cv.findContours(opener.open_mask(mask), cv.RETR_EXTERNAL, cv.CHAIN_APPROX_SIMPLE)
+    return (time.perf_counter() - start) / len(masks)
+
+
+# Define incremental timing method (returns seconds per frame and dirty share)
+def time_incremental(masks, maxDirty):
+
+    incremental = FRCIncrementalMask(maxDirty=maxDirty)
+    incremental.update(masks[0])
+    dirty = []
+    start = time.perf_counter()
+    for mask in masks[1:]:
+        incremental.update(mask)
+        dirty.append(incremental.dirtyShare)
+    seconds = (time.perf_counter() - start) / (len(masks) - 1)
+
+    return seconds, float(np.mean(dirty))
+
+
+# Define correctness check method (returns number of mismatched frames)
+def check_masks(masks, maxDirty):
+
+    incremental = FRCIncrementalMask(maxDirty=maxDirty)
+    mismatches = 0
+    for mask in masks:
+        opened, contours = incremental.update(mask)
+        full = incremental.open_mask(mask)
+        fullContours, _ = cv.findContours(full, cv.RETR_EXTERNAL, cv.CHAIN_APPROX_SIMPLE)
+        if np.any(opened != full) or contour_key(contours) != contour_key(fullContours):
+            mismatches += 1
+
+    return mismatches
+
+
+# Define main method
+def main():
+
+    # Parse arguments
+    parser = argparse.ArgumentParser(description='Check and benchmark incremental morphology')
+    parser.add_argument('--settings', default=visionFile, help='vision settings file')
+    args = parser.parse_args()
+
+    vision = VisionLibrary(args.settings)
+    opener = FRCIncrementalMask()
+    mismatches = 0
+    slower = 0
+
+    for width, height in resolutions:
+
+        print('%dx%d' % (width, height))
+        print('%8s %8s %10s %12s %8s %12s %8s' % ('moving', 'dirty', 'full ms', 'incremental', 'speedup',
+                                                 'with limit', 'speedup'))
+        crossover = None
+        for moving in movingCounts:
+            masks = make_masks(vision, width, height, moving, 4121 + moving)
+            mismatches += check_masks(masks, 1.0) + check_masks(masks, opener.maxDirty)
+            fullTime = min(time_full(masks, opener) for r in range(3))
+            incrementalTime, dirtyShare = min(time_incremental(masks, 1.0) for r in range(3))
+            limitTime = min(time_incremental(masks, opener.maxDirty)[0] for r in range(3))
+            print('%8d %7.0f%% %10.3f %12.3f %7.1fx %12.3f %7.1fx' %
+                  (moving, 100 * dirtyShare, 1000 * fullTime, 1000 * incrementalTime, fullTime / incrementalTime,
+                   1000 * limitTime, fullTime / limitTime))
+            if crossover is None and incrementalTime >= fullTime:
+                crossover = dirtyShare
+            if moving > 0 and limitTime > 1.2 * fullTime:
+                slower += 1
+        if crossover is None:
+            print('Incremental was faster at every step')
+        else:
+            print('Crossover near %.0f%% of the frame dirty' % (100 * crossover))
+        print('')
+
+    print('%d frames differ from processing the whole mask' % mismatches)
+    print('%d steps slower than processing the whole mask' % slower)
+    if mismatches > 0 or slower > 0:
+        sys.exit(1)
+
+
+#define main function
+if __name__ == '__main__':
+    main()
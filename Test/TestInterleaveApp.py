@@ -0,0 +1,255 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/env python3
+
+####################################################################
+#                                                                  #
+#                   FRC Interleave Test App                        #
+#                                                                  #
+#  This program checks dual exposure interleaving in FRCWebCam.    #
+#  A simulated camera blends a dark frame (tape only) and a bright #
+#  frame by its exposure level.  A manual exposure shows up a      #
+#  frame late like a real V4L2 camera, while auto exposure starts  #
+#  from the current level and only closes part of the gap each     #
+#  frame.  The camera is read the way the main loop reads the goal #
+#  camera.  Dark frames go to detect_tape_rectangle, bright frames #
+#  would go to the recorder.  For each driver exposure and settle  #
+#  frame count the achieved tracking and driver rates are          #
+#  reported, with the frames that came out with the wrong          #
+#  exposure.  Auto driver exposure with few settle frames must be  #
+#  refused, and driver frames must come out bright otherwise.      #
+#                                                                  #
+#  Usage: TestInterleaveApp.py [--settings file] [--seconds s]     #
+#                                                                  #
+#  @Version: 1.0                                                   #
+#  @Created: 2021-03-30                                            #
+#  @Author: Team 4121                                              #
+#                                                                  #
+####################################################################
+
+"""Interleaved capture test application"""
+
+# System imports
+import sys
+import os
+import time
+import tempfile
+import argparse
+
+# Setup paths
+sys.path.append('/home/pi/Team4121/Libraries')
+
+# Module imports
+import cv2 as cv
+import numpy as np
+
+# Team 4121 module imports
+from FRCVisionLibrary import VisionLibrary
+from FRCCameraLibrary import FRCWebCam, driver_exposure, auto_settle_frames
+from FRCCameraControlLibrary import AUTO_EXPOSURE_MANUAL
+from FRCSyntheticFrameLibrary import FRCSyntheticCamera
+
+# Set test values
+visionFile = '/home/pi/Team4121/Config/2021VisionSettings.txt'
+imageWidth = 320
+imageHeight = 240
+cameraFOV = 23.5
+cameraFocalLength = 340.0
+cameraMountAngle = 25.0
+cameraMountHeight = 26.0
+cameraFPS = 30
+driverFPS = 5
+exposureLag = 1
+autoExposureRate = 0.35  # share of the gap to full exposure closed per auto exposure frame
+darkShare = 0.1  # tracking frames must be within this share of the dark frame
+brightShare = 0.9  # driver frames must be within this share of the bright frame
+minDetectionRate = 0.9
+
+
+# Define the simulated exposure camera class
+class SimulatedExposureCamera:
+
+    # Define initialization
+    def __init__(self, dark, bright, fps, lag, fullExposure):
+
+        self.dark = dark
+        self.bright = bright
+        self.period = 1.0 / fps
+        self.fullExposure = float(fullExposure)
+        self.values = {}
+        self.history = [(True, 0.0)] * (lag + 1)
+        self.level = 0.0
+        self.nextTime = time.monotonic()
+        self.frame = None
+
+
+    # Define property set method
+    def set(self, prop, value):
+
+        self.values[prop] = float(value)
+        return True
+
+
+    # Define property get method
+    def get(self, prop):
+
+        return self.values.get(prop, 0.0)
+
+
+    # Define opened check method
+    def isOpened(self):
+
+        return True
+
+
+    # Define grab method (paced like the camera, exposure shows up lag frames late)
+    def grab(self):
+
+        delay = self.nextTime - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        self.nextTime = max(self.nextTime, time.monotonic() - self.period) + self.period
+
+        # Manual exposure is taken as set, auto exposure creeps up from the current level
+        manual = self.values.get(cv.CAP_PROP_AUTO_EXPOSURE) == AUTO_EXPOSURE_MANUAL
+        self.history = self.history[1:] + [(manual, self.values.get(cv.CAP_PROP_EXPOSURE, 0.0))]
+        manual, exposure = self.history[0]
+        if manual:
+            self.level = min(max(exposure / self.fullExposure, 0.0), 1.0)
+        else:
+            self.level += (1.0 - self.level) * autoExposureRate
+        self.frame = cv.addWeighted(self.dark, 1.0 - self.level, self.bright, self.level, 0)
+        return True
+
+
+    # Define retrieve method
+    def retrieve(self):
+
+        return True, self.frame.copy()
+
+
+    # Define read method
+    def read(self):
+
+        self.grab()
+        return self.retrieve()
+
+
+    # Define release method
+    def release(self):
+
+        pass
+
+
+# Define frame method (returns the dark and the bright frame)
+def make_frames(vision):
+
+    camera = FRCSyntheticCamera(vision, imageWidth, imageHeight, cameraFOV, cameraMountAngle, cameraMountHeight, 4121)
+    background = camera.background()
+    dark = (background * 0.2).astype(np.uint8)
+    camera.draw_tape(dark, 10.0, 200.0, 4.0)
+    bright = cv.add(background, (60, 60, 60, 0))
+    camera.draw_tape(bright, 10.0, 200.0, 4.0)
+
+    return camera.add_noise(dark, 2.0), camera.add_noise(bright, 2.0)
+
+
+# Define camera method (an FRCWebCam on a stand-in file, then moved to the simulation)
+def make_camera(videoFile, dark, bright, exposure, settle):
+
+    settings = {'Width': imageWidth, 'Height': imageHeight, 'FPS': cameraFPS, 'Brightness': 0, 'Exposure': 0,
+                'Capture': 'mjpeg', 'Interleave': 1, 'DriverFPS': driverFPS, 'SettleFrames': settle,
+                'DriverExposure': exposure}
+    camera = FRCWebCam(videoFile, 'GoalCam', settings, 'InterleaveTest')
+    camera.camStream = SimulatedExposureCamera(dark, bright, cameraFPS, exposureLag, driver_exposure)
+    camera.control.stream = camera.camStream
+    camera.control.reset()
+    camera.control.use_profile('tracking')
+
+    # Let the low exposure reach the sensor before timing starts
+    for n in range(exposureLag):
+        camera.camStream.grab()
+
+    return camera
+
+
+# Define main method
+def main():
+
+    # Parse arguments
+    parser = argparse.ArgumentParser(description='Check dual exposure interleaved capture')
+    parser.add_argument('--settings', default=visionFile, help='vision settings file')
+    parser.add_argument('--seconds', type=float, default=3.0, help='run time per settle frame count')
+    args = parser.parse_args()
+
+    vision = VisionLibrary(args.settings)
+    dark, bright = make_frames(vision)
+
+    # FRCWebCam opens the stand-in file before it is moved to the simulation
+    tempDir = tempfile.TemporaryDirectory()
+    videoFile = os.path.join(tempDir.name, 'standin.avi')
+    writer = cv.VideoWriter(videoFile, cv.VideoWriter_fourcc('M', 'J', 'P', 'G'), cameraFPS, (imageWidth, imageHeight))
+    writer.write(dark)
+    writer.release()
+
+    # Brightness limits between the dark and the bright frame
+    darkMean = np.mean(dark)
+    brightMean = np.mean(bright)
+    darkLimit = darkMean + darkShare * (brightMean - darkMean)
+    brightLimit = darkMean + brightShare * (brightMean - darkMean)
+
+    # Auto driver exposure cannot settle in a frame or two
+    failures = 0
+    try:
+        make_camera(videoFile, dark, bright, 'auto', exposureLag)
+        print('Auto driver exposure with %d settle frames was not refused' % exposureLag)
+        failures += 1
+    except ValueError as refused:
+        print('Refused: ' + str(refused))
+
+    print('%8s %6s %12s %10s %8s %12s %12s %10s' % ('driver', 'settle', 'tracking fps', 'driver fps', 'dropped',
+                                                    'bright track', 'dark driver', 'detected'))
+    for exposure, settle in (('default', 0), ('default', exposureLag), ('auto', auto_settle_frames)):
+
+        camera = make_camera(videoFile, dark, bright, exposure, settle)
+        wrongTracking = 0
+        wrongDriver = 0
+        found = 0
+        start = time.monotonic()
+        while time.monotonic() - start < args.seconds:
+
+            # Dark frame to the detector, bright frame (when there is one) to the recorder
+            img = camera.read_frame_interleaved()
+            if np.mean(img) > darkLimit:
+                wrongTracking += 1
+            found += vision.detect_tape_rectangle(img, imageWidth, imageHeight, cameraFOV, cameraFocalLength,
+                                                  cameraMountAngle, cameraMountHeight)[2] == True
+            if camera.driver_frame is not None and np.mean(camera.driver_frame) < brightLimit:
+                wrongDriver += 1
+
+        seconds = time.monotonic() - start
+        counts = camera.frame_counts
+        print('%8s %6d %12.1f %10.1f %8d %12d %12d %9.0f%%' % (exposure, settle, counts['tracking'] / seconds,
+                                                             counts['driver'] / seconds, counts['settle'],
+                                                             wrongTracking, wrongDriver,
+                                                             100.0 * found / counts['tracking']))
+
+        # With settle frames covering the exposure lag every frame must be right
+        if settle >= exposureLag:
+            if wrongTracking > 0 or wrongDriver > 0 or counts['driver'] == 0 or \
+               found < minDetectionRate * counts['tracking']:
+                failures += 1
+
+        # A fixed driver exposure must also keep the driver rate
+        if settle >= exposureLag and exposure == 'default' and \
+           abs(counts['driver'] / seconds - driverFPS) > 0.2 * driverFPS:
+            failures += 1
+
+    tempDir.cleanup()
+    print('%d interleave checks failed' % failures)
+    if failures > 0:
+        sys.exit(1)
+
+
+#define main function
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,256 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/env python3
+
+####################################################################
+#                                                                  #
+#                  FRC MJPEG Capture Test App                      #
+#                                                                  #
+#  This program benchmarks capture and decode CPU time per frame.  #
+#  An MJPEG AVI stands in for the camera: either a recording made  #
+#  by the vision program or one rendered here from synthetic       #
+#  frames.  Each frame is read with cv.VideoCapture (full decode   #
+#  in the backend), then with FRCMjpegCapture in every decode mode #
+#  and as compressed bytes only.  Reduced size decodes are checked #
+#  against a full decode shrunk to the same size.  Each color mode #
+#  is also recorded through FRCWebCam with some frames of the     #
+#  wrong size mixed in.  Those must be skipped, and every index    #
+#  row must seek to its own frame.  The gray modes are refused.    #
+#  A recording copied before the camera is released (as after a    #
+#  power loss), with and without its last index rows, must still   #
+#  load with every row seeking to its own frame.                   #
+#                                                                  #
+#  Usage: TestMjpegCaptureApp.py [--settings file] [--video file]  #
+#                                                                  #
+#  @Version: 1.0                                                   #
+#  @Created: 2021-03-29                                            #
+#  @Author: Team 4121                                              #
+#                                                                  #
+####################################################################
+
+"""MJPEG capture test application"""
+
+# System imports
+import sys
+import os
+import time
+import shutil
+import tempfile
+import argparse
+
+# Setup paths
+sys.path.append('/home/pi/Team4121/Libraries')
+
+# Module imports
+import cv2 as cv
+import numpy as np
+
+# Team 4121 module imports
+from FRCVisionLibrary import VisionLibrary
+from FRCCameraLibrary import FRCWebCam
+from FRCMjpegCaptureLibrary import FRCMjpegCapture, decode_modes
+from FRCRecordingLibrary import load_recording, read_frame, get_index_filename
+from FRCSyntheticFrameLibrary import FRCSyntheticCamera
+
+# Set test values
+visionFile = '/home/pi/Team4121/Config/2021VisionSettings.txt'
+frameWidth = 640
+frameHeight = 480
+frameCount = 120
+cameraFOV = 27.3
+maxMeanError = 6.0
+recordFrames = 20
+lostRows = 5
+
+
+# Define video synthesis method (renders an MJPEG AVI of moving balls)
+def write_video(vision, filename, width, height, count):
+
+    camera = FRCSyntheticCamera(vision, width, height, cameraFOV, seed=4121)
+    random = np.random.default_rng(4121)
+    writer = cv.VideoWriter(filename, cv.VideoWriter_fourcc('M', 'J', 'P', 'G'), 30, (width, height))
+    for n in range(count):
+        balls = [(-20 + n * 0.3, 90.0), (10.0, 150 - n * 0.5), (random.uniform(-30, 30), 60.0)]
+        img, truth = camera.render(balls, [(0.0, 120.0)], noise=4.0)
+        writer.write(img)
+    writer.release()
+
+
+# Define timing method (returns CPU ms per frame, wall ms per frame and last frame)
+def time_reads(read, count):
+
+    frame = None
+    startCpu = time.process_time()
+    startWall = time.perf_counter()
+    for n in range(count):
+        frame = read()
+    cpu = 1000 * (time.process_time() - startCpu) / count
+    wall = 1000 * (time.perf_counter() - startWall) / count
+
+    return cpu, wall, frame
+
+
+# Define recording check method (returns frames indexed and frames found at their row, None if refused)
+def record_frames(videoFile, folder, decode, count):
+
+    settings = {'Width': frameWidth, 'Height': frameHeight, 'FPS': 15, 'Brightness': 0, 'Exposure': 0,
+                'Capture': 'mjpeg', 'Decode': decode, 'VideoDirectory': folder}
+    try:
+        camera = FRCWebCam(videoFile, 'TestCam', settings, 'record_' + decode)
+    except ValueError:
+        return None
+
+    # Every third frame is doubled in size, as a resized display frame would be
+    frames = []
+    for n in range(count):
+        frame = camera.read_frame()
+        if n % 3 == 2:
+            camera.write_video(cv.resize(frame, (2 * frame.shape[1], 2 * frame.shape[0])), {'time': -1})
+        if camera.write_video(frame, {'time': len(frames)}) == True:
+            frames.append(frame)
+    camera.release_cam()
+
+    # Each row must seek to the frame written with it
+    rows = load_recording(camera.videoFilename)
+
+    return len(rows), count_matched(camera.videoFilename, rows, frames)
+
+
+# Define matched row count method (rows that seek to the frame written with them)
+def count_matched(videoFile, rows, frames):
+
+    matched = 0
+    for row in rows:
+        img = read_frame(videoFile, row['offset'], row['size'])
+        errors = [np.mean(cv.absdiff(img, frame)) for frame in frames]
+        matched += int(np.argmin(errors)) == int(row['time'])
+
+    return matched
+
+
+# Define power loss check method (returns rows and matched rows for the copy as written and
+# for a copy missing its last index rows, with the next row cut off part way)
+def power_loss_frames(videoFile, folder, count):
+
+    settings = {'Width': frameWidth, 'Height': frameHeight, 'FPS': 15, 'Brightness': 0, 'Exposure': 0,
+                'Capture': 'mjpeg', 'Decode': 'color', 'VideoDirectory': folder}
+    camera = FRCWebCam(videoFile, 'TestCam', settings, 'power_loss')
+    frames = []
+    for n in range(count):
+        frame = camera.read_frame()
+        camera.write_video(frame, {'time': n})
+        frames.append(frame)
+
+    # Copy the files as they are on disk while the camera is still recording
+    results = []
+    for name, keepRows in (('unclosed', None), ('lost_rows', count - lostRows)):
+        copyFile = os.path.join(folder, name + '.avi')
+        shutil.copyfile(camera.videoFilename, copyFile)
+        with open(get_index_filename(camera.videoFilename), 'r') as in_file:
+            lines = in_file.readlines()
+        if keepRows is not None:
+            lines = lines[0:keepRows + 1] + [line[0:8] for line in lines[keepRows + 1:keepRows + 2]]
+        with open(get_index_filename(copyFile), 'w') as out_file:
+            out_file.writelines(lines)
+        rows = load_recording(copyFile)
+        results.append((len(rows), count_matched(copyFile, rows, frames)))
+    camera.release_cam()
+
+    return results
+
+
+# Define main method
+def main():
+
+    # Parse arguments
+    parser = argparse.ArgumentParser(description='Benchmark MJPEG capture and decode')
+    parser.add_argument('--settings', default=visionFile, help='vision settings file')
+    parser.add_argument('--video', default=None, help='MJPEG AVI to use instead of synthetic frames')
+    parser.add_argument('--frames', type=int, default=frameCount, help='frames to read per mode')
+    args = parser.parse_args()
+
+    # Make a synthetic recording when none was given
+    videoFile = args.video
+    tempDir = None
+    if videoFile is None:
+        tempDir = tempfile.TemporaryDirectory()
+        videoFile = os.path.join(tempDir.name, 'synthetic.avi')
+        write_video(VisionLibrary(args.settings), videoFile, frameWidth, frameHeight, args.frames)
+
+    # Read every frame once through the backend as the reference
+    stream = cv.VideoCapture(videoFile)
+    reference = []
+    while True:
+        grabbed, frame = stream.read()
+        if grabbed == False:
+            break
+        reference.append(frame)
+    stream.release()
+    if len(reference) == 0:
+        print('Unable to read video file: ' + videoFile)
+        sys.exit(1)
+    count = min(args.frames, len(reference))
+    print('%s: %d frames %dx%d' % (os.path.basename(videoFile), len(reference),
+                                    reference[0].shape[1], reference[0].shape[0]))
+    print('%-14s %8s %8s %10s %8s' % ('mode', 'cpu ms', 'wall ms', 'size', 'error'))
+
+    # Backend full decode
+    stream = cv.VideoCapture(videoFile)
+    cpu, wall, frame = time_reads(lambda: stream.read()[1], count)
+    stream.release()
+    baseline = cpu
+    print('%-14s %8.2f %8.2f %10s %8s' % ('VideoCapture', cpu, wall, '%dx%d' % (frame.shape[1], frame.shape[0]), '-'))
+
+    # Compressed bytes only (what a recorder or a skipped frame costs)
+    capture = FRCMjpegCapture(videoFile)
+    cpu, wall, data = time_reads(lambda: capture.grab() and capture.retrieve_compressed(), count)
+    print('%-14s %8.2f %8.2f %10s %8s' % ('compressed', cpu, wall, '%d kB' % (data.size // 1024), '-'))
+    capture.release()
+
+    # Each decode mode, checked against a shrunk full decode
+    failures = 0
+    for decode in decode_modes:
+        capture = FRCMjpegCapture(videoFile, decode)
+        cpu, wall, frame = time_reads(lambda: capture.read()[1], count)
+        capture.release()
+
+        expected = reference[(count - 1) % len(reference)]
+        if decode.startswith('gray'):
+            expected = cv.cvtColor(expected, cv.COLOR_BGR2GRAY)
+        expected = cv.resize(expected, (frame.shape[1], frame.shape[0]), interpolation=cv.INTER_AREA)
+        error = float(np.mean(cv.absdiff(frame, expected)))
+        if frame.shape[0:2] != (reference[0].shape[0] // capture.scale, reference[0].shape[1] // capture.scale) or \
+           error > maxMeanError:
+            failures += 1
+        print('%-14s %8.2f %8.2f %10s %8.2f  %.1fx' % (decode, cpu, wall, '%dx%d' % (frame.shape[1], frame.shape[0]),
+                                                       error, baseline / max(cpu, 1e-6)))
+
+    # Record each decode mode through the camera class (grayscale must be refused)
+    with tempfile.TemporaryDirectory() as folder:
+        for decode in decode_modes:
+            result = record_frames(videoFile, folder, decode, recordFrames)
+            if result is None:
+                print('%-14s refused by FRCWebCam' % decode)
+            else:
+                print('%-14s indexed %d of %d frames, %d seek to their own frame' %
+                      (decode, result[0], recordFrames, result[1]))
+            if decode.startswith('gray') != (result is None) or \
+               (result is not None and result != (recordFrames, recordFrames)):
+                failures += 1
+
+        # Recordings cut off before the camera is released
+        for name, (rows, matched) in zip(('unclosed', 'lost rows'), power_loss_frames(videoFile, folder, recordFrames)):
+            print('%-14s loaded %d rows of %d frames, %d seek to their own frame' % (name, rows, recordFrames, matched))
+            if rows == 0 or matched != rows:
+                failures += 1
+
+    if tempDir is not None:
+        tempDir.cleanup()
+
+    print('%d decode modes gave the wrong size, differ from a full decode or were not recorded' % failures)
+    if failures > 0:
+        sys.exit(1)
+
+
+#define main function
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,187 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/env python3
+
+####################################################################
+#                                                                  #
+#                   FRC Navx Replay Test App                       #
+#                                                                  #
+#  This program replays an IMU trace through FRCNavx using the     #
+#  simulated VMX backend.  Vision frames are simulated at the      #
+#  camera frame rate with a processing latency so the latency      #
+#  compensated target bearing can be compared with the bearing     #
+#  computed from the current gyro angle.  The synthetic trace is   #
+#  sampled from a known heading at jittered times (with a few      #
+#  samples dropped) and frames are captured at jittered times, so  #
+#  the errors are measured against the true heading rather than    #
+#  against the interpolation under test.  A recorded trace is      #
+#  split instead: every other sample is replayed and the samples   #
+#  held out are the capture times and true headings.  The replay   #
+#  runs at full speed so it can be used as a regression benchmark. #
+#                                                                  #
+#  Usage: TestNavxReplayApp.py [trace.csv]                         #
+#                                                                  #
+#  @Version: 1.0                                                   #
+#  @Created: 2021-03-21                                            #
+#  @Author: Team 4121                                              #
+#                                                                  #
+####################################################################
+
+"""Navx trace replay test application"""
+
+# System imports
+import sys
+import time
+import math
+import random
+
+# Setup paths
+sys.path.append('/home/pi/Team4121/Libraries')
+
+# Team 4121 module imports
+from FRCNavxLibrary import FRCNavx, SimulatedVMXBackend
+
+# Set test values
+sampleRate = 200.0  # Hz (synthetic trace)
+sampleJitter = 0.4  # share of the sample period
+sampleDropRate = 0.02  # share of samples lost
+frameRate = 15.0  # Hz
+frameJitter = 0.005  # seconds
+visionLatency = 0.080  # seconds from capture to published result
+targetBearing = 30.0  # degrees (field relative)
+maxCompensatedError = 0.1  # degrees (95th percentile)
+
+
+# Define true heading method (robot sweeping back and forth past 180 degrees from the start)
+def true_heading(timestamp):
+
+    return 110.0 - 100.0 * math.cos(2.0 * math.pi * 0.25 * timestamp) + 15.0 * math.sin(2.0 * math.pi * 0.9 * timestamp)
+
+
+# Define true pitch method
+def true_pitch(timestamp):
+
+    return 5.0 * math.sin(2.0 * math.pi * 0.5 * timestamp)
+
+
+# Define wrap method (degrees to -180 to 180)
+def wrap(degrees):
+
+    return ((degrees + 180.0) % 360.0) - 180.0
+
+
+# Define synthetic trace method (jittered sample times, some samples dropped)
+def make_trace(generator, length=20.0):
+
+    samples = []
+    for n in range(int(length * sampleRate)):
+        if generator.random() < sampleDropRate:
+            continue
+        sampleTime = (n + generator.uniform(-sampleJitter, sampleJitter)) / sampleRate
+        angle = true_heading(sampleTime)
+        samples.append((sampleTime, angle, wrap(angle), true_pitch(sampleTime)))
+
+    return samples
+
+
+# Define synthetic frame method (capture time and true heading of each frame)
+def make_frames(generator, startTime, endTime):
+
+    frames = []
+    frameTime = startTime
+    while frameTime < endTime:
+        captureTime = frameTime + generator.uniform(-frameJitter, frameJitter)
+        frames.append((captureTime, true_heading(captureTime)))
+        frameTime += 1.0 / frameRate
+
+    return frames
+
+
+# Define held out frame method (recorded trace, one held out sample per frame period)
+def held_out_frames(heldOut, startTime, endTime):
+
+    frames = []
+    frameTime = startTime
+    for sampleTime, angle, yaw, pitch in heldOut:
+        if sampleTime >= frameTime and sampleTime < endTime:
+            frames.append((sampleTime, angle))
+            frameTime = sampleTime + 1.0 / frameRate
+
+    return frames
+
+
+# Define error summary method (returns the 95th percentile)
+def summarize(name, errors):
+
+    errors = sorted(abs(e) for e in errors)
+    mean = sum(errors) / len(errors)
+    p95 = errors[int(0.95 * (len(errors) - 1))]
+    print('%-22s mean %6.2f  p95 %6.2f  max %6.2f degrees' % (name, mean, p95, errors[-1]))
+
+    return p95
+
+
+# Define main method
+def main():
+
+    # Load recorded trace (every other sample replayed) or make a synthetic one
+    generator = random.Random(4121)
+    if len(sys.argv) > 1:
+        samples = SimulatedVMXBackend(tracefile=sys.argv[1]).samples
+        backend = SimulatedVMXBackend(samples=samples[0::2])
+        frames = held_out_frames(samples[1::2], samples[0][0] + visionLatency, samples[-1][0] - 2 * visionLatency)
+    else:
+        backend = SimulatedVMXBackend(samples=make_trace(generator))
+        frames = make_frames(generator, backend.samples[0][0] + visionLatency,
+                             backend.samples[-1][0] - 2 * visionLatency)
+
+    # Create Navx on the simulated board (history must cover the latency), which zeroes the first sample
+    navx = FRCNavx('NavxReplay', backend=backend, historysize=400)
+    zeroAngle = backend.angleOffset
+    zeroYaw = backend.yawOffset
+
+    # Step through simulated vision frames
+    naiveErrors = []
+    fusedErrors = []
+    yawErrors = []
+    mixedReads = 0
+    lookupTime = 0.0
+    for captureTime, captureHeading in frames:
+
+        # Replay IMU samples up to when the vision result is published
+        navx.replay_until(captureTime + visionLatency)
+
+        # Reads must all come from the last sample taken and must not advance the trace
+        replayIndex = backend.sampleIndex
+        last = backend.samples[replayIndex - 1]
+        reads = (navx.read_angle(), navx.read_yaw(), navx.read_pitch())
+        expected = (last[1] - zeroAngle, wrap(last[2] - zeroYaw), last[3])
+        if backend.sampleIndex != replayIndex or any(abs(r - v) > 0.006 for r, v in zip(reads, expected)):
+            mixedReads += 1
+
+        # Camera relative angle measured at capture time (heading from the zeroed gyro)
+        captureHeading -= zeroAngle
+        cameraAngle = targetBearing - captureHeading
+
+        # Bearing from current gyro angle vs heading at capture time
+        naiveErrors.append(navx.read_angle() + cameraAngle - targetBearing)
+        lookupStart = time.perf_counter()
+        fusedBearing = navx.get_angle_at(captureTime) + cameraAngle
+        lookupTime += time.perf_counter() - lookupStart
+        fusedErrors.append(fusedBearing - targetBearing)
+        yawErrors.append(wrap(navx.get_yaw_at(captureTime) - captureHeading))
+
+    # Report results
+    print('Replayed %d samples, %d frames' % (len(backend.samples), len(frames)))
+    naive = summarize('Current gyro bearing:', naiveErrors)
+    fused = summarize('Compensated bearing:', fusedErrors)
+    yaw = summarize('Compensated yaw:', yawErrors)
+    print('Heading lookup: %.1f us per frame' % (1e6 * lookupTime / len(frames)))
+    print('%d frames read values from more than one sample' % mixedReads)
+
+    if fused > maxCompensatedError or yaw > maxCompensatedError or fused >= naive or mixedReads > 0:
+        sys.exit(1)
+
+
+#define main function
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/env python3
+
+####################################################################
+#                                                                  #
+#                   FRC Navx Sampler Test App                      #
+#                                                                  #
+#  This program tests the threaded Navx sampler without a VMX-pi   #
+#  board.  A fake VMX module simulates a robot turning at a        #
+#  constant rate so interpolated heading lookups can be checked    #
+#  against the known true heading.                                 #
+#                                                                  #
+#  @Version: 1.0                                                   #
+#  @Created: 2021-03-20                                            #
+#  @Author: Team 4121                                              #
+#                                                                  #
+####################################################################
+
+"""Navx sampler test application"""
+
+# System imports
+import sys
+import time
+
+# Setup paths
+sys.path.append('/home/pi/Team4121/Libraries')
+
+# Team 4121 module imports
+from FRCNavxLibrary import FRCNavx, VMXBackend
+
+# Set test values
+turnRate = 180.0  # degrees per second
+sampleRate = 200  # Hz
+testLength = 2.0  # seconds
+
+
+# Define fake AHRS (robot turning at constant rate)
+class FakeAHRS:
+
+    def __init__(self):
+        self.zeroTime = time.monotonic()
+
+    def Reset(self):
+        self.zeroTime = time.monotonic()
+
+    def ZeroYaw(self):
+        self.zeroTime = time.monotonic()
+
+    def GetAngle(self):
+        return turnRate * (time.monotonic() - self.zeroTime)
+
+    def GetYaw(self):
+        return ((self.GetAngle() + 180.0) % 360.0) - 180.0
+
+    def GetPitch(self):
+        return 0.0
+
+
+# Define fake real time clock
+class FakeTime:
+
+    def GetRTCTime(self):
+        currentTime = time.localtime(time.time())
+        return [True, currentTime.tm_hour, currentTime.tm_min, currentTime.tm_sec]
+
+    def GetRTCDate(self):
+        currentTime = time.localtime(time.time())
+        return [True, currentTime.tm_wday + 1, currentTime.tm_mday, currentTime.tm_mon, currentTime.tm_year - 2000]
+
+
+# Define fake VMX board
+class FakeVMXPi:
+
+    def __init__(self, realtime, rate):
+        self.ahrs = FakeAHRS()
+        self.rtc = FakeTime()
+
+    def IsOpen(self):
+        return True
+
+    def getAHRS(self):
+        return self.ahrs
+
+    def getTime(self):
+        return self.rtc
+
+
+# Define fake VMX module
+class FakeVMXModule:
+
+    VMXPi = FakeVMXPi
+
+
+# Define main method
+def main():
+
+    # Create Navx with fake VMX module and start sampling
+    navx = FRCNavx('NavxTest', backend=VMXBackend(FakeVMXModule()))
+    navx.start_navx_thread(sampleRate)
+
+    # Let the history fill
+    time.sleep(testLength)
+    print('Samples in history: ' + str(navx.sampleCount))
+
+    # Look up headings at past times and compare with truth
+    maxError = 0.0
+    now = time.monotonic()
+    for msAgo in range(10, 500, 10):
+        lookupTime = now - msAgo / 1000.0
+        trueAngle = turnRate * (lookupTime - navx.backend.vmx.getAHRS().zeroTime)
+        error = abs(navx.get_angle_at(lookupTime) - trueAngle)
+        maxError = max(maxError, error)
+        print('%4d ms ago: angle %8.2f  yaw %8.2f  (true %8.2f)' % (msAgo, navx.get_angle_at(lookupTime),
+                                                                   navx.get_yaw_at(lookupTime), trueAngle))
+
+    print('Maximum interpolation error: %.3f degrees' % maxError)
+
+    # Stop sampling
+    navx.stop_navx_thread()
+
+
+#define main function
+if __name__ == '__main__':
+    main()
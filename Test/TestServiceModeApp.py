@@ -0,0 +1,351 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/env python3
+
+####################################################################
+#                                                                  #
+#                   FRC Service Mode Test App                      #
+#                                                                  #
+#  This program measures the time to the first valid detection     #
+#  after a cold start and after a resume from idle.  A goal camera #
+#  clip of the vision tape stands in for the camera (an MJPEG AVI  #
+#  played at the camera frame rate).  The cold start runs this     #
+#  program again in a new process, which pays for imports, camera  #
+#  open and settings, and the first detection.  The warm resume    #
+#  keeps the camera streaming with idle grabs, then times read and #
+#  detect until the tape is found again.  Last, the main program   #
+#  itself is run through a match, an idle and a second match with  #
+#  a network table stand-in.  It must start a new telemetry log on #
+#  resume and log no gyro samples while idle.                      #
+#                                                                  #
+#  Usage: TestServiceModeApp.py [--settings file] [--resumes n]    #
+#                                                                  #
+#  @Version: 1.0                                                   #
+#  @Created: 2021-04-04                                            #
+#  @Author: Team 4121                                              #
+#                                                                  #
+####################################################################
+
+"""Service mode test application"""
+
+# System imports
+import sys
+import os
+import time
+import tempfile
+import glob
+import types
+import argparse
+import threading
+import subprocess
+
+# Setup paths (the main program is one folder up)
+sys.path.append('/home/pi/Team4121/Libraries')
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Module imports
+import cv2 as cv
+import numpy as np
+
+# Team 4121 module imports
+from FRCVisionLibrary import VisionLibrary
+from FRCCameraLibrary import FRCWebCam
+from FRCSyntheticFrameLibrary import FRCSyntheticCamera
+from FRCNavxLibrary import SimulatedVMXBackend
+from FRCTelemetryLibrary import read_telemetry_file, decode_messages, RECORD_GYRO, RECORD_DETECTION
+
+# Set test values
+visionFile = '/home/pi/Team4121/Config/2021VisionSettings.txt'
+imageWidth = 320
+imageHeight = 240
+cameraFPS = 15
+cameraFOV = 23.5
+cameraFocalLength = 340.0
+cameraMountAngle = 25.0
+cameraMountHeight = 26.0
+frameCount = 30
+idleSeconds = 1.0
+idleGrabPeriod = 0.05
+maxResumeFrames = 3
+mainTimeout = 20.0
+
+
+# Define video synthesis method (renders an MJPEG AVI of the goal tape)
+def write_video(vision, filename):
+
+    camera = FRCSyntheticCamera(vision, imageWidth, imageHeight, cameraFOV, cameraMountAngle, cameraMountHeight, 4121)
+    writer = cv.VideoWriter(filename, cv.VideoWriter_fourcc('M', 'J', 'P', 'G'), cameraFPS, (imageWidth, imageHeight))
+    for n in range(frameCount):
+        img, truth = camera.render(tape=(n * 0.5 - 7.5, 200.0, 5.0), noise=3.0)
+        writer.write(img)
+    writer.release()
+
+
+# Define camera method (the AVI opened the way the main program opens the goal camera)
+def open_camera(videofile):
+
+    settings = {'Width': imageWidth, 'Height': imageHeight, 'FPS': cameraFPS, 'Brightness': 0, 'Exposure': 0,
+                'Capture': 'mjpeg', 'Decode': 'color'}
+    return FRCWebCam(videofile, 'GoalCam', settings, 'ServiceTest')
+
+
+# Define detection method (reads and detects until the tape is found, returns frames read)
+def detect_until_found(vision, camera):
+
+    frames = 0
+    while True:
+        img = camera.read_frame()
+        frames += 1
+        result = vision.detect_tape_rectangle(img, imageWidth, imageHeight, cameraFOV, cameraFocalLength,
+                                              cameraMountAngle, cameraMountHeight)
+        if result[2] == True:
+            return frames
+
+
+# Define cold start method (runs in a new process, prints when the tape is found)
+def cold_start(settings, videofile):
+
+    vision = VisionLibrary(settings)
+    camera = open_camera(videofile)
+    detect_until_found(vision, camera)
+    print('found', flush=True)
+    camera.release_cam()
+
+
+# Define the network table stand-in (values the main program reads and writes)
+class ServiceTable:
+
+    # Define initialization
+    def __init__(self):
+
+        self.values = {}
+
+
+    # Define get methods
+    def getNumber(self, key, default):
+
+        return self.values.get(key, default)
+
+
+    def getBoolean(self, key, default):
+
+        return self.values.get(key, default)
+
+
+    def getString(self, key, default):
+
+        return self.values.get(key, default)
+
+
+    # Define put methods
+    def putNumber(self, key, value):
+
+        self.values[key] = value
+
+
+    def putBoolean(self, key, value):
+
+        self.values[key] = value
+
+
+    def putString(self, key, value):
+
+        self.values[key] = value
+
+
+# Define the Navx stand-in (real time samples of a still robot)
+class ServiceNavxBackend(SimulatedVMXBackend):
+
+    # Define initialization
+    def __init__(self):
+
+        SimulatedVMXBackend.__init__(self, samples=[(0.0, 0.0, 0.0, 0.0)])
+        self.realtime = True
+
+
+    # Define clock method
+    def get_time(self):
+
+        return time.monotonic()
+
+
+    # Define AHRS read method
+    def read_ahrs(self):
+
+        return 0.0, 0.0, 0.0
+
+
+# Define wait method (returns False if the condition is not met in time)
+def wait_for(condition, timeout=mainTimeout):
+
+    end = time.monotonic() + timeout
+    while condition() == False:
+        if time.monotonic() > end:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+# Define main program run method (returns a list of failed checks)
+def run_main_program(settings, videofile, folder):
+
+    # Network tables shared by the main program and this test
+    tables = {}
+    networktables = types.ModuleType('networktables')
+    networktables.NetworkTables = types.SimpleNamespace(
+        initialize=lambda server=None: True,
+        getTable=lambda name: tables.setdefault(name, ServiceTable()))
+    sys.modules['networktables'] = networktables
+    import FRCNavxLibrary
+    FRCNavxLibrary.VMXBackend = ServiceNavxBackend
+
+    # Camera settings with the clip standing in for the goal camera (the field camera is off)
+    cameraFile = os.path.join(folder, 'cameras.txt')
+    with open(cameraFile, 'w') as out_file:
+        for camera in ('FieldCam', 'GoalCam'):
+            for name, value in (('FOV', cameraFOV), ('Width', imageWidth), ('Height', imageHeight), ('FPS', cameraFPS),
+                                ('Brightness', 0), ('Exposure', 0), ('CalFactor', 1), ('FocalLength', cameraFocalLength),
+                                ('MountAngle', cameraMountAngle), ('MountHeight', cameraMountHeight),
+                                ('ResizeFactor', 2), ('Capture', 'mjpeg')):
+                out_file.write('%s%s,%s\n' % (camera, name, value))
+
+    # Set up the main program for the goal camera with the Navx sampling
+    import Team4121Vision2021 as visionMain
+    visionMain.cameraFile = cameraFile
+    visionMain.visionFile = settings
+    visionMain.logDirectory = folder
+    visionMain.videoDirectory = folder
+    visionMain.goalCamDevice = videofile
+    visionMain.useNavx = True
+    visionMain.findBalls = False
+    visionMain.findMarkers = False
+    visionMain.findGoal = True
+    visionMain.findGoalPose = False
+    visionMain.parallelSegmentation = False
+    visionMain.serviceMode = True
+
+    # Run the main program until it exits
+    errors = []
+    def run():
+        try:
+            visionMain.main()
+        except Exception as run_error:
+            errors.append(repr(run_error))
+    mainThread = threading.Thread(target=run, name='VisionMain', daemon=True)
+    mainThread.start()
+    vision = lambda: tables.get('vision', ServiceTable()).values
+
+    # First match, then idle, then a second match, then exit
+    failures = []
+    if wait_for(lambda: 'FirstDetectionTime' in vision()) == False:
+        failures.append('no detection in the first match')
+    vision()['RobotStop'] = 1
+    if wait_for(lambda: vision().get('VisionIdle') == True) == False:
+        failures.append('pipeline did not idle')
+    idleStart = time.monotonic()
+    time.sleep(idleSeconds)
+    idleEnd = time.monotonic()
+    vision().pop('FirstDetectionTime', None)
+    vision()['RobotStop'] = 0
+    if wait_for(lambda: 'FirstDetectionTime' in vision()) == False:
+        failures.append('no detection after resume')
+    vision()['RobotStop'] = 2
+    mainThread.join(mainTimeout)
+    if mainThread.is_alive() or len(errors) > 0:
+        failures.append('main program did not exit cleanly ' + ' '.join(errors))
+        return failures
+
+    # One log per match, and no gyro samples logged while idle
+    logs = sorted(glob.glob(os.path.join(folder, 'Run_Log_*.tlm')), key=os.path.getmtime)
+    print('Main program wrote %d telemetry logs' % len(logs))
+    if len(logs) != 2:
+        failures.append('expected a new telemetry log on resume')
+        return failures
+    for name, log, message in (('first match', logs[0], 'Pipeline idle'), ('second match', logs[1], 'Pipeline resumed')):
+        records = read_telemetry_file(log)
+        gyro = records[records['type'] == RECORD_GYRO]
+        idleGyro = np.count_nonzero((gyro['time'] > idleStart) & (gyro['time'] < idleEnd))
+        messages = decode_messages(records)[1]
+        print('  %-12s %5d gyro samples (%d while idle), %4d detections, %3d messages' %
+              (name, len(gyro), idleGyro, np.count_nonzero(records['type'] == RECORD_DETECTION), len(messages)))
+        if len(gyro) == 0 or idleGyro > 0:
+            failures.append('gyro samples in the ' + name)
+        if message not in messages:
+            failures.append(message + ' message missing from the ' + name)
+
+    return failures
+
+
+# Define main method
+def main():
+
+    # Parse arguments
+    parser = argparse.ArgumentParser(description='Time the first detection after start and after resume')
+    parser.add_argument('--settings', default=visionFile, help='vision settings file')
+    parser.add_argument('--resumes', type=int, default=5, help='idle and resume cycles to time')
+    parser.add_argument('--cold-start', default=None, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.cold_start is not None:
+        cold_start(args.settings, args.cold_start)
+        return
+
+    vision = VisionLibrary(args.settings)
+    with tempfile.TemporaryDirectory() as folder:
+        videofile = os.path.join(folder, 'goal.avi')
+        write_video(vision, videofile)
+
+        # Cold start in a new process (same paths as this one)
+        env = dict(os.environ)
+        env['PYTHONPATH'] = os.pathsep.join(p for p in sys.path if p)
+        coldTimes = []
+        for n in range(3):
+            start = time.perf_counter()
+            child = subprocess.Popen([sys.executable, os.path.abspath(__file__), '--settings', args.settings,
+                                      '--cold-start', videofile], stdout=subprocess.PIPE, env=env, text=True)
+            while child.stdout.readline().strip() != 'found':
+                if child.poll() is not None:
+                    print('Cold start did not find the tape')
+                    sys.exit(1)
+            coldTimes.append(time.perf_counter() - start)
+            child.wait()
+
+        # Warm resumes with the camera kept streaming while idle
+        camera = open_camera(videofile)
+        detect_until_found(vision, camera)
+        resumeTimes = []
+        resumeFrames = []
+        for n in range(args.resumes):
+            idleEnd = time.monotonic() + idleSeconds
+            while time.monotonic() < idleEnd:
+                idleStart = time.monotonic()
+                camera.idle_frame()
+                idleWait = idleGrabPeriod - (time.monotonic() - idleStart)
+                if idleWait > 0:
+                    time.sleep(idleWait)
+            start = time.monotonic()
+            resumeFrames.append(detect_until_found(vision, camera))
+            resumeTimes.append(time.monotonic() - start)
+        camera.release_cam()
+
+        # The main program through two matches
+        mainFailures = run_main_program(args.settings, videofile, folder)
+
+    coldTime = 1000 * np.median(coldTimes)
+    resumeTime = 1000 * np.median(resumeTimes)
+    print('Cold start to first detection: %8.1f ms (median of %d)' % (coldTime, len(coldTimes)))
+    print('Resume to first detection:     %8.1f ms (median of %d, at most %d frames)' %
+          (resumeTime, len(resumeTimes), max(resumeFrames)))
+    print('Idle frames grabbed: %d' % camera.frame_counts['idle'])
+    for failure in mainFailures:
+        print('Main program: ' + failure)
+
+    if resumeTime >= coldTime or max(resumeFrames) > maxResumeFrames:
+        print('Resume is not faster than a cold start')
+        sys.exit(1)
+    if len(mainFailures) > 0:
+        sys.exit(1)
+
+
+#define main function
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/env python3
+
+####################################################################
+#                                                                  #
+#                   FRC Shape Filter Test App                      #
+#                                                                  #
+#  This program checks the marker shape filter.  Frames are        #
+#  rendered with field markers (some tilted) and marker colored    #
+#  distractors: squares, wide bars, round blobs and L shapes.      #
+#  Every contour is labeled from the object it came from, and the  #
+#  filter's false rejects and false accepts are counted.  The run  #
+#  is repeated on transposed frames with the reciprocal ratio, so  #
+#  wide targets (ratio below 1) are checked too.  The time per     #
+#  frame is reported for the decision table with and without the   #
+#  feature cache, against measuring every contour the slow way,    #
+#  over a run where the objects stay still.                        #
+#                                                                  #
+#  Usage: TestShapeFilterApp.py [--settings file] [--frames n]     #
+#                                                                  #
+#  @Version: 1.0                                                   #
+#  @Created: 2021-04-01                                            #
+#  @Author: Team 4121                                              #
+#                                                                  #
+####################################################################
+
+"""Shape filter test application"""
+
+# System imports
+import sys
+import math
+import time
+import argparse
+
+# Setup paths
+sys.path.append('/home/pi/Team4121/Libraries')
+
+# Module imports
+import cv2 as cv
+import numpy as np
+
+# Team 4121 module imports
+from FRCVisionLibrary import VisionLibrary
+from FRCShapeLibrary import FRCShapeFilter
+from FRCFilterLibrary import filter_settings
+from FRCSyntheticFrameLibrary import FRCSyntheticCamera
+
+# Set test values
+visionFile = '/home/pi/Team4121/Config/2021VisionSettings.txt'
+imageWidth = 320
+imageHeight = 240
+cameraFOV = 27.3
+stillFrames = 30
+maxErrorRate = 0.05
+
+
+# Define polygon drawing method (draws on the frame and the label image)
+def draw_shape(img, labels, points, color, label):
+
+    points = np.round(np.asarray(points) * 16).astype(np.int32)
+    cv.fillPoly(img, [points], color, cv.LINE_AA, 4)
+    cv.fillPoly(labels, [points], label, cv.LINE_8, 4)
+
+
+# Define tilted marker method (marker rectangle turned in the image plane)
+def marker_points(x, y, height, ratio, tilt):
+
+    width = height / ratio
+    a = math.radians(tilt)
+    corners = np.array([(-width / 2, -height / 2), (width / 2, -height / 2), (width / 2, height / 2),
+                        (-width / 2, height / 2)])
+    turn = np.array([[math.cos(a), -math.sin(a)], [math.sin(a), math.cos(a)]])
+    return corners @ turn.T + (x, y)
+
+
+# Define frame method (returns the frame and a label image, 1 for markers, 2 for distractors)
+def make_frame(camera, random, color, ratio, transpose=False):
+
+    img = camera.background()
+    labels = np.zeros(img.shape[0:2], dtype=np.uint8)
+
+    # Markers, upright and tilted, across the frame
+    for i in range(3):
+        x = 40 + 110 * i + random.uniform(-10, 10)
+        draw_shape(img, labels, marker_points(x, random.uniform(70, 110), random.uniform(30, 80),
+                                              ratio * random.uniform(0.9, 1.1), random.uniform(-25, 25)), color, 1)
+
+    # Distractors in the marker color
+    y = random.uniform(170, 215)
+    size = random.uniform(14, 24)
+    draw_shape(img, labels, [(15, y), (15 + size, y), (15 + size, y + size), (15, y + size)], color, 2)
+    draw_shape(img, labels, [(70, y), (130, y), (130, y + 12), (70, y + 12)], color, 2)
+    circle = [(175 + size * math.cos(t), y + size * math.sin(t)) for t in np.linspace(0, 2 * math.pi, 24)]
+    draw_shape(img, labels, circle, color, 2)
+    draw_shape(img, labels, [(230, y - 40), (242, y - 40), (242, y + 8), (290, y + 8), (290, y + 20), (230, y + 20)],
+               color, 2)
+
+    img = camera.add_noise(img, 3.0)
+    if transpose == True:
+        return np.ascontiguousarray(img.transpose(1, 0, 2)), np.ascontiguousarray(labels.T)
+    return img, labels
+
+
+# Define contour label method (label at the contour's filled pixels)
+def contour_label(contour, labels):
+
+    mask = np.zeros(labels.shape, dtype=np.uint8)
+    cv.drawContours(mask, [contour], 0, 255, -1)
+    values = labels[mask > 0]
+    values = values[values > 0]
+    if len(values) == 0:
+        return 0
+    return int(np.bincount(values).argmax())
+
+
+# Define slow classify method (every contour measured the slow way)
+def classify_all(shapes, contours):
+
+    results = []
+    for contour in contours:
+        x, y, w, h = cv.boundingRect(contour)
+        area = cv.contourArea(contour)
+        solidity, momentAspect = shapes.shape_features(contour, area)
+        results.append(solidity >= shapes.minSolidity and area >= shapes.minFill * w * h * 0.5 and
+                       shapes.momentMin <= momentAspect <= shapes.momentMax)
+    return results
+
+
+# Define error count method (returns markers, distractors, false rejects, false accepts,
+# contours decided by the table alone and the contours of each frame)
+def count_errors(vision, camera, random, frames, ratio, transpose):
+
+    hsvMin = tuple(int(VisionLibrary.marker_values[k]) for k in ('HMIN', 'SMIN', 'VMIN'))
+    hsvMax = tuple(int(VisionLibrary.marker_values[k]) for k in ('HMAX', 'SMAX', 'VMAX'))
+    filters = filter_settings(VisionLibrary.marker_values)
+    minArea = int(VisionLibrary.marker_values['MINAREA'])
+
+    markers = 0
+    distractors = 0
+    falseRejects = 0
+    falseAccepts = 0
+    tableDecided = 0
+    contourSets = []
+    for n in range(frames):
+        img, labels = make_frame(camera, random, camera.markerColor, ratio, transpose)
+        contours = [c for c in vision.process_image_contours(img, hsvMin, hsvMax, False, None, filters)
+                    if cv.boundingRect(c)[2] * cv.boundingRect(c)[3] > minArea]
+        contourSets.append(contours)
+        checked = vision.marker_shape().cacheMisses + vision.marker_shape().cacheHits
+        for contour, accepted in zip(contours, vision.marker_shape().classify(contours)):
+            label = contour_label(contour, labels)
+            if label == 1:
+                markers += 1
+                falseRejects += accepted == False
+            elif label == 2:
+                distractors += 1
+                falseAccepts += accepted == True
+        tableDecided += len(contours) - (vision.marker_shape().cacheMisses + vision.marker_shape().cacheHits - checked)
+
+    return markers, distractors, falseRejects, falseAccepts, tableDecided, contourSets
+
+
+# Define timing method (milliseconds per frame over the still run)
+def time_frames(call, contourSets):
+
+    start = time.perf_counter()
+    for contours in contourSets:
+        call(contours)
+    return 1000 * (time.perf_counter() - start) / len(contourSets)
+
+
+# Define main method
+def main():
+
+    # Parse arguments
+    parser = argparse.ArgumentParser(description='Check the marker shape filter')
+    parser.add_argument('--settings', default=visionFile, help='vision settings file')
+    parser.add_argument('--frames', type=int, default=60, help='random frames to check')
+    args = parser.parse_args()
+
+    vision = VisionLibrary(args.settings)
+    vision.segmenter = None
+    camera = FRCSyntheticCamera(vision, imageWidth, imageHeight, cameraFOV, seed=4121)
+    random = np.random.default_rng(4121)
+    markerValues = dict(VisionLibrary.marker_values)
+    ratio = float(markerValues['TARGETRATIO'])
+    tolerance = float(markerValues['RATIOTOL'])
+
+    # Count false rejects and false accepts over random frames, tall and then wide (transposed)
+    failures = 0
+    for name, transpose in (('Tall markers', False), ('Wide markers', True)):
+        vision.markerShape = None
+        if transpose == True:
+            VisionLibrary.marker_values['TARGETRATIO'] = 1.0 / ratio
+            VisionLibrary.marker_values['RATIOTOL'] = tolerance / (ratio * ratio)
+        markers, distractors, falseRejects, falseAccepts, tableDecided, contours = count_errors(
+            vision, camera, random, args.frames, ratio, transpose)
+        if transpose == False:
+            contourSets = contours
+            shapes = vision.marker_shape()
+
+        print('%s (ratio %.3f)' % (name, float(VisionLibrary.marker_values['TARGETRATIO'])))
+        print('  Markers:     %4d, %3d rejected' % (markers, falseRejects))
+        print('  Distractors: %4d, %3d accepted' % (distractors, falseAccepts))
+        print('  Decided by the table alone: %.0f%%' % (100.0 * tableDecided / sum(len(c) for c in contours)))
+        if falseRejects > maxErrorRate * markers:
+            failures += 1
+        if falseAccepts > maxErrorRate * distractors:
+            failures += 1
+    VisionLibrary.marker_values.clear()
+    VisionLibrary.marker_values.update(markerValues)
+
+    # Time a still run (the same contours every frame) and a run that changes every frame
+    stillSets = [contourSets[0]] * stillFrames
+    cached = FRCShapeFilter(shapes.ratioMin / 2 + shapes.ratioMax / 2, (shapes.ratioMax - shapes.ratioMin) / 2,
+                            shapes.minFill, shapes.minSolidity)
+    print('%-28s %10s %10s' % ('ms per frame', 'still', 'moving'))
+    print('%-28s %10.3f %10.3f' % ('every contour measured', time_frames(lambda c: classify_all(shapes, c), stillSets),
+                                   time_frames(lambda c: classify_all(shapes, c), contourSets)))
+    print('%-28s %10.3f %10.3f' % ('decision table and cache', time_frames(cached.classify, stillSets),
+                                   time_frames(cached.classify, contourSets)))
+    print('Slow features measured %d times, reused %d times' % (cached.cacheMisses, cached.cacheHits))
+
+    print('%d error rates over %.0f%%' % (failures, 100 * maxErrorRate))
+    if failures > 0:
+        sys.exit(1)
+
+
+#define main function
+if __name__ == '__main__':
+    main()
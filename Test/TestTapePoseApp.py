@@ -0,0 +1,216 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/env python3
+
+####################################################################
+#                                                                  #
+#                   FRC Tape Pose Test App                         #
+#                                                                  #
+#  This program benchmarks the solvePnP pose of the vision tape    #
+#  target against the bounding rectangle estimates.  Without       #
+#  arguments a synthetic approach to the goal is rendered with a   #
+#  known camera pose so distance, lateral offset and yaw errors    #
+#  can be measured.  With a recorded goal camera clip the solve    #
+#  latency and frame to frame pose jitter are reported.  The       #
+#  synthetic run fails if the pose distance or yaw is worse than   #
+#  the rectangle near or far from the goal.                        #
+#                                                                  #
+#  Usage: TestTapePoseApp.py [GoalCam_001.avi] [--settings file]   #
+#                                                                  #
+#  @Version: 1.0                                                   #
+#  @Created: 2021-03-26                                            #
+#  @Author: Team 4121                                              #
+#                                                                  #
+####################################################################
+
+"""Vision tape pose test application"""
+
+# System imports
+import sys
+import time
+import math
+import argparse
+
+# Setup paths
+sys.path.append('/home/pi/Team4121/Libraries')
+
+# Module imports
+import cv2 as cv
+import numpy as np
+
+# Team 4121 module imports
+from FRCVisionLibrary import VisionLibrary
+from FRCProjectionLibrary import FRCProjection
+from FRCSyntheticFrameLibrary import FRCSyntheticCamera
+
+# Set test values
+visionFile = '/home/pi/Team4121/Config/2021VisionSettings.txt'
+imageWidth = 320
+imageHeight = 240
+cameraFOV = 23.5
+cameraFocalLength = 340.0
+cameraMountAngle = 25.0
+cameraMountHeight = 26.0
+frameRate = 15.0
+
+
+# Define error summary method (returns the 95th percentile)
+def summarize(name, errors, units):
+
+    errors = np.abs(np.array(errors))
+    p95 = np.percentile(errors, 95)
+    print('%-24s mean %6.2f  p95 %6.2f  max %6.2f %s' % (name, errors.mean(), p95, errors.max(), units))
+
+    return p95
+
+
+# Define detection method (returns tape values and pose solve time)
+def detect(vision, projection, img):
+
+    tapeCameraValues, tapeRealWorldValues, foundTape, targetLock, rect, box = vision.detect_tape_rectangle(
+        img, imageWidth, imageHeight, cameraFOV, cameraFocalLength, cameraMountAngle, cameraMountHeight,
+        projection, True)
+    return tapeRealWorldValues, foundTape
+
+
+# Define pose timing method (pose solve alone, on the contour detection found)
+def time_pose(vision, projection, img):
+
+    hsvMin = tuple(int(VisionLibrary.tape_values[k]) for k in ('HMIN', 'SMIN', 'VMIN'))
+    hsvMax = tuple(int(VisionLibrary.tape_values[k]) for k in ('HMAX', 'SMAX', 'VMAX'))
+    contours = vision.process_image_contours(img, hsvMin, hsvMax, True)
+    if len(contours) == 0:
+        return None
+    contour = max(contours, key=cv.contourArea)
+
+    start = time.perf_counter()
+    vision.estimate_tape_pose(contour, projection, cameraMountAngle)
+    return time.perf_counter() - start
+
+
+# Define synthetic benchmark method (returns False if the pose is worse than the rectangle)
+def run_synthetic(vision, projection):
+
+    camera = FRCSyntheticCamera(vision, imageWidth, imageHeight, cameraFOV, cameraMountAngle, cameraMountHeight)
+
+    errors = []
+    solveTimes = []
+    frameTimes = []
+    ambiguous = 0
+    frames = int(10 * frameRate)
+
+    for n in range(frames):
+
+        # Robot approaches from 300 to 100 inches while weaving and turning
+        t = n / frameRate
+        distance = 300.0 - 200.0 * n / frames
+        lateral = 40.0 * math.sin(0.5 * t)
+        yaw = math.degrees(math.atan2(-lateral, distance)) + 8.0 * math.sin(1.3 * t)
+        img, truth = camera.render(tape=(lateral, distance, yaw), texture=0)
+        trueX, trueZ, trueYaw = truth['tape']['x'], truth['tape']['z'], truth['tape']['yaw']
+
+        start = time.perf_counter()
+        tapeRealWorldValues, foundTape = detect(vision, projection, img)
+        frameTimes.append(time.perf_counter() - start)
+        if tapeRealWorldValues['PoseFound'] == False:
+            continue
+        if tapeRealWorldValues['PoseAmbiguous'] == True:
+            ambiguous += 1
+
+        errors.append((distance,
+                       tapeRealWorldValues['TapeDistance'] - math.hypot(trueX, trueZ),
+                       tapeRealWorldValues['BotAngle'] - abs(trueYaw),
+                       tapeRealWorldValues['PoseZ'] - trueZ,
+                       tapeRealWorldValues['PoseX'] - trueX,
+                       tapeRealWorldValues['PoseYaw'] - trueYaw,
+                       math.hypot(tapeRealWorldValues['PoseX'], tapeRealWorldValues['PoseZ']) - math.hypot(trueX, trueZ)))
+        solveTimes.append(time_pose(vision, projection, img))
+
+    # Report errors near and far from the goal (the tape is only a few pixels tall far away)
+    errors = np.array(errors)
+    print('Synthetic approach: %d frames, pose found in %d (%d ambiguous, rectangle used)' %
+          (frames, len(errors), ambiguous))
+    passed = True
+    for name, selected in (('Within 200 in', errors[errors[:, 0] <= 200]),
+                           ('Beyond 200 in', errors[errors[:, 0] > 200])):
+        if len(selected) == 0:
+            continue
+        print('%s (%d frames)' % (name, len(selected)))
+        rectDistance = summarize('  Rectangle distance:', selected[:, 1], 'in')
+        rectAngle = summarize('  Rectangle bot angle:', selected[:, 2], 'deg')
+        summarize('  Pose forward (z):', selected[:, 3], 'in')
+        summarize('  Pose lateral (x):', selected[:, 4], 'in')
+        poseDistance = summarize('  Pose distance:', selected[:, 6], 'in')
+        poseYaw = summarize('  Pose yaw:', selected[:, 5], 'deg')
+        if poseDistance > rectDistance or poseYaw > rectAngle:
+            print('  Pose is worse than the rectangle')
+            passed = False
+    report_latency(frameTimes, solveTimes)
+
+    return passed
+
+
+# Define recorded clip benchmark method (no ground truth, so report jitter)
+def run_recorded(vision, projection, videofile):
+
+    poses = []
+    solveTimes = []
+    frameTimes = []
+    clip = cv.VideoCapture(videofile)
+
+    while True:
+
+        grabbed, img = clip.read()
+        if grabbed == False:
+            break
+        if img.shape[1] != imageWidth:
+            img = cv.resize(img, (imageWidth, imageHeight), interpolation=cv.INTER_AREA)
+
+        start = time.perf_counter()
+        tapeRealWorldValues, foundTape = detect(vision, projection, img)
+        frameTimes.append(time.perf_counter() - start)
+        if tapeRealWorldValues['PoseFound'] == True:
+            poses.append((tapeRealWorldValues['PoseX'], tapeRealWorldValues['PoseZ'], tapeRealWorldValues['PoseYaw']))
+            solveTimes.append(time_pose(vision, projection, img))
+
+    clip.release()
+    print('%s: %d frames, pose found in %d' % (videofile, len(frameTimes), len(poses)))
+    if len(poses) > 1:
+        steps = np.diff(np.array(poses), axis=0)
+        summarize('Frame to frame x:', steps[:, 0], 'in')
+        summarize('Frame to frame z:', steps[:, 1], 'in')
+        summarize('Frame to frame yaw:', steps[:, 2], 'deg')
+    report_latency(frameTimes, solveTimes)
+
+
+# Define latency report method
+def report_latency(frameTimes, solveTimes):
+
+    if len(frameTimes) > 0:
+        print('Tape detection with pose: %.2f ms per frame' % (1000 * np.mean(frameTimes)))
+    solveTimes = np.array([s for s in solveTimes if s is not None])
+    if len(solveTimes) > 0:
+        print('Pose solve: %.0f us' % (1e6 * solveTimes.mean()))
+
+
+# Define main method
+def main():
+
+    # Parse arguments
+    parser = argparse.ArgumentParser(description='Benchmark vision tape pose')
+    parser.add_argument('video', nargs='?', default=None, help='recorded goal camera clip')
+    parser.add_argument('--settings', default=visionFile, help='vision settings file')
+    args = parser.parse_args()
+
+    # Create vision processing with an uncalibrated camera model
+    vision = VisionLibrary(args.settings)
+    projection = FRCProjection(imageWidth, imageHeight, cameraFOV)
+
+    if args.video is not None:
+        run_recorded(vision, projection, args.video)
+    elif run_synthetic(vision, projection) == False:
+        sys.exit(1)
+
+
+#define main function
+if __name__ == '__main__':
+    main()
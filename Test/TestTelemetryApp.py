@@ -0,0 +1,144 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/env python3
+
+####################################################################
+#                                                                  #
+#                     FRC Telemetry Test App                       #
+#                                                                  #
+#  This program checks that messages survive the telemetry log.    #
+#  Several threads log messages of every length from empty to a    #
+#  few hundred bytes (some not ASCII) while another logs gyro      #
+#  samples, and the log is rotated part way through.  Every        #
+#  message must read back whole and in order from one of the two   #
+#  files.  A nearly full log must drop a long message whole rather #
+#  than keep its first part.                                       #
+#                                                                  #
+#  Usage: TestTelemetryApp.py [--messages n]                       #
+#                                                                  #
+#  @Version: 1.0                                                   #
+#  @Created: 2021-04-06                                            #
+#  @Author: Team 4121                                              #
+#                                                                  #
+####################################################################
+
+"""Telemetry log test application"""
+
+# System imports
+import sys
+import os
+import time
+import tempfile
+import argparse
+import threading
+
+# Setup paths
+sys.path.append('/home/pi/Team4121/Libraries')
+
+# Module imports
+import numpy as np
+
+# Team 4121 module imports
+from FRCTelemetryLibrary import FRCTelemetry, read_telemetry_file, decode_messages
+from FRCTelemetryLibrary import SOURCE_MAIN, SOURCE_CAMERA, SOURCE_FIELDCAM, SOURCE_GOALCAM, RECORD_GYRO
+
+# Set test values
+threadSources = (SOURCE_MAIN, SOURCE_CAMERA, SOURCE_FIELDCAM, SOURCE_GOALCAM)
+maxLength = 300
+
+
+# Define message method (text of a given length, with some two byte characters)
+def make_message(source, n, length):
+
+    text = 'source %d message %d ' % (source, n)
+    filler = 'abcdefghij' if n % 3 else 'äöü°'
+    while len(text) < length:
+        text += filler
+    return text[0:length]
+
+
+# Define main method
+def main():
+
+    # Parse arguments
+    parser = argparse.ArgumentParser(description='Check long messages in the telemetry log')
+    parser.add_argument('--messages', type=int, default=400, help='messages per thread')
+    args = parser.parse_args()
+
+    failures = 0
+    with tempfile.TemporaryDirectory() as folder:
+
+        # Log from several threads at once, rotating half way
+        firstLog = os.path.join(folder, 'first.tlm')
+        secondLog = os.path.join(folder, 'second.tlm')
+        telemetry = FRCTelemetry(firstLog)
+        random = np.random.default_rng(4121)
+        lengths = {source: random.integers(0, maxLength, args.messages) for source in threadSources}
+        stopped = []
+        halfway = threading.Barrier(len(threadSources) + 1)
+
+        def log_messages(source):
+            for n, length in enumerate(lengths[source]):
+                if n == args.messages // 2:
+                    halfway.wait()
+                    halfway.wait()
+                telemetry.log_message(source, make_message(source, n, length))
+
+        def log_gyro():
+            while len(stopped) == 0:
+                telemetry.log_gyro(time.monotonic(), 1.0, 2.0, 3.0)
+
+        gyroThread = threading.Thread(target=log_gyro)
+        gyroThread.start()
+        threads = [threading.Thread(target=log_messages, args=(source,)) for source in threadSources]
+        for thread in threads:
+            thread.start()
+        halfway.wait()
+        telemetry.rotate(secondLog)
+        halfway.wait()
+        for thread in threads:
+            thread.join()
+        stopped.append(True)
+        gyroThread.join()
+        telemetry.close()
+
+        # Every message must come back whole and in order for its source
+        records = [read_telemetry_file(firstLog), read_telemetry_file(secondLog)]
+        received = dict((source, []) for source in threadSources)
+        for log in records:
+            first, texts = decode_messages(log)
+            for record, text in zip(first, texts):
+                received[int(record['source'])].append(text)
+        sent = 0
+        matched = 0
+        for source in threadSources:
+            expected = [make_message(source, n, length) for n, length in enumerate(lengths[source])]
+            sent += len(expected)
+            matched += sum(a == b for a, b in zip(received[source], expected))
+            if received[source] != expected:
+                failures += 1
+        if len(decode_messages(records[1])[1]) != sent // 2:
+            failures += 1
+        print('Messages: %d sent, %d read back whole and in order (%d in the first log, %d in the second)' %
+              (sent, matched, len(decode_messages(records[0])[1]), len(decode_messages(records[1])[1])))
+        print('Gyro samples: %d' % sum(np.count_nonzero(log['type'] == RECORD_GYRO) for log in records))
+
+        # A long message that does not fit is dropped whole
+        fullLog = os.path.join(folder, 'full.tlm')
+        telemetry = FRCTelemetry(fullLog, capacity=4)
+        telemetry.log_message(SOURCE_MAIN, 'short')
+        telemetry.log_message(SOURCE_MAIN, 'x' * 150)
+        telemetry.log_message(SOURCE_MAIN, 'fits')
+        count, dropped = telemetry.close()
+        texts = decode_messages(read_telemetry_file(fullLog))[1]
+        print('Full log: %s kept, %d records dropped' % (texts, dropped))
+        if texts != ['short', 'fits'] or dropped != 4:
+            failures += 1
+
+    print('%d telemetry checks failed' % failures)
+    if failures > 0:
+        sys.exit(1)
+
+
+#define main function
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,341 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/env python3
+
+####################################################################
+#                                                                  #
+#                 FRC Vision Accuracy Test App                     #
+#                                                                  #
+#  This program checks the VisionLibrary detectors against a       #
+#  ground truth dataset and fails when accuracy or latency drifts. #
+#  A dataset is a folder of frames plus a truth.json file:         #
+#                                                                  #
+#    {"version": 1,                                                #
+#     "cameras": {"field": {"width": 320, "height": 240,           #
+#                           "fov": 27.3, "focalLength": 334.29,    #
+#                           "mountAngle": 0, "mountHeight": 0}},   #
+#     "frames": [{"image": "balls_0000.png", "camera": "field",    #
+#                 "target": "balls",                               #
+#                 "targets": [{"distance": 120.0, "angle": -4.2,   #
+#                              "offset": 8.8}]}]}                  #
+#                                                                  #
+#  Target is balls, markers or tape.  Distance and offset are in   #
+#  inches, angle in degrees (positive to the right, offset         #
+#  positive to the left as the detectors report them).  Frames     #
+#  measured on the field can be labeled by hand in this format;    #
+#  --generate renders a synthetic dataset from the vision and      #
+#  camera settings files so no field visit is needed.  Each frame  #
+#  is run through its detector with the camera model (as on the    #
+#  robot) and optionally the older FOV math, detections are        #
+#  matched to the truth by angle, and the error distributions and  #
+#  per frame latency are checked against the thresholds.           #
+#                                                                  #
+#  Usage: TestVisionAccuracyApp.py dataset_dir [--generate]        #
+#                 [--thresholds limits.json] [--compare-fov]       #
+#                                                                  #
+#  @Version: 1.0                                                   #
+#  @Created: 2021-03-28                                            #
+#  @Author: Team 4121                                              #
+#                                                                  #
+####################################################################
+
+"""Vision detector accuracy test application"""
+
+# System imports
+import sys
+import os
+import time
+import math
+import json
+import argparse
+
+# Setup paths
+sys.path.append('/home/pi/Team4121/Libraries')
+
+# Module imports
+import cv2 as cv
+import numpy as np
+
+# Team 4121 module imports
+from FRCVisionLibrary import VisionLibrary
+from FRCProjectionLibrary import FRCProjection
+from FRCSyntheticFrameLibrary import FRCSyntheticCamera
+
+# Set test values
+visionFile = '/home/pi/Team4121/Config/2021VisionSettings.txt'
+cameraFile = '/home/pi/Team4121/Config/2021CameraSettings.txt'
+truthFile = 'truth.json'
+matchTolerance = 4.0
+maxNoise = 8.0
+
+# Default limits (p95 of absolute error, p95 latency, minimum detection rate)
+defaultThresholds = {'balls': {'distance_pct': 18.0, 'angle_deg': 0.5, 'offset_in': 6.0,
+                               'latency_ms': 20.0, 'detection_rate': 0.95},
+                     'markers': {'distance_pct': 5.0, 'angle_deg': 0.5, 'offset_in': 2.5,
+                                 'latency_ms': 20.0, 'detection_rate': 0.95},
+                     'tape': {'distance_pct': 14.0, 'angle_deg': 2.0, 'offset_in': 5.0,
+                              'latency_ms': 30.0, 'detection_rate': 0.95},
+                     'tape pose': {'distance_pct': 14.0, 'angle_deg': 1.0, 'offset_in': 5.0,
+                                   'latency_ms': 30.0, 'detection_rate': 0.95}}
+
+
+# Define camera settings file method (same format the vision program reads)
+def read_camera_file(filename):
+
+    cameraValues = {}
+    with open(filename, 'r') as in_file:
+        for line in in_file.readlines():
+            split_line = line.strip().split(',')
+            if len(split_line) == 2:
+                cameraValues[split_line[0]] = split_line[1]
+
+    cameras = {}
+    for name, prefix in (('field', 'FieldCam'), ('goal', 'GoalCam')):
+        cameras[name] = {'width': int(cameraValues[prefix + 'Width']),
+                         'height': int(cameraValues[prefix + 'Height']),
+                         'fov': float(cameraValues[prefix + 'FOV']),
+                         'focalLength': float(cameraValues[prefix + 'FocalLength']),
+                         'mountAngle': float(cameraValues[prefix + 'MountAngle']),
+                         'mountHeight': float(cameraValues[prefix + 'MountHeight'])}
+
+    return cameras
+
+
+# Define bearing spread method (angles at least minSpacing degrees apart)
+def spread_angles(random, count, limit, minSpacing):
+
+    angles = []
+    while len(angles) < count:
+        angle = random.uniform(-limit, limit)
+        if all(abs(angle - a) >= minSpacing for a in angles):
+            angles.append(angle)
+
+    return angles
+
+
+# Define synthetic dataset method (renders frames with known targets)
+def generate_dataset(vision, folder, cameras, count, seed):
+
+    os.makedirs(folder, exist_ok=True)
+    random = np.random.default_rng(seed)
+    frames = []
+
+    field = cameras['field']
+    goal = cameras['goal']
+    fieldCamera = FRCSyntheticCamera(vision, field['width'], field['height'], field['fov'],
+                                     field['mountAngle'], field['mountHeight'], seed)
+    goalCamera = FRCSyntheticCamera(vision, goal['width'], goal['height'], goal['fov'],
+                                    goal['mountAngle'], goal['mountHeight'], seed + 1)
+
+    for n in range(count):
+
+        # Balls spread across the view so they do not merge
+        balls = [(d * math.tan(math.radians(a)), d) for a, d in
+                 zip(spread_angles(random, random.integers(1, 4), field['fov'] - 4, 8.0),
+                     random.uniform(40, 240, 3))]
+        img, truth = fieldCamera.render(balls=balls, noise=random.uniform(0, maxNoise))
+        frames.append(write_frame(folder, 'balls', n, img, 'field', truth['balls']))
+
+        # Field markers
+        markers = [(d * math.tan(math.radians(a)), d) for a, d in
+                   zip(spread_angles(random, random.integers(1, 3), field['fov'] - 4, 10.0),
+                       random.uniform(60, 180, 2))]
+        img, truth = fieldCamera.render(markers=markers, noise=random.uniform(0, maxNoise))
+        frames.append(write_frame(folder, 'markers', n, img, 'field', truth['markers']))
+
+        # Goal tape through the tilted goal camera
+        tape = (random.uniform(-30, 30), random.uniform(100, 300), random.uniform(-10, 10))
+        img, truth = goalCamera.render(tape=tape, noise=random.uniform(0, maxNoise))
+        frames.append(write_frame(folder, 'tape', n, img, 'goal', [truth['tape']]))
+
+    with open(os.path.join(folder, truthFile), 'w') as out_file:
+        json.dump({'version': 1, 'source': 'synthetic', 'cameras': cameras, 'frames': frames},
+                  out_file, indent=1)
+    print('Wrote %d frames to %s' % (len(frames), folder))
+
+
+# Define frame writing method (returns the truth entry)
+def write_frame(folder, target, index, img, camera, targets):
+
+    filename = '%s_%04d.png' % (target, index)
+    cv.imwrite(os.path.join(folder, filename), img)
+    return {'image': filename, 'camera': camera, 'target': target,
+            'targets': [{key: float(value) for key, value in t.items()} for t in targets]}
+
+
+# Define dataset loading method
+def load_dataset(folder):
+
+    with open(os.path.join(folder, truthFile), 'r') as in_file:
+        dataset = json.load(in_file)
+    if dataset.get('version', 1) != 1:
+        raise ValueError('Unsupported dataset version: %s' % dataset.get('version'))
+
+    return dataset
+
+
+# Define detection method (returns {name: measurements} and seconds spent)
+def detect(vision, target, img, camera, projection):
+
+    width, height, fov = camera['width'], camera['height'], camera['fov']
+    start = time.perf_counter()
+
+    if target == 'balls':
+        count, found = vision.detect_game_balls(img, width, height, fov, projection)
+        results = {'balls': found}
+    elif target == 'markers':
+        count, found = vision.detect_field_marker(img, width, height, fov, projection)
+        results = {'markers': found}
+    else:
+        tapeCameraValues, tapeRealWorldValues, foundTape, targetLock, rect, box = vision.detect_tape_rectangle(
+            img, width, height, fov, camera['focalLength'], camera['mountAngle'], camera['mountHeight'],
+            projection, projection is not None)
+        results = {'tape': []}
+        if projection is not None:
+            results['tape pose'] = []
+        if foundTape == True:
+            results['tape'].append({'distance': tapeRealWorldValues['TapeDistance'],
+                                    'angle': tapeRealWorldValues['HAngle'],
+                                    'offset': tapeRealWorldValues['CenterOffset']})
+        if tapeRealWorldValues['PoseFound'] == True:
+            poseX, poseZ = tapeRealWorldValues['PoseX'], tapeRealWorldValues['PoseZ']
+            results['tape pose'].append({'distance': math.hypot(poseX, poseZ),
+                                         'angle': math.degrees(math.atan2(poseX, poseZ)), 'offset': -poseX})
+
+    return results, time.perf_counter() - start
+
+
+# Define matching method (greedy nearest angle, returns error rows and misses)
+def match_targets(truths, found):
+
+    errors = []
+    misses = 0
+    unused = list(found)
+    for truth in sorted(truths, key=lambda t: t['distance']):
+        if len(unused) == 0:
+            misses += 1
+            continue
+        nearest = min(unused, key=lambda f: abs(f['angle'] - truth['angle']))
+        if abs(nearest['angle'] - truth['angle']) > matchTolerance:
+            misses += 1
+            continue
+        unused.remove(nearest)
+        errors.append((100.0 * (nearest['distance'] - truth['distance']) / truth['distance'],
+                       nearest['angle'] - truth['angle'],
+                       nearest['offset'] - truth['offset']))
+
+    return errors, misses
+
+
+# Define accuracy run method (returns per detector results)
+def run_dataset(vision, folder, dataset, useModel):
+
+    projections = {}
+    for name, camera in dataset['cameras'].items():
+        projections[name] = FRCProjection(camera['width'], camera['height'], camera['fov']) if useModel else None
+
+    results = {}
+    for frame in dataset['frames']:
+        img = cv.imread(os.path.join(folder, frame['image']))
+        if img is None:
+            print('Unable to read ' + frame['image'])
+            continue
+
+        camera = dataset['cameras'][frame['camera']]
+        found, seconds = detect(vision, frame['target'], img, camera, projections[frame['camera']])
+        for name, measurements in found.items():
+            result = results.setdefault(name, {'errors': [], 'misses': 0, 'targets': 0, 'times': []})
+            errors, misses = match_targets(frame['targets'], measurements)
+            result['errors'].extend(errors)
+            result['misses'] += misses
+            result['targets'] += len(frame['targets'])
+            result['times'].append(seconds)
+
+    return results
+
+
+# Define report method (returns the summary for one detector)
+def summarize(name, result):
+
+    errors = np.abs(np.array(result['errors'])).reshape(-1, 3)
+    times = 1000 * np.array(result['times'])
+    summary = {'detection_rate': 1.0 - result['misses'] / max(result['targets'], 1),
+               'latency_ms': float(np.percentile(times, 95)) if len(times) > 0 else 0.0}
+
+    print('%s: %d of %d targets found, %.2f ms mean / %.2f ms p95 per frame' % (
+        name, len(errors), result['targets'], times.mean() if len(times) > 0 else 0.0, summary['latency_ms']))
+    for column, (key, units) in enumerate((('distance_pct', '%'), ('angle_deg', 'deg'), ('offset_in', 'in'))):
+        values = errors[:, column]
+        if len(values) == 0:
+            summary[key] = float('inf')
+            continue
+        summary[key] = float(np.percentile(values, 95))
+        print('  %-9s mean %6.2f  p50 %6.2f  p95 %6.2f  max %6.2f %s' % (key.split('_')[0], values.mean(),
+              np.percentile(values, 50), summary[key], values.max(), units))
+
+    return summary
+
+
+# Define threshold check method (returns number of failures)
+def check_thresholds(summaries, thresholds):
+
+    failures = 0
+    print('')
+    for name, summary in summaries.items():
+        for key, limit in thresholds.get(name, {}).items():
+            value = summary[key]
+            if key == 'detection_rate':
+                failed = value < limit
+            else:
+                failed = value > limit
+            if failed:
+                failures += 1
+                print('FAIL %-10s %-15s %8.2f (limit %.2f)' % (name, key, value, limit))
+
+    print('%d threshold failures' % failures)
+    return failures
+
+
+# Define main method
+def main():
+
+    # Parse arguments
+    parser = argparse.ArgumentParser(description='Check VisionLibrary detector accuracy')
+    parser.add_argument('dataset', help='dataset folder (frames plus ' + truthFile + ')')
+    parser.add_argument('--settings', default=visionFile, help='vision settings file')
+    parser.add_argument('--cameras', default=cameraFile, help='camera settings file')
+    parser.add_argument('--generate', action='store_true', help='render a synthetic dataset first')
+    parser.add_argument('--count', type=int, default=60, help='synthetic frames per target')
+    parser.add_argument('--seed', type=int, default=4121, help='synthetic dataset seed')
+    parser.add_argument('--thresholds', default=None, help='JSON file of limits per detector')
+    parser.add_argument('--compare-fov', action='store_true', help='also report the FOV based math')
+    args = parser.parse_args()
+
+    vision = VisionLibrary(args.settings)
+    if args.generate == True:
+        generate_dataset(vision, args.dataset, read_camera_file(args.cameras), args.count, args.seed)
+    dataset = load_dataset(args.dataset)
+
+    thresholds = defaultThresholds
+    if args.thresholds is not None:
+        with open(args.thresholds, 'r') as in_file:
+            thresholds = json.load(in_file)
+
+    # Older FOV math for comparison only
+    if args.compare_fov == True:
+        print('FOV math')
+        for name, result in run_dataset(vision, args.dataset, dataset, False).items():
+            summarize(name, result)
+        print('')
+
+    # Camera model (as run on the robot) is checked against the limits
+    print('Camera model')
+    summaries = {}
+    for name, result in run_dataset(vision, args.dataset, dataset, True).items():
+        summaries[name] = summarize(name, result)
+    if check_thresholds(summaries, thresholds) > 0:
+        sys.exit(1)
+
+
+#define main function
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/env python3
+
+####################################################################
+#                                                                  #
+#                 FRC Vision Benchmark Test App                    #
+#                                                                  #
+#  This program measures the throughput of the VisionLibrary       #
+#  detectors without a camera.  Frames with balls, field markers   #
+#  and the vision tape goal are rendered at 320x240 and 640x480    #
+#  with and without sensor noise, and recorded frames (a folder    #
+#  of images or a match video) can be added.  For each detector    #
+#  the frames per second, mean and p95 time and the peak memory    #
+#  allocated per frame are reported.  Results can be saved and     #
+#  compared against a saved baseline so slowdowns are caught       #
+#  before competition.                                             #
+#                                                                  #
+#  Usage: TestVisionBenchmarkApp.py [--recorded dir_or_video]      #
+#                 [--save results.json] [--baseline results.json]  #
+#                                                                  #
+#  @Version: 1.0                                                   #
+#  @Created: 2021-03-27                                            #
+#  @Author: Team 4121                                              #
+#                                                                  #
+####################################################################
+
+"""Vision detector benchmark application"""
+
+# System imports
+import sys
+import os
+import time
+import json
+import argparse
+import tracemalloc
+
+# Setup paths
+sys.path.append('/home/pi/Team4121/Libraries')
+
+# Module imports
+import cv2 as cv
+import numpy as np
+
+# Team 4121 module imports
+from FRCVisionLibrary import VisionLibrary
+from FRCSyntheticFrameLibrary import FRCSyntheticCamera
+
+# Set test values
+visionFile = '/home/pi/Team4121/Config/2021VisionSettings.txt'
+resolutions = [(320, 240), (640, 480)]
+noiseLevels = [0.0, 8.0]
+cameraFOV = 23.5
+cameraFocalLength = 340.0
+cameraMountAngle = 25.0
+cameraMountHeight = 26.0
+image_types = ('.jpg', '.jpeg', '.png', '.bmp')
+
+
+# Define synthetic frame method (targets at random known positions)
+def make_frames(vision, width, height, count, noise, seed):
+
+    camera = FRCSyntheticCamera(vision, width, height, cameraFOV, 0.0, 0.0, seed)
+    random = np.random.default_rng(seed)
+    frames = []
+    for n in range(count):
+        balls = [(random.uniform(-30, 30), random.uniform(60, 200)) for i in range(random.integers(0, 4))]
+        markers = [(random.uniform(-40, 40), random.uniform(80, 240)) for i in range(random.integers(0, 3))]
+        img, truth = camera.render(balls, markers, noise=noise)
+
+        # Goal tape seen through the tilted goal camera
+        goalCamera = FRCSyntheticCamera(vision, width, height, cameraFOV, cameraMountAngle, cameraMountHeight,
+                                        seed + n)
+        tape = (random.uniform(-30, 30), random.uniform(120, 300), random.uniform(-10, 10))
+        goalImg, goalTruth = goalCamera.render(tape=tape, noise=noise)
+        frames.append((img, goalImg))
+
+    return frames
+
+
+# Define recorded frame method (folder of images or a video file)
+def load_recorded(path, limit):
+
+    frames = []
+    if os.path.isdir(path):
+        for filename in sorted(os.listdir(path)):
+            if filename.lower().endswith(image_types) and len(frames) < limit:
+                img = cv.imread(os.path.join(path, filename))
+                if img is not None:
+                    frames.append(img)
+    else:
+        clip = cv.VideoCapture(path)
+        while len(frames) < limit:
+            grabbed, img = clip.read()
+            if grabbed == False:
+                break
+            frames.append(img)
+        clip.release()
+
+    return frames
+
+
+# Define detector list (name, uses goal frame, call)
+def make_detectors(vision, width, height):
+
+    ballHSVMin = tuple(int(VisionLibrary.ball_values[k]) for k in ('HMIN', 'SMIN', 'VMIN'))
+    ballHSVMax = tuple(int(VisionLibrary.ball_values[k]) for k in ('HMAX', 'SMAX', 'VMAX'))
+
+    return [('process_image_contours', False,
+             lambda img: vision.process_image_contours(img, ballHSVMin, ballHSVMax, True)),
+            ('detect_game_balls', False,
+             lambda img: vision.detect_game_balls(img, width, height, cameraFOV)),
+            ('detect_field_marker', False,
+             lambda img: vision.detect_field_marker(img, width, height, cameraFOV)),
+            ('detect_tape_rectangle', True,
+             lambda img: vision.detect_tape_rectangle(img, width, height, cameraFOV, cameraFocalLength,
+                                                      cameraMountAngle, cameraMountHeight))]
+
+
+# Define timing method (returns per frame seconds)
+def time_detector(call, frames, repeat):
+
+    # Warm up caches and OpenCV thread pools
+    for img in frames[0:3]:
+        call(img)
+
+    times = []
+    for r in range(repeat):
+        for img in frames:
+            start = time.perf_counter()
+            call(img)
+            times.append(time.perf_counter() - start)
+
+    return np.array(times)
+
+
+# Define allocation method (peak bytes allocated while processing one frame)
+def measure_allocations(call, frames):
+
+    peaks = []
+    tracemalloc.start()
+    for img in frames[0:10]:
+        tracemalloc.reset_peak()
+        current = tracemalloc.get_traced_memory()[0]
+        call(img)
+        peaks.append(tracemalloc.get_traced_memory()[1] - current)
+    tracemalloc.stop()
+
+    return float(np.mean(peaks))
+
+
+# Define benchmark method for one frame set
+def run_set(results, label, detectors, fieldFrames, goalFrames, repeat):
+
+    for name, useGoal, call in detectors:
+        frames = goalFrames if useGoal else fieldFrames
+        times = time_detector(call, frames, repeat)
+        allocated = measure_allocations(call, frames)
+        key = label + ' ' + name
+        results[key] = {'fps': float(1.0 / times.mean()), 'mean_ms': float(1000 * times.mean()),
+                        'p95_ms': float(1000 * np.percentile(times, 95)), 'alloc_kb': allocated / 1024}
+        print('%-44s %8.1f fps %7.2f ms %7.2f ms p95 %9.1f KB/frame' % (key, results[key]['fps'],
+              results[key]['mean_ms'], results[key]['p95_ms'], results[key]['alloc_kb']))
+
+
+# Define baseline comparison method (returns number of regressions)
+def compare_baseline(results, baselineFile, tolerance):
+
+    with open(baselineFile, 'r') as in_file:
+        baseline = json.load(in_file)
+
+    regressions = 0
+    print('')
+    print('Compared with ' + baselineFile)
+    for key, value in results.items():
+        if key not in baseline:
+            continue
+        change = value['mean_ms'] / baseline[key]['mean_ms'] - 1.0
+        flag = ''
+        if change > tolerance:
+            flag = '  <-- SLOWER'
+            regressions += 1
+        print('%-44s %+6.1f%%%s' % (key, 100 * change, flag))
+
+    return regressions
+
+
+# Define main method
+def main():
+
+    # Parse arguments
+    parser = argparse.ArgumentParser(description='Benchmark VisionLibrary detectors')
+    parser.add_argument('--settings', default=visionFile, help='vision settings file')
+    parser.add_argument('--frames', type=int, default=40, help='synthetic frames per set')
+    parser.add_argument('--repeat', type=int, default=3, help='passes over each frame set')
+    parser.add_argument('--recorded', default=None, help='folder of frames or a video file')
+    parser.add_argument('--save', default=None, help='save results to a JSON file')
+    parser.add_argument('--baseline', default=None, help='compare with saved results')
+    parser.add_argument('--tolerance', type=float, default=0.15, help='allowed slowdown (fraction)')
+    args = parser.parse_args()
+
+    vision = VisionLibrary(args.settings)
+    recorded = load_recorded(args.recorded, 200) if args.recorded is not None else []
+    results = {}
+
+    for width, height in resolutions:
+
+        detectors = make_detectors(vision, width, height)
+
+        # Synthetic frames at each noise level
+        for noise in noiseLevels:
+            frames = make_frames(vision, width, height, args.frames, noise, 4121)
+            label = '%dx%d noise %d' % (width, height, noise)
+            run_set(results, label, detectors, [f[0] for f in frames], [f[1] for f in frames], args.repeat)
+
+        # Recorded frames scaled to this resolution
+        if len(recorded) > 0:
+            frames = [cv.resize(img, (width, height), interpolation=cv.INTER_AREA) for img in recorded]
+            run_set(results, '%dx%d recorded' % (width, height), detectors, frames, frames, 1)
+
+    # Save and compare results
+    if args.save is not None:
+        with open(args.save, 'w') as out_file:
+            json.dump(results, out_file, indent=2)
+        print('Saved results to ' + args.save)
+    if args.baseline is not None:
+        if compare_baseline(results, args.baseline, args.tolerance) > 0:
+            sys.exit(1)
+
+
+#define main function
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,209 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/env python3
+
+###############################################################
+#                                                             #
+#                FRC Batch Camera Calibration                 #
+#                                                             #
+#  This program calibrates one or more webcams from folders   #
+#  of saved chessboard images instead of live frames.  Corner #
+#  detection for every image runs across a process pool, and  #
+#  each camera is then calibrated in its own process.  The    #
+#  reprojection error of every image is reported so blurry or #
+#  mis-detected images can be found and removed.  Results are #
+#  written to the Camera_Matrix_Cam<id>.txt and               #
+#  Distortion_Coeffs_Cam<id>.txt files that FRCWebCam loads.  #
+#                                                             #
+#  Usage:                                                     #
+#    Batch_Camera_Calibration.py 0=Images/Cam0 1=Images/Cam1  #
+#                   [--board 9x6] [--output dir] [--workers n]#
+#                                                             #
+#  @Author: Team4121                                          #
+#  @Created: 2021-03-25                                       #
+#  @Version: 1.0                                              #
+#                                                             #
+###############################################################
+
+"""FRC batch webcam calibration utility"""
+
+# System imports
+import os
+import time
+import argparse
+from multiprocessing import Pool
+
+# Module imports
+import cv2 as cv
+import numpy as np
+
+# Set general variables
+calibration_dir = '/home/pi/Team4121/Config'
+image_types = ('.jpg', '.jpeg', '.png', '.bmp')
+criteria = (cv.TERM_CRITERIA_EPS + cv.TERM_CRITERIA_MAX_ITER, 30, 0.001)
+
+# Fast check rejects frames without a chessboard before the full search
+board_flags = cv.CALIB_CB_ADAPTIVE_THRESH + cv.CALIB_CB_NORMALIZE_IMAGE + cv.CALIB_CB_FAST_CHECK
+
+
+# Define worker setup method (one OpenCV thread per process avoids oversubscription)
+def init_worker():
+
+    cv.setNumThreads(1)
+
+
+# Define image listing method
+def list_images(directory):
+
+    return sorted(os.path.join(directory, f) for f in os.listdir(directory)
+                  if f.lower().endswith(image_types))
+
+
+# Define corner detection method (runs in a worker process)
+def detect_corners(task):
+
+    camId, filename, boardSize = task
+
+    # Read image as grayscale
+    gray = cv.imread(filename, cv.IMREAD_GRAYSCALE)
+    if gray is None:
+        return camId, filename, None, None
+
+    # Find and sharpen chessboard corners
+    imageSize = gray.shape[::-1]
+    found, corners = cv.findChessboardCorners(gray, boardSize, board_flags)
+    if found == False:
+        return camId, filename, imageSize, None
+    corners = cv.cornerSubPix(gray, corners, (11, 11), (-1, -1), criteria)
+
+    return camId, filename, imageSize, corners
+
+
+# Define board object point method
+def board_points(boardSize, squareSize):
+
+    objp = np.zeros((boardSize[0] * boardSize[1], 3), np.float32)
+    objp[:, :2] = np.mgrid[0:boardSize[0], 0:boardSize[1]].T.reshape(-1, 2) * squareSize
+    return objp
+
+
+# Define camera calibration method (runs in a worker process)
+def calibrate_camera(job):
+
+    camId, imageSize, filenames, imgpoints, objp = job
+    objpoints = [objp] * len(imgpoints)
+
+    # Calculate camera calibration
+    rms, cam_matrix, dist_coeffs, rotate_vecs, translate_vecs = cv.calibrateCamera(
+        objpoints, imgpoints, imageSize, None, None)
+
+    # Calculate reprojection error of each image
+    errors = []
+    for i in range(len(imgpoints)):
+        projected, _ = cv.projectPoints(objp, rotate_vecs[i], translate_vecs[i], cam_matrix, dist_coeffs)
+        diff = projected.reshape(-1, 2) - imgpoints[i].reshape(-1, 2)
+        errors.append(float(np.sqrt(np.mean(np.sum(diff * diff, axis=1)))))
+
+    return camId, imageSize, filenames, rms, cam_matrix, dist_coeffs, errors
+
+
+# Define calibration save method
+def save_calibration(directory, camId, cam_matrix, dist_coeffs):
+
+    matrix_filename = directory + '/Camera_Matrix_Cam' + str(camId) + '.txt'
+    coeff_filename = directory + '/Distortion_Coeffs_Cam' + str(camId) + '.txt'
+    np.savetxt(matrix_filename, cam_matrix)
+    np.savetxt(coeff_filename, dist_coeffs)
+    return matrix_filename, coeff_filename
+
+
+# Define folder calibration method (cameras as ID=DIR, returns one result per camera)
+def calibrate_folders(cameras, boardSize, squareSize, workers, maxError=None):
+
+    objp = board_points(boardSize, squareSize)
+
+    # Build corner detection tasks for every camera
+    tasks = []
+    for camera in cameras:
+        camId, directory = camera.split('=', 1)
+        images = list_images(directory)
+        print('Camera %s: %d images in %s' % (camId, len(images), directory))
+        tasks += [(camId, f, boardSize) for f in images]
+
+    with Pool(workers, initializer=init_worker) as pool:
+
+        # Detect corners across the pool
+        startTime = time.perf_counter()
+        detected = {}
+        cornersByFile = {}
+        for camId, filename, imageSize, corners in pool.imap_unordered(detect_corners, tasks, chunksize=4):
+            if corners is None:
+                print('  Cam%s rejected %s' % (camId, os.path.basename(filename)))
+                continue
+            detected.setdefault(camId, []).append((filename, imageSize, corners))
+            cornersByFile[filename] = corners
+        print('Corner detection: %d images in %.1f s' % (len(tasks), time.perf_counter() - startTime))
+
+        # Build one calibration job per camera (images must share one size)
+        jobs = []
+        for camId, views in sorted(detected.items()):
+            views.sort(key=lambda v: v[0])
+            sizes = [v[1] for v in views]
+            imageSize = max(set(sizes), key=sizes.count)
+            views = [v for v in views if v[1] == imageSize]
+            if len(views) < 3:
+                print('Camera %s: only %d usable images, skipped' % (camId, len(views)))
+                continue
+            jobs.append((camId, imageSize, [v[0] for v in views], [v[2] for v in views], objp))
+
+        # Calibrate cameras in parallel
+        startTime = time.perf_counter()
+        results = pool.map(calibrate_camera, jobs)
+
+        # Drop poor images and recalibrate if requested
+        if maxError is not None:
+            jobs = []
+            for camId, imageSize, filenames, rms, cam_matrix, dist_coeffs, errors in results:
+                keep = [i for i in range(len(errors)) if errors[i] <= maxError]
+                if len(keep) >= 3 and len(keep) < len(errors):
+                    jobs.append((camId, imageSize, [filenames[i] for i in keep],
+                                 [cornersByFile[filenames[i]] for i in keep], objp))
+            redone = {r[0]: r for r in pool.map(calibrate_camera, jobs)}
+            results = [redone.get(r[0], r) for r in results]
+        print('Calibration: %d cameras in %.1f s' % (len(results), time.perf_counter() - startTime))
+
+    return results
+
+
+# Define main method
+def main():
+
+    # Parse arguments
+    parser = argparse.ArgumentParser(description='Calibrate webcams from saved chessboard images')
+    parser.add_argument('cameras', nargs='+', help='camera id and image folder as ID=DIR')
+    parser.add_argument('--board', default='9x6', help='inner corners per row x column')
+    parser.add_argument('--square', type=float, default=1.0, help='chessboard square size')
+    parser.add_argument('--output', default=calibration_dir, help='directory for calibration files')
+    parser.add_argument('--workers', type=int, default=os.cpu_count(), help='worker processes')
+    parser.add_argument('--max-error', type=float, default=None,
+                        help='drop images above this reprojection error (pixels) and recalibrate')
+    args = parser.parse_args()
+
+    # Detect corners and calibrate across the pool
+    boardSize = tuple(int(n) for n in args.board.lower().split('x'))
+    results = calibrate_folders(args.cameras, boardSize, args.square, args.workers, args.max_error)
+
+    # Report and save results
+    for camId, imageSize, filenames, rms, cam_matrix, dist_coeffs, errors in results:
+        print('')
+        print('Camera %s  %dx%d  %d images  RMS %.3f px' % (camId, imageSize[0], imageSize[1], len(filenames), rms))
+        for filename, error in zip(filenames, errors):
+            flag = '  <-- check' if error > 2.0 * rms else ''
+            print('  %-32s %6.3f px%s' % (os.path.basename(filename), error, flag))
+        matrix_filename, coeff_filename = save_calibration(args.output, camId, cam_matrix, dist_coeffs)
+        print('  Saved ' + matrix_filename)
+        print('  Saved ' + coeff_filename)
+
+
+# Run main method
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,323 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/env python3
+
+###############################################################
+#                                                             #
+#                    HSV Range Auto Tuner                     #
+#                                                             #
+#  This program fits the HSV min/max box for a vision target  #
+#  from recorded frames with labeled target and background    #
+#  polygons, instead of dragging trackbars against a live     #
+#  camera.  Labeled pixels are binned into 3D HSV histograms  #
+#  and the box with the best IoU against the target labels    #
+#  is found with a vectorized coordinate search, keeping the  #
+#  tightest bounds that reach the best score.  Frames are     #
+#  blurred with the BLUR and BLURTYPE of the target section   #
+#  so the fit sees the same pixels as the pipeline.  The      #
+#  result is written into the BALL:, VISIONTAPE: or MARKER:   #
+#  section of the vision settings file.                       #
+#                                                             #
+#  Labels file (JSON, image paths relative to the file):      #
+#    {"frames": [{"image": "frame_001.jpg",                   #
+#                 "target": [[[x, y], ...], ...],             #
+#                 "background": [[[x, y], ...], ...]}]}       #
+#  Frames without background polygons use every pixel that    #
+#  is not target as background.                               #
+#                                                             #
+#  Usage:                                                     #
+#    HSV_Auto_Tuner.py labels.json --target VISIONTAPE        #
+#                      --settings 2021VisionSettings.txt      #
+#                                                             #
+#  @Author: Team4121                                          #
+#  @Created: 2021-03-24                                       #
+#  @Version: 1.0                                              #
+#                                                             #
+###############################################################
+
+"""FRC HSV range auto tuner"""
+
+# System imports
+import sys
+import os
+import json
+import argparse
+
+# Setup paths
+sys.path.append('/home/pi/Team4121/Libraries')
+
+# Module imports
+import cv2 as cv
+import numpy as np
+
+# Team 4121 module imports
+from FRCFilterLibrary import filter_settings, blur_image
+
+# Set histogram bin sizes (hue, saturation, value)
+bin_sizes = (1, 4, 4)
+bin_counts = (180 // bin_sizes[0], 256 // bin_sizes[1], 256 // bin_sizes[2])
+
+
+# Define label loading method
+def load_labels(labelfile):
+
+    with open(labelfile, 'r') as in_file:
+        labels = json.load(in_file)
+
+    # Resolve image paths relative to the labels file
+    labelDir = os.path.dirname(os.path.abspath(labelfile))
+    for frame in labels['frames']:
+        frame['image'] = os.path.join(labelDir, frame['image'])
+
+    return labels['frames']
+
+
+# Define polygon mask method
+def polygon_mask(shape, polygons):
+
+    mask = np.zeros(shape[0:2], dtype=np.uint8)
+    if len(polygons) > 0:
+        cv.fillPoly(mask, [np.array(p, dtype=np.int32) for p in polygons], 255)
+    return mask
+
+
+# Define histogram method (3D histogram of HSV bins for the masked pixels)
+def hsv_histogram(hsv, mask):
+
+    pixels = hsv[mask > 0]
+    h = pixels[:, 0] // bin_sizes[0]
+    s = pixels[:, 1] // bin_sizes[1]
+    v = pixels[:, 2] // bin_sizes[2]
+    flat = (h.astype(np.int64) * bin_counts[1] + s) * bin_counts[2] + v
+    size = bin_counts[0] * bin_counts[1] * bin_counts[2]
+    return np.bincount(flat, minlength=size).reshape(bin_counts)
+
+
+# Define settings section read method (values of one target section)
+def read_section(settingsfile, section):
+
+    values = {}
+    inSection = False
+    with open(settingsfile, 'r') as in_file:
+        for line in in_file:
+            parts = line.strip().split(',')
+            key = parts[0].upper()
+            if key == section + ':':
+                inSection = True
+            elif key == '' or key.endswith(':'):
+                inSection = False
+            elif inSection and len(parts) > 1:
+                values[key] = parts[1]
+
+    return values
+
+
+# Define histogram build method for all labeled frames (blurred like the pipeline)
+def build_histograms(frames, blurSize, blurType):
+
+    targetHist = np.zeros(bin_counts, dtype=np.int64)
+    backgroundHist = np.zeros(bin_counts, dtype=np.int64)
+
+    for frame in frames:
+
+        # Process frame the same way the vision library does
+        img = cv.imread(frame['image'])
+        if img is None:
+            print('Unable to read ' + frame['image'])
+            continue
+        hsv = cv.cvtColor(blur_image(img, blurSize, blurType), cv.COLOR_BGR2HSV)
+
+        # Build label masks
+        targetMask = polygon_mask(img.shape, frame.get('target', []))
+        if len(frame.get('background', [])) > 0:
+            backgroundMask = polygon_mask(img.shape, frame['background'])
+            backgroundMask[targetMask > 0] = 0
+        else:
+            backgroundMask = cv.bitwise_not(targetMask)
+
+        targetHist += hsv_histogram(hsv, targetMask)
+        backgroundHist += hsv_histogram(hsv, backgroundMask)
+
+    return targetHist, backgroundHist
+
+
+# Define summed volume table method (zero padded on the low side)
+def summed_volume(hist):
+
+    table = np.zeros((hist.shape[0] + 1, hist.shape[1] + 1, hist.shape[2] + 1), dtype=np.int64)
+    table[1:, 1:, 1:] = hist.cumsum(0).cumsum(1).cumsum(2)
+    return table
+
+
+# Define box sum method (bounds inclusive, any bound may be an array)
+def box_sum(table, lo, hi):
+
+    h0, s0, v0 = lo
+    h1, s1, v1 = hi[0] + 1, hi[1] + 1, hi[2] + 1
+    return (table[h1, s1, v1] - table[h0, s1, v1] - table[h1, s0, v1] - table[h1, s1, v0]
+            + table[h0, s0, v1] + table[h0, s1, v0] + table[h1, s0, v0] - table[h0, s0, v0])
+
+
+# Define IoU method (labeled pixels only)
+def box_iou(targetTable, backgroundTable, targetTotal, lo, hi):
+
+    tp = box_sum(targetTable, lo, hi)
+    fp = box_sum(backgroundTable, lo, hi)
+    return tp / np.maximum(targetTotal + fp, 1)
+
+
+# Define starting box method (percentiles of target pixels on each axis)
+def initial_box(targetHist, percent=2.0):
+
+    lo = []
+    hi = []
+    for axis in range(3):
+        others = tuple(a for a in range(3) if a != axis)
+        cdf = np.cumsum(targetHist.sum(axis=others))
+        total = max(cdf[-1], 1)
+        lo.append(int(np.searchsorted(cdf, total * percent / 100.0)))
+        hi.append(int(np.searchsorted(cdf, total * (100.0 - percent) / 100.0)))
+        hi[axis] = max(hi[axis], lo[axis])
+
+    return lo, hi
+
+
+# Define bound pick method (tightest bound with the best score, so empty bins are not taken in)
+def pick_bound(scores, highest):
+
+    ties = np.flatnonzero(scores >= scores.max() - 1e-9)
+    if highest == True:
+        return int(ties[-1])
+    return int(ties[0])
+
+
+# Define box search method (coordinate ascent, each bound scanned in one shot)
+def fit_box(targetHist, backgroundHist, iterations=20):
+
+    targetTable = summed_volume(targetHist)
+    backgroundTable = summed_volume(backgroundHist)
+    targetTotal = int(targetHist.sum())
+
+    lo, hi = initial_box(targetHist)
+    best = float(box_iou(targetTable, backgroundTable, targetTotal, lo, hi))
+
+    for iteration in range(iterations):
+
+        improved = False
+        for axis in range(3):
+
+            # Scan every value for the low bound
+            candidates = np.arange(0, hi[axis] + 1)
+            trialLo = list(lo)
+            trialLo[axis] = candidates
+            scores = box_iou(targetTable, backgroundTable, targetTotal, trialLo, hi)
+            i = pick_bound(scores, True)
+            improved = improved or scores[i] > best + 1e-9
+            best = max(best, float(scores[i]))
+            lo[axis] = int(candidates[i])
+
+            # Scan every value for the high bound
+            candidates = np.arange(lo[axis], bin_counts[axis])
+            trialHi = list(hi)
+            trialHi[axis] = candidates
+            scores = box_iou(targetTable, backgroundTable, targetTotal, lo, trialHi)
+            i = pick_bound(scores, False)
+            improved = improved or scores[i] > best + 1e-9
+            best = max(best, float(scores[i]))
+            hi[axis] = int(candidates[i])
+
+        if improved is False:
+            break
+
+    # Report precision and recall for the chosen box
+    tp = int(box_sum(targetTable, lo, hi))
+    fp = int(box_sum(backgroundTable, lo, hi))
+    precision = tp / max(tp + fp, 1)
+    recall = tp / max(targetTotal, 1)
+
+    # Convert bins back to HSV values
+    hsvMin = [lo[a] * bin_sizes[a] for a in range(3)]
+    hsvMax = [(hi[a] + 1) * bin_sizes[a] - 1 for a in range(3)]
+
+    return hsvMin, hsvMax, best, precision, recall
+
+
+# Define settings file update method
+def update_settings_file(settingsfile, section, hsvMin, hsvMax):
+
+    # Read settings lines
+    with open(settingsfile, 'r') as in_file:
+        lines = in_file.read().split('\n')
+
+    # Values to write
+    values = {'HMIN': hsvMin[0], 'HMAX': hsvMax[0],
+              'SMIN': hsvMin[1], 'SMAX': hsvMax[1],
+              'VMIN': hsvMin[2], 'VMAX': hsvMax[2]}
+
+    # Replace values inside the section
+    inSection = False
+    sectionEnd = None
+    for i, line in enumerate(lines):
+        key = line.strip().split(',')[0].upper()
+        if key == section + ':':
+            inSection = True
+            sectionEnd = i + 1
+        elif inSection and (key == '' or key.endswith(':')):
+            inSection = False
+        elif inSection:
+            sectionEnd = i + 1
+            if key in values:
+                lines[i] = key + ',' + str(values.pop(key))
+
+    # Add any missing keys at the end of the section
+    if sectionEnd is None:
+        lines += ['', section + ':']
+        sectionEnd = len(lines)
+    for key, value in values.items():
+        lines.insert(sectionEnd, key + ',' + str(value))
+        sectionEnd += 1
+
+    # Write settings file
+    with open(settingsfile, 'w') as out_file:
+        out_file.write('\n'.join(lines))
+
+
+# Define main method
+def main():
+
+    # Parse arguments
+    parser = argparse.ArgumentParser(description='Fit HSV ranges from labeled frames')
+    parser.add_argument('labels', help='labels file (JSON)')
+    parser.add_argument('--target', required=True, choices=['BALL', 'VISIONTAPE', 'MARKER'],
+                        help='vision settings section to update')
+    parser.add_argument('--settings', default=None, help='vision settings file to update')
+    args = parser.parse_args()
+
+    # Blur the way the pipeline does for this target
+    values = {}
+    if args.settings is not None:
+        values = read_section(args.settings, args.target)
+    blurSize, blurType, openSize = filter_settings(values)
+    print('Blur: %s %d' % (blurType, blurSize))
+
+    # Build histograms from labeled frames
+    frames = load_labels(args.labels)
+    targetHist, backgroundHist = build_histograms(frames, blurSize, blurType)
+    print('Labeled pixels: %d target, %d background' % (targetHist.sum(), backgroundHist.sum()))
+    if targetHist.sum() == 0:
+        print('No target pixels labeled')
+        return
+
+    # Fit the HSV box
+    hsvMin, hsvMax, iou, precision, recall = fit_box(targetHist, backgroundHist)
+    print('HSV min: %s  HSV max: %s' % (tuple(hsvMin), tuple(hsvMax)))
+    print('IoU %.3f  precision %.3f  recall %.3f' % (iou, precision, recall))
+
+    # Write results to the vision settings file
+    if args.settings is not None:
+        update_settings_file(args.settings, args.target, hsvMin, hsvMax)
+        print('Updated ' + args.target + ' section of ' + args.settings)
+
+
+# Run main method
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,157 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/env python3
+
+###############################################################
+#                                                             #
+#                    FRC Match Replay                         #
+#                                                             #
+#  This program replays a match video using the sidecar frame #
+#  index written with it.  Frames are read straight from      #
+#  their byte offsets so any moment in the match can be shown #
+#  without decoding the video up to that point.               #
+#                                                             #
+#  Keys:  d/a = next/previous frame                           #
+#         w/s = forward/back one second                       #
+#         l/k = next/previous TargetLock change               #
+#         Esc = quit                                          #
+#                                                             #
+#  Headless use:                                              #
+#    Match_Replay.py GoalCam_001.avi --time 95.5 --save out   #
+#    Match_Replay.py GoalCam_001.avi --lock-changes --save out#
+#                                                             #
+#  @Author: Team4121                                          #
+#  @Created: 2021-03-23                                       #
+#  @Version: 1.0                                              #
+#                                                             #
+###############################################################
+
+"""FRC match video replay utility"""
+
+# System imports
+import sys
+import os
+import argparse
+
+# Setup paths
+sys.path.append('/home/pi/Team4121/Libraries')
+
+# Module imports
+import cv2 as cv
+
+# Team 4121 module imports
+from FRCRecordingLibrary import load_recording, read_frame, read_frame_bytes
+from FRCRecordingLibrary import find_frame_at_time, find_lock_changes
+
+
+# Define frame annotation method
+def annotate_frame(img, row, startTime):
+
+    color = (0, 255, 0) if row['lock'] else (0, 0, 255)
+    cv.putText(img, 'Frame %d  T+%.2f s' % (row['frame'], row['time'] - startTime), (10, 15),
+               cv.FONT_HERSHEY_SIMPLEX, .45, color, 1)
+    cv.putText(img, 'Found %d  Lock %d' % (row['found'], row['lock']), (10, 32),
+               cv.FONT_HERSHEY_SIMPLEX, .45, color, 1)
+    cv.putText(img, 'Dist %.1f  Angle %.1f  Offset %.1f' % (row['distance'], row['angle'], row['targetoffset']),
+               (10, 49), cv.FONT_HERSHEY_SIMPLEX, .45, color, 1)
+    return img
+
+
+# Define frame save method (copies the JPEG without re-encoding)
+def save_frame(videofile, row, directory):
+
+    filename = os.path.join(directory, 'Frame_%05d.jpg' % row['frame'])
+    with open(filename, 'wb') as out_file:
+        out_file.write(read_frame_bytes(videofile, row['offset'], row['size']))
+    print('Saved ' + filename)
+
+
+# Define interactive replay method
+def replay(videofile, rows, index, lockChanges):
+
+    startTime = rows[0]['time']
+    fps = max(1, int(round(len(rows) / max(rows[-1]['time'] - startTime, 1e-3))))
+
+    while True:
+
+        # Read and show just this frame
+        row = rows[index]
+        img = read_frame(videofile, row['offset'], row['size'])
+        if img is not None:
+            cv.imshow('Replay', annotate_frame(img, row, startTime))
+
+        # Move through the match
+        key = cv.waitKey(0) & 0xFF
+        if key == 27:
+            break
+        elif key == ord('d'):
+            index = min(index + 1, len(rows) - 1)
+        elif key == ord('a'):
+            index = max(index - 1, 0)
+        elif key == ord('w'):
+            index = min(index + fps, len(rows) - 1)
+        elif key == ord('s'):
+            index = max(index - fps, 0)
+        elif key == ord('l'):
+            later = [i for i in lockChanges if i > index]
+            if len(later) > 0:
+                index = later[0]
+        elif key == ord('k'):
+            earlier = [i for i in lockChanges if i < index]
+            if len(earlier) > 0:
+                index = earlier[-1]
+
+    cv.destroyAllWindows()
+
+
+# Define main method
+def main():
+
+    # Parse arguments
+    parser = argparse.ArgumentParser(description='Replay a match video using its frame index')
+    parser.add_argument('video', help='match video (.avi) with a _index.csv sidecar')
+    parser.add_argument('--time', type=float, default=None, help='seconds from start of recording')
+    parser.add_argument('--frame', type=int, default=None, help='frame number')
+    parser.add_argument('--lock-changes', action='store_true', help='list frames where TargetLock changed')
+    parser.add_argument('--save', default=None, help='directory to save selected frames to (no window)')
+    args = parser.parse_args()
+
+    # Load the frame index
+    try:
+        rows = load_recording(args.video)
+    except ValueError as load_error:
+        print(str(load_error))
+        sys.exit(1)
+    if len(rows) == 0:
+        print('No indexed frames for ' + args.video)
+        return
+    lockChanges = find_lock_changes(rows)
+    print('%d frames, %d TargetLock changes' % (len(rows), len(lockChanges)))
+
+    # Pick starting frame
+    index = 0
+    if args.time is not None:
+        index = find_frame_at_time(rows, args.time)
+    elif args.frame is not None:
+        index = max(0, min(args.frame, len(rows) - 1))
+
+    # Save frames without opening a window
+    if args.save is not None:
+        os.makedirs(args.save, exist_ok=True)
+        selected = lockChanges if args.lock_changes else [index]
+        for i in selected:
+            save_frame(args.video, rows[i], args.save)
+        return
+
+    # List lock changes
+    if args.lock_changes:
+        startTime = rows[0]['time']
+        for i in lockChanges:
+            print('  frame %5d  T+%7.2f s  lock %d' % (rows[i]['frame'], rows[i]['time'] - startTime, rows[i]['lock']))
+
+    # Replay interactively
+    replay(args.video, rows, index, lockChanges)
+
+
+# Run main program
+if __name__ == '__main__':
+    main()
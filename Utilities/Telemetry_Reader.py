@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/env python3
+
+###############################################################
+#                                                             #
+#                  FRC Telemetry Reader                       #
+#                                                             #
+#  This program converts a binary telemetry log written by    #
+#  FRCTelemetryLibrary into one CSV (or Parquet) file per     #
+#  record type: detections, gyro samples, stage timings and   #
+#  messages.  A short summary of each type is printed.        #
+#                                                             #
+#  Usage: Telemetry_Reader.py Run_Log.tlm [--parquet]         #
+#                                                             #
+#  @Author: Team4121                                          #
+#  @Created: 2021-03-22                                       #
+#  @Version: 1.0                                              #
+#                                                             #
+###############################################################
+
+"""FRC telemetry log reader"""
+
+# System imports
+import sys
+import os
+import csv
+import argparse
+
+# Setup paths
+sys.path.append('/home/pi/Team4121/Libraries')
+
+# Module imports
+import numpy as np
+
+# Team 4121 module imports
+import FRCTelemetryLibrary as tlm
+
+
+# Define table build method (column name -> numpy array)
+def build_table(records, recordType):
+
+    # Select records of this type (one row per message, however many records it took)
+    selected = records[records['type'] == recordType]
+    if recordType == tlm.RECORD_MESSAGE:
+        selected, messages = tlm.decode_messages(records)
+    table = {}
+    table['time'] = selected['time']
+    table['frame'] = selected['frame']
+    table['source'] = np.array([tlm.source_names.get(int(s), str(s)) for s in selected['source']])
+
+    # Add named values for the record type
+    if recordType == tlm.RECORD_MESSAGE:
+        table['message'] = np.array(messages, dtype=object)
+    elif recordType == tlm.RECORD_DETECTION:
+        table['target'] = np.array([tlm.target_names.get(int(c), str(c)) for c in selected['code']])
+        for i, name in enumerate(tlm.detection_fields):
+            table[name] = selected['values'][:, i]
+    elif recordType == tlm.RECORD_GYRO:
+        for i, name in enumerate(tlm.gyro_fields):
+            table[name] = selected['values'][:, i]
+    elif recordType == tlm.RECORD_TIMING:
+        table['stage'] = np.array([tlm.stage_names.get(int(c), str(c)) for c in selected['code']])
+        table['milliseconds'] = selected['values'][:, 0]
+
+    return table
+
+
+# Define CSV write method
+def write_csv(filename, table):
+
+    columns = list(table.keys())
+    with open(filename, 'w', newline='') as out_file:
+        writer = csv.writer(out_file)
+        writer.writerow(columns)
+        writer.writerows(zip(*[table[c].tolist() for c in columns]))
+
+
+# Define Parquet write method (needs pandas with pyarrow or fastparquet)
+def write_parquet(filename, table):
+
+    try:
+        import pandas as pd
+    except ImportError:
+        print('pandas is required for Parquet output')
+        return False
+
+    pd.DataFrame(table).to_parquet(filename)
+    return True
+
+
+# Define main method
+def main():
+
+    # Parse arguments
+    parser = argparse.ArgumentParser(description='Convert a binary telemetry log')
+    parser.add_argument('logfile', help='telemetry file (.tlm)')
+    parser.add_argument('--parquet', action='store_true', help='write Parquet instead of CSV')
+    parser.add_argument('--output', default=None, help='output file prefix')
+    args = parser.parse_args()
+
+    # Read the log
+    records = tlm.read_telemetry_file(args.logfile)
+    prefix = args.output if args.output is not None else os.path.splitext(args.logfile)[0]
+    print('Read %d records from %s' % (len(records), args.logfile))
+
+    # Write one file per record type
+    for recordType, name in tlm.record_names.items():
+
+        table = build_table(records, recordType)
+        if len(table['time']) == 0:
+            continue
+
+        if args.parquet:
+            filename = prefix + '_' + name + '.parquet'
+            if write_parquet(filename, table) is False:
+                return
+        else:
+            filename = prefix + '_' + name + '.csv'
+            write_csv(filename, table)
+        print('  %-10s %8d records -> %s' % (name, len(table['time']), filename))
+
+        # Summarize stage timings for each source
+        if recordType == tlm.RECORD_TIMING:
+            for source in np.unique(table['source']):
+                print('    %s' % source)
+                for stage in np.unique(table['stage'][table['source'] == source]):
+                    ms = table['milliseconds'][(table['source'] == source) & (table['stage'] == stage)]
+                    print('      %-8s mean %7.2f ms  p95 %7.2f ms  max %7.2f ms' % (stage, ms.mean(),
+                                                                                np.percentile(ms, 95), ms.max()))
+
+
+# Run main program
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,188 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/env python3
+
+####################################################################
+#                                                                  #
+#                    FRC Ball Layout Library                       #
+#                                                                  #
+#  This class works out which Galactic Search path is on the field #
+#  from the balls the field camera sees.  Each path's balls are    #
+#  placed in camera angle and distance once, from a grid of start  #
+#  poses around where the robot is set down.  Every frame the      #
+#  detected balls are scored against every path and pose at once   #
+#  with numpy nearest neighbor distances, each path keeping its    #
+#  best pose.  Angle is measured well and distance less so, so     #
+#  distances are compared as ratios.  Each frame with a clear      #
+#  winner is a vote, and a path is decided when it holds most of   #
+#  the recent votes, or has the most votes when the time budget    #
+#  runs out.                                                       #
+#                                                                  #
+#  @Version: 1.0                                                   #
+#  @Created: 2021-04-03                                            #
+#  @Author: Team 4121                                              #
+#                                                                  #
+####################################################################
+
+'''FRC Ball Layout Library - Classifies Galactic Search ball layouts'''
+
+# System imports
+import math
+from collections import deque
+
+# Module Imports
+import numpy as np
+
+# Galactic Search layouts (number, name, ball cells on the 30 inch field grid)
+galactic_search_layouts = [(1, 'blue1', ('E6', 'B7', 'C9')),
+                           (2, 'red1', ('C3', 'D5', 'A6')),
+                           (3, 'blue2', ('D6', 'B8', 'D10')),
+                           (4, 'red2', ('B3', 'D5', 'B7'))]
+
+# Field grid spacing (inches)
+grid_spacing = 30.0
+
+
+# Define field cell function (inches down the field and to the right of row C)
+def field_position(cell):
+
+    row = ord(cell[0].upper()) - ord('C')
+    column = int(cell[1:])
+    return (column * grid_spacing, row * grid_spacing)
+
+
+# Define the ball layout class
+class FRCBallLayout:
+
+    # Define initialization (values from the LAYOUT section, camera half field of view in degrees)
+    def __init__(self, values, fov, layouts=galactic_search_layouts):
+
+        # Store settings
+        self.fov = fov
+        self.angleTolerance = float(values.get('ANGLETOL', 3.0))
+        self.rangeTolerance = math.log(1 + float(values.get('RANGETOL', 0.2)))
+        self.maxScore = float(values.get('MAXSCORE', 1.0))
+        self.margin = float(values.get('MARGIN', 0.5))
+        self.frames = int(values.get('FRAMES', 10))
+        self.minVotes = int(values.get('VOTES', 6))
+        self.timeout = float(values.get('TIMEOUT', 1.0))
+        self.cap = 2.0
+
+        # Start poses the robot may be set down in (inches down the field, inches right, degrees right)
+        steps = int(values.get('POSESTEPS', 5))
+        xs = float(values.get('STARTX', 30.0)) + np.linspace(-1, 1, steps) * float(values.get('XRANGE', 6.0))
+        ys = float(values.get('STARTY', 0.0)) + np.linspace(-1, 1, steps) * float(values.get('YRANGE', 12.0))
+        headings = float(values.get('STARTHEADING', 0.0)) + \
+                   np.linspace(-1, 1, steps) * float(values.get('HEADINGRANGE', 3.0))
+        poses = np.array(np.meshgrid(xs, ys, headings, indexing='ij')).reshape(3, -1).T
+
+        # Build templates for every layout and pose
+        self.numbers = [number for number, name, cells in layouts]
+        self.names = [name for number, name, cells in layouts]
+        self.build_templates(layouts, poses)
+
+        # Initialize votes
+        self.reset()
+
+
+    # Define template method (ball angle and distance seen from each pose, layout by pose by ball)
+    def build_templates(self, layouts, poses):
+
+        positions = np.array([[field_position(cell) for cell in cells] for number, name, cells in layouts])
+        ahead = positions[:, None, :, 0] - poses[None, :, 0, None]
+        right = positions[:, None, :, 1] - poses[None, :, 1, None]
+        angles = np.degrees(np.arctan2(right, ahead)) - poses[None, :, 2, None]
+        distances = np.hypot(ahead, right)
+
+        # Balls out of view are not expected (layouts and poses flattened into one axis)
+        self.poseCount = len(poses)
+        self.visible = ((np.abs(angles) < self.fov) & (ahead > 0)).reshape(-1, positions.shape[1])
+        self.templates = self.features(angles, distances).reshape(-1, positions.shape[1], 2)
+
+
+    # Define feature method (angle and log distance in tolerance units)
+    def features(self, angles, distances):
+
+        return np.stack((np.asarray(angles) / self.angleTolerance,
+                         np.log(np.maximum(distances, 1.0)) / self.rangeTolerance), axis=-1)
+
+
+    # Define reset method (start a new decision)
+    def reset(self):
+
+        self.votes = deque(maxlen=self.frames)
+        self.startTime = None
+        self.stable = False
+        self.confident = False
+        self.decisionTime = None
+        self.number = -1
+        self.name = 'none'
+        self.scores = None
+
+
+    # Define scoring method (lower is better, one score per layout at its best pose)
+    def score(self, angles, distances):
+
+        detections = self.features(angles, distances)
+
+        # Capped distances from every template ball to every detection (layout, ball, detection)
+        gaps = np.minimum(np.linalg.norm(self.templates[:, :, None, :] - detections[None, None, :, :], axis=3),
+                          self.cap)
+
+        # Expected balls that were not seen, and detections no expected ball explains
+        missed = (gaps.min(axis=2) * self.visible).sum(axis=1) / np.maximum(self.visible.sum(axis=1), 1)
+        extra = np.where(self.visible[:, :, None], gaps, self.cap).min(axis=1).mean(axis=1)
+
+        return ((missed + extra) / 2).reshape(-1, self.poseCount).min(axis=1)
+
+
+    # Define vote method (layout index with a clear best score, or None)
+    def vote(self, scores):
+
+        order = np.argsort(scores)
+        if scores[order[0]] > self.maxScore:
+            return None
+        if len(scores) > 1 and scores[order[1]] - scores[order[0]] < self.margin:
+            return None
+        return int(order[0])
+
+
+    # Define update method (balls from detect_game_balls, returns True once decided)
+    def update(self, ballData, frameTime):
+
+        if self.stable == True or len(ballData) == 0:
+            return self.stable
+        if self.startTime is None:
+            self.startTime = frameTime
+
+        # Score this frame against every layout and keep its vote
+        self.scores = self.score([b['angle'] for b in ballData], [b['distance'] for b in ballData])
+        vote = self.vote(self.scores)
+        if vote is not None:
+            self.votes.append(vote)
+
+        # Decide when one layout holds most recent votes, or take the most votes when time is up
+        if len(self.votes) > 0:
+            counts = np.bincount(np.array(self.votes), minlength=len(self.numbers))
+            best = int(np.argmax(counts))
+            if counts[best] >= self.minVotes:
+                self.decide(best, True, frameTime)
+            elif frameTime - self.startTime >= self.timeout:
+                self.decide(best, False, frameTime)
+
+        return self.stable
+
+
+    # Define decision method
+    def decide(self, index, confident, frameTime):
+
+        self.stable = True
+        self.confident = confident
+        self.decisionTime = frameTime - self.startTime
+        self.number = self.numbers[index]
+        self.name = self.names[index]
+
+
+    # Define layout method (number and name, -1 and none until decided)
+    def layout(self):
+
+        return self.number, self.name
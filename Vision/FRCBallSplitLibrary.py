@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/env python3
+
+####################################################################
+#                                                                  #
+#                     FRC Ball Split Library                       #
+#                                                                  #
+#  These functions split a blob made of touching balls back into   #
+#  single balls.  A lone ball nearly fills its enclosing circle,   #
+#  while two touching balls fill about half of theirs, so only     #
+#  blobs with a low fill are split.  Splitting looks at the blob's #
+#  bounding box only.  Either the peaks of the distance transform  #
+#  are taken as ball centers (the peak value is the radius), or    #
+#  Hough circles are searched for in the blob mask.                #
+#                                                                  #
+#  @Version: 1.0                                                   #
+#  @Created: 2021-04-02                                            #
+#  @Author: Team 4121                                              #
+#                                                                  #
+####################################################################
+
+'''FRC Ball Split Library - Splits merged ball blobs'''
+
+# System imports
+import math
+
+# Module Imports
+import cv2 as cv
+import numpy as np
+
+# Split modes and default split settings (mode, smallest circle fill of a single ball)
+split_modes = ('none', 'distance', 'hough')
+default_split = ('none', 0.65)
+
+# Closest two split balls may be, as a share of their radii (touching balls are at 1)
+min_separation = 0.6
+
+# Hough accumulator votes a circle needs
+hough_votes = 6
+
+
+# Define split settings function (reads the ball section of the vision file)
+def split_settings(values):
+
+    mode = str(values.get('SPLIT', default_split[0])).lower()
+    if mode not in split_modes:
+        raise ValueError('Unknown split mode: ' + mode)
+
+    return (mode, float(values.get('MINCIRCLEFILL', default_split[1])))
+
+
+# Define circle fill function (blob area over enclosing circle area)
+def circle_fill(contour, radius):
+
+    if radius <= 0:
+        return 1.0
+    return cv.contourArea(contour) / (math.pi * radius * radius)
+
+
+# Define blob mask function (filled contour in its bounding box, with a one pixel border)
+def blob_mask(contour):
+
+    x, y, w, h = cv.boundingRect(contour)
+    mask = np.zeros((h + 2, w + 2), dtype=np.uint8)
+    cv.drawContours(mask, [contour], 0, 255, -1, offset=(1 - x, 1 - y))
+
+    return mask, x - 1, y - 1
+
+
+# Define distance transform split function (returns (x, y, radius) circles)
+def split_distance(contour, minRadius):
+
+    mask, left, top = blob_mask(contour)
+    distance = cv.distanceTransform(mask, cv.DIST_L2, 5)
+
+    # Peaks are pixels no smaller than their neighbors and at least the smallest ball radius
+    peaks = (distance >= cv.dilate(distance, np.ones((3, 3), np.uint8))) & (distance > minRadius)
+    rows, cols = np.nonzero(peaks)
+    order = np.argsort(-distance[rows, cols])
+
+    # Largest peaks first, skipping peaks inside a ball already found (the neck between balls)
+    circles = separate_circles([(float(cols[i]), float(rows[i]), float(distance[rows[i], cols[i]])) for i in order])
+
+    return [(x + left, y + top, radius) for x, y, radius in circles]
+
+
+# Define circle separation function (keeps circles far enough from larger ones found first)
+def separate_circles(candidates):
+
+    circles = []
+    for x, y, radius in candidates:
+        if all(math.hypot(x - cx, y - cy) >= min_separation * (radius + cr) for cx, cy, cr in circles):
+            circles.append((x, y, radius))
+
+    return circles
+
+
+# Define Hough split function (returns (x, y, radius) circles)
+def split_hough(contour, minRadius):
+
+    # Low vote threshold so small balls are found (extra circles are dropped below)
+    mask, left, top = blob_mask(contour)
+    found = cv.HoughCircles(cv.GaussianBlur(mask, (3, 3), 0), cv.HOUGH_GRADIENT, 1, max(minRadius, 1) * 2,
+                            param1=100, param2=hough_votes, minRadius=int(minRadius), maxRadius=max(mask.shape) // 2)
+    if found is None:
+        return []
+
+    # Keep circles centered on the blob, most votes first
+    candidates = []
+    for x, y, radius in found.reshape(-1, 3):
+        if mask[min(int(y), mask.shape[0] - 1), min(int(x), mask.shape[1] - 1)] > 0:
+            candidates.append((float(x), float(y), float(radius)))
+    circles = separate_circles(candidates)
+
+    return [(x + left, y + top, radius) for x, y, radius in circles]
+
+
+# Define ball circle function (enclosing circle, or split circles when the blob is merged)
+def ball_circles(contour, minRadius, split=default_split):
+
+    ((x, y), radius) = cv.minEnclosingCircle(contour)
+    mode, minFill = split
+    if mode == 'none' or radius <= minRadius or circle_fill(contour, radius) >= minFill:
+        return [(x, y, radius)]
+
+    if mode == 'hough':
+        circles = split_hough(contour, minRadius)
+    else:
+        circles = split_distance(contour, minRadius)
+
+    # A split that finds less than two balls keeps the enclosing circle
+    if len(circles) < 2:
+        return [(x, y, radius)]
+    return circles
@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/env python3
+
+####################################################################
+#                                                                  #
+#                   FRC Band Segment Library                       #
+#                                                                  #
+#  This class spreads the threshold chain used for target          #
+#  detection (blur, HSV convert, inRange, erode and dilate) over   #
+#  all CPU cores.  The frame is split into horizontal bands and    #
+#  each band is read with a halo of extra rows above and below,    #
+#  wide enough for the blur and morphology kernels, so every band  #
+#  produces exactly the rows a whole frame pass would.  OpenCV     #
+#  releases the GIL, so the bands run in parallel on a thread      #
+#  pool.  Bands are written into one mask, and contours are found  #
+#  on that mask so blobs crossing a band seam stay one component.  #
+#  Frames shorter than minFrameRows, and every frame on a single   #
+#  core, are processed whole on the calling thread, where thread   #
+#  handoff would cost more than it saves.  The thread pool is only #
+#  started the first time a frame is split.                        #
+#                                                                  #
+#  @Version: 1.0                                                   #
+#  @Created: 2021-03-29                                            #
+#  @Author: Team 4121                                              #
+#                                                                  #
+####################################################################
+
+'''FRC Band Segment Library - Provides multi-core threshold masks'''
+
+# System imports
+import os
+from multiprocessing.pool import ThreadPool
+
+# Module Imports
+import cv2 as cv
+import numpy as np
+
+# Team 4121 module imports
+from FRCFilterLibrary import blur_image, blur_reach, open_mask
+
+
+# Define the band segmenter class
+class FRCBandSegmenter:
+
+    # Define initialization
+    def __init__(self, bands=None, blurSize=13, iterations=2, minBandRows=32, minFrameRows=480):
+
+        # Store settings (default filters when a target does not give its own)
+        self.bands = int(bands) if bands is not None else max(os.cpu_count() or 1, 1)
+        self.filters = (int(blurSize), 'gaussian', 2 * int(iterations) + 1)
+        self.minBandRows = int(minBandRows)
+        self.minFrameRows = int(minFrameRows)
+
+        # Worker threads are started when the first frame is split
+        self.pool = None
+
+
+    # Define band layout method (returns output row ranges, small frames stay whole)
+    def band_rows(self, height):
+
+        if height < self.minFrameRows:
+            return [(0, height)]
+        count = max(min(self.bands, height // self.minBandRows), 1)
+        edges = [height * n // count for n in range(count + 1)]
+        return list(zip(edges[0:-1], edges[1:]))
+
+
+    # Define band processing method (returns the mask rows of one band)
+    def process_band(self, job):
+
+        imgRaw, y0, y1, hsvMin, hsvMax, erodeDilate, filters = job
+        blurSize, blurType, openSize = filters
+
+        # Read the band plus its halo, which covers the blur reach and the opening reach
+        halo = blur_reach(blurSize, blurType) + openSize - 1
+        iy0 = max(y0 - halo, 0)
+        iy1 = min(y1 + halo, imgRaw.shape[0])
+        blur = blur_image(imgRaw[iy0:iy1], blurSize, blurType)
+        hsv = cv.cvtColor(blur, cv.COLOR_BGR2HSV)
+        mask = cv.inRange(hsv, hsvMin, hsvMax)
+
+        if erodeDilate:
+            mask = open_mask(mask, openSize)
+
+        # Keep only the rows this band owns
+        return mask[y0 - iy0:y1 - iy0]
+
+
+    # Define segmentation method (returns the full frame mask)
+    def segment(self, imgRaw, hsvMin, hsvMax, erodeDilate, filters=None):
+
+        if filters is None:
+            filters = self.filters
+        jobs = [(imgRaw, y0, y1, hsvMin, hsvMax, erodeDilate, filters) for y0, y1 in self.band_rows(imgRaw.shape[0])]
+
+        # A frame that is not split is processed here with no copy
+        if len(jobs) == 1:
+            return self.process_band(jobs[0])
+
+        # Split frames run on the pool and are joined into one mask
+        if self.pool is None:
+            self.pool = ThreadPool(self.bands)
+        out = np.empty(imgRaw.shape[0:2], dtype=np.uint8)
+        for job, band in zip(jobs, self.pool.map(self.process_band, jobs)):
+            out[job[1]:job[2]] = band
+
+        return out
+
+
+    # Define shutdown method
+    def close(self):
+
+        if self.pool is not None:
+            self.pool.close()
+            self.pool.join()
+            self.pool = None
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/env python3
+
+####################################################################
+#                                                                  #
+#                    FRC Calibration Library                       #
+#                                                                  #
+#  This class provides a binary calibration store for web cameras. #
+#  The camera matrix and distortion coefficients are kept in one   #
+#  .npz file per camera together with the optimal new camera       #
+#  matrix, ROI and remap tables for every resolution the camera    #
+#  has been set up for.  Startup loads binary arrays instead of    #
+#  parsing text, and frames are undistorted with cv.remap using    #
+#  the cached tables instead of rebuilding them for every frame.   #
+#  The store is rebuilt automatically when the text calibration    #
+#  files written by the calibration utilities are newer.  It is    #
+#  only written at startup, never from the capture loop.           #
+#                                                                  #
+#  @Version: 1.0                                                   #
+#  @Created: 2021-03-25                                            #
+#  @Author: Team 4121                                              #
+#                                                                  #
+####################################################################
+
+'''FRC Calibration Library - Provides cached camera calibration'''
+
+# System imports
+import os
+
+# Module Imports
+import cv2 as cv
+import numpy as np
+
+# Set global variables
+calibration_dir = '/home/pi/Team4121/Config'
+
+
+# Define the camera calibration class
+class FRCCalibration:
+
+    # Define initialization
+    def __init__(self, camId, directory=calibration_dir, resolutions=()):
+
+        # Store file names
+        self.matrixFilename = directory + '/Camera_Matrix_Cam' + str(camId) + '.txt'
+        self.coeffsFilename = directory + '/Distortion_Coeffs_Cam' + str(camId) + '.txt'
+        self.storeFilename = directory + '/Calibration_Cam' + str(camId) + '.npz'
+
+        # Initialize calibration values
+        self.cam_matrix = None
+        self.distort_coeffs = None
+        self.arrays = {}
+        self.resolutions = {}
+
+        # Load the binary store, rebuilding it from text files if stale
+        changed = False
+        if self.store_is_current():
+            with np.load(self.storeFilename) as store:
+                self.arrays = {key: store[key] for key in store.files}
+            self.cam_matrix = self.arrays['cam_matrix']
+            self.distort_coeffs = self.arrays['distort_coeffs']
+        elif os.path.isfile(self.matrixFilename) and os.path.isfile(self.coeffsFilename):
+            self.cam_matrix = np.loadtxt(self.matrixFilename)
+            self.distort_coeffs = np.loadtxt(self.coeffsFilename)
+            self.arrays = {'cam_matrix': self.cam_matrix, 'distort_coeffs': self.distort_coeffs}
+            changed = True
+
+        # Build tables for the resolutions the camera will run at and write the store once
+        if self.is_loaded():
+            for width, height in resolutions:
+                changed = self.build_tables(width, height) or changed
+            if changed:
+                self.save_store()
+
+
+    # Define store check method
+    def store_is_current(self):
+
+        if os.path.isfile(self.storeFilename) == False:
+            return False
+        storeTime = os.path.getmtime(self.storeFilename)
+        for filename in (self.matrixFilename, self.coeffsFilename):
+            if os.path.isfile(filename) and os.path.getmtime(filename) > storeTime:
+                return False
+        return True
+
+
+    # Define store save method (written to a temporary file, then swapped in)
+    def save_store(self):
+
+        tempFilename = self.storeFilename + '.tmp.npz'
+        try:
+            np.savez(tempFilename, **self.arrays)
+            os.replace(tempFilename, self.storeFilename)
+        except OSError:
+            pass
+
+
+    # Define loaded check method
+    def is_loaded(self):
+
+        return self.cam_matrix is not None
+
+
+    # Define table build method (returns False if the store already has the resolution)
+    def build_tables(self, width, height):
+
+        key = '%dx%d' % (width, height)
+        if key + '_map1' in self.arrays:
+            return False
+
+        new_matrix, roi = cv.getOptimalNewCameraMatrix(self.cam_matrix, self.distort_coeffs,
+                                                       (width, height), 1, (width, height))
+        map1, map2 = cv.initUndistortRectifyMap(self.cam_matrix, self.distort_coeffs, None,
+                                                new_matrix, (width, height), cv.CV_16SC2)
+        self.arrays[key + '_new_matrix'] = new_matrix
+        self.arrays[key + '_roi'] = np.array(roi, dtype=np.int32)
+        self.arrays[key + '_map1'] = map1
+        self.arrays[key + '_map2'] = map2
+        return True
+
+
+    # Define resolution lookup method (new matrix, roi and remap tables)
+    def get_resolution(self, width, height):
+
+        # Use tables already in memory
+        key = '%dx%d' % (width, height)
+        if key in self.resolutions:
+            return self.resolutions[key]
+
+        # Use tables from the store, or build them in memory for a resolution not set up at
+        # startup (not saved, so the capture loop never writes to disk)
+        self.build_tables(width, height)
+
+        x, y, w, h = (int(v) for v in self.arrays[key + '_roi'])
+        self.resolutions[key] = (self.arrays[key + '_new_matrix'], (x, y, w, h),
+                                 self.arrays[key + '_map1'], self.arrays[key + '_map2'])
+        return self.resolutions[key]
+
+
+    # Define undistort method (remap with cached tables, then crop to the ROI)
+    def undistort(self, frame):
+
+        h, w = frame.shape[:2]
+        new_matrix, roi, map1, map2 = self.get_resolution(w, h)
+        newFrame = cv.remap(frame, map1, map2, cv.INTER_LINEAR)
+        x, y, w, h = roi
+        return newFrame[y:y+h, x:x+w]
@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/env python3
+
+####################################################################
+#                                                                  #
+#                  FRC Camera Control Library                      #
+#                                                                  #
+#  This class applies camera settings (frame size, frame rate,     #
+#  exposure, brightness) and checks that the camera took them.     #
+#  Each value is set, read back and compared with the request, so  #
+#  a camera that falls back to auto exposure or rounds a value is  #
+#  reported instead of silently ruining tape segmentation.  Values #
+#  the camera confirmed are cached, and a setting that matches the #
+#  cache is not sent again.  Named profiles (a low exposure        #
+#  tracking profile and an auto exposure driver profile) let one   #
+#  camera serve both roles, and switching only sends the controls  #
+#  that differ.  Frame size and rate changes make the camera       #
+#  renegotiate the stream, so profiles should only change the      #
+#  controls.                                                       #
+#                                                                  #
+#  @Version: 1.0                                                   #
+#  @Created: 2021-03-30                                            #
+#  @Author: Team 4121                                              #
+#                                                                  #
+####################################################################
+
+'''FRC Camera Control Library - Provides verified camera settings'''
+
+# System imports
+import time
+
+# Module Imports
+import cv2 as cv
+
+# Camera properties by settings name, stream properties first (order they are applied)
+camera_properties = [('Width', cv.CAP_PROP_FRAME_WIDTH),
+                     ('Height', cv.CAP_PROP_FRAME_HEIGHT),
+                     ('FPS', cv.CAP_PROP_FPS),
+                     ('AutoExposure', cv.CAP_PROP_AUTO_EXPOSURE),
+                     ('Exposure', cv.CAP_PROP_EXPOSURE),
+                     ('Brightness', cv.CAP_PROP_BRIGHTNESS),
+                     ('Gain', cv.CAP_PROP_GAIN)]
+stream_properties = ('Width', 'Height', 'FPS')
+
+# V4L2 auto exposure modes (manual exposure, aperture priority)
+AUTO_EXPOSURE_MANUAL = 1
+AUTO_EXPOSURE_AUTO = 3
+
+
+# Define the camera control class
+class FRCCameraControl:
+
+    # Define initialization
+    def __init__(self, stream, log=None, tolerance=1.0, retries=1):
+
+        # Store camera stream and settings
+        self.stream = stream
+        self.log = log
+        self.tolerance = tolerance
+        self.retries = retries
+
+        # Initialize confirmed values, profiles and counters
+        self.confirmed = {}
+        self.profiles = {}
+        self.profile = None
+        self.sent = 0
+        self.switch_time = 0.0
+
+
+    # Define log message method
+    def log_message(self, message):
+
+        if self.log is not None:
+            self.log(message)
+
+
+    # Define value check method
+    def matches(self, name, wanted, actual):
+
+        if name in stream_properties:
+            return abs(actual - wanted) < 0.5
+        return abs(actual - wanted) <= self.tolerance
+
+
+    # Define settings apply method (returns failed settings as name: (wanted, actual))
+    def apply(self, settings):
+
+        failed = {}
+        for name, prop in camera_properties:
+
+            # Skip settings not given or already confirmed
+            if name not in settings:
+                continue
+            wanted = float(settings[name])
+            if name in self.confirmed and self.matches(name, wanted, self.confirmed[name]):
+                continue
+            if name in stream_properties:
+                self.log_message('Renegotiating stream for ' + name)
+
+            # Set the value and read back what the camera really uses
+            for attempt in range(self.retries + 1):
+                self.stream.set(prop, wanted)
+                self.sent += 1
+                actual = self.stream.get(prop)
+                if self.matches(name, wanted, actual):
+                    break
+
+            # Cache only what the camera confirmed
+            if self.matches(name, wanted, actual):
+                self.confirmed[name] = actual
+            else:
+                self.confirmed.pop(name, None)
+                failed[name] = (wanted, actual)
+                self.log_message('Camera did not take %s: wanted %s, read back %s' % (name, wanted, actual))
+
+        return failed
+
+
+    # Define verify method (reads every confirmed value back, returns drifted settings)
+    def verify(self):
+
+        drifted = {}
+        for name, prop in camera_properties:
+            if name in self.confirmed:
+                actual = self.stream.get(prop)
+                if not self.matches(name, self.confirmed[name], actual):
+                    drifted[name] = self.confirmed.pop(name)
+                    self.log_message('Camera %s drifted from %s to %s' % (name, drifted[name], actual))
+
+        return drifted
+
+
+    # Define profile definition method
+    def add_profile(self, name, settings):
+
+        self.profiles[name] = dict(settings)
+
+
+    # Define profile switch method (sends only the settings that differ)
+    def use_profile(self, name):
+
+        # Values the new profile leaves alone may change under it (auto exposure)
+        start = time.perf_counter()
+        settings = self.profiles[name]
+        for setting in list(self.confirmed):
+            if setting not in settings:
+                del self.confirmed[setting]
+        failed = self.apply(settings)
+        self.profile = name
+        self.switch_time = time.perf_counter() - start
+
+        return failed
+
+
+    # Define check method (verifies, then resends whatever the profile is missing)
+    def check(self):
+
+        self.verify()
+        if self.profile is not None:
+            return self.apply(self.profiles[self.profile])
+
+        return {}
+
+
+    # Define reset method (forget confirmed values, e.g. after the stream reopens)
+    def reset(self):
+
+        self.confirmed = {}
@@ -21,6 +21,7 @@
 # System imports
 import sys
 import os
+import time
 import logging
 
 # Module Imports
@@ -28,24 +29,32 @@ import cv2 as cv
 import numpy as np
 from threading import Thread
 
+# Team 4121 module imports
+from FRCTelemetryLibrary import SOURCE_CAMERA, log_message
+from FRCRecordingLibrary import FRCRecordingIndex
+from FRCCalibrationLibrary import FRCCalibration
+from FRCMjpegCaptureLibrary import FRCMjpegCapture
+from FRCCameraControlLibrary import FRCCameraControl, AUTO_EXPOSURE_MANUAL, AUTO_EXPOSURE_AUTO
+
 #Set up basic logging
 logging.basicConfig(level=logging.DEBUG)
 
-# Set global variables
-calibration_dir = '/home/pi/Team4121/Config'
+# Interleaved driver frames use a fixed exposure, since auto exposure starts from the dark
+# tracking exposure on every switch and takes many frames to settle
+driver_exposure = 156
+auto_settle_frames = 10
 
 
 # Define the web camera class
 class FRCWebCam:
 
     # Define initialization
-    def __init__(self, src, name, settings, logfilenumber, videofile):
+    def __init__(self, src, name, settings, videofile, telemetry=None):
 
-        #Open a log file
-        logFilename = '/home/pi/Team4121/Logs/Webcam_Log_' + logfilenumber + '.txt'
-        self.log_file = open(logFilename, 'w')
-        self.log_file.write('Initializing webcam: ' + str(logfilenumber))
-        self.log_file.write('')
+        # Name the stream and set up telemetry logging
+        self.name = name
+        self.telemetry = telemetry
+        self.log_message('Initializing webcam')
 
         # Initialize instance variables
         self.undistort_img = False
@@ -54,59 +63,136 @@ class FRCWebCam:
         self.height = int(settings['Height'])
         self.width = int(settings['Width'])
 
-        # Set up web camera
+        # Set up interleaving (bright driver frames slipped between dark tracking frames)
+        self.interleave = str(settings.get('Interleave', 0)) in ('1', 'True', 'true')
+        self.driver_fps = float(settings.get('DriverFPS', 5))
+        self.settle_frames = int(settings.get('SettleFrames', 1))
+
+        # Interleaved driver frames only get a few frames to settle, too few for auto exposure
+        driverExposure = str(settings.get('DriverExposure', 'default'))
+        if driverExposure == 'default':
+            driverExposure = str(driver_exposure) if self.interleave == True else 'auto'
+        if driverExposure == 'auto' and self.interleave == True and self.settle_frames < auto_settle_frames:
+            raise ValueError('Auto driver exposure needs SettleFrames of at least %d when interleaving' %
+                             auto_settle_frames)
+
+        # Set up web camera (compressed MJPEG capture decodes only what is needed)
         self.device_id = src
-        self.camStream = cv.VideoCapture(self.device_id)
-        self.camStream.set(cv.CAP_PROP_FRAME_WIDTH, self.width)
-        self.camStream.set(cv.CAP_PROP_FRAME_HEIGHT, self.height)
-        self.camStream.set(cv.CAP_PROP_BRIGHTNESS, float(settings['Brightness']))
-        self.camStream.set(cv.CAP_PROP_EXPOSURE, int(settings['Exposure']))
-        self.camStream.set(cv.CAP_PROP_FPS, int(settings['FPS']))
+        self.capture = settings.get('Capture', 'default')
+        if self.capture == 'mjpeg':
+
+            # Detection and recording need color frames, so grayscale decodes are refused
+            decode = settings.get('Decode', 'color')
+            if str(decode).startswith('gray'):
+                raise ValueError('Decode mode ' + str(decode) + ' gives one channel frames, FRCWebCam needs color')
+            self.camStream = FRCMjpegCapture(self.device_id, decode)
+            self.decode_scale = self.camStream.scale
+        else:
+            self.camStream = cv.VideoCapture(self.device_id)
+            self.decode_scale = 1
+
+        # Size of the frames handed to the pipeline (smaller with reduced decode)
+        self.frame_width = self.width // self.decode_scale
+        self.frame_height = self.height // self.decode_scale
+
+        # Set up camera profiles (tracking uses fixed low exposure, driver uses auto exposure
+        # unless interleaved, where it uses a fixed bright exposure)
+        self.control = FRCCameraControl(self.camStream, self.log_message)
+        streamSettings = {'Width': self.width, 'Height': self.height, 'FPS': int(settings['FPS'])}
+        trackingSettings = dict(streamSettings)
+        trackingSettings['AutoExposure'] = AUTO_EXPOSURE_MANUAL
+        trackingSettings['Exposure'] = int(settings['Exposure'])
+        trackingSettings['Brightness'] = float(settings['Brightness'])
+        driverSettings = dict(streamSettings)
+        driverSettings['Brightness'] = float(settings.get('DriverBrightness', settings['Brightness']))
+        if driverExposure == 'auto':
+            driverSettings['AutoExposure'] = AUTO_EXPOSURE_AUTO
+        else:
+            driverSettings['AutoExposure'] = AUTO_EXPOSURE_MANUAL
+            driverSettings['Exposure'] = int(driverExposure)
+        self.control.add_profile('tracking', trackingSettings)
+        self.control.add_profile('driver', driverSettings)
+        self.set_profile(settings.get('Profile', 'tracking'))
+
+        # Set up interleaving state
+        self.next_driver_time = 0.0
+        self.driver_frame = None
+        self.driver_frame_time = 0.0
+        self.frame_counts = {'tracking': 0, 'driver': 0, 'settle': 0, 'idle': 0, 'rejected': 0}
+        if self.interleave == True:
+            self.camStream.set(cv.CAP_PROP_BUFFERSIZE, 1)
 
         # Set up video writer
-        self.videoFilename = '/home/pi/Team4121/Videos/' + videofile + '.avi'
+        self.videoFilename = os.path.join(settings.get('VideoDirectory', '/home/pi/Team4121/Videos'), videofile + '.avi')
         self.fourcc = cv.VideoWriter_fourcc('M','J','P','G')
         self.camWriter = cv.VideoWriter()
 
         try:
             self.camWriter.open(self.videoFilename, self.fourcc, 
-                                float(settings['FPS']), 
-                                (self.width, self.height),
+                                self.driver_fps if self.interleave == True else float(settings['FPS']),
+                                (self.frame_width, self.frame_height),
                                 True)
         except:
-            self.log_file.write('Error opening video writer for file: ' + self.videoFilename)
+            self.log_message('Error opening video writer: ' + videofile)
         
         if (self.camWriter.isOpened()):
-            self.log_file.write("Video writer is open")
+            self.log_message("Video writer is open")
         else:
-            self.log_file.write("Video writer is NOT open")
+            self.log_message("Video writer is NOT open")
+
+        # Set up sidecar frame index for the video
+        self.recordIndex = None
+        if (self.camWriter.isOpened()):
+            self.recordIndex = FRCRecordingIndex(self.videoFilename)
 
         # Make sure video capture is opened
         if self.camStream.isOpened() == False:
             self.camStream.open(self.device_id)
+            self.control.reset()
+            self.set_profile(self.control.profile)
 
         # Initialize blank frames
         #self.frame = np.zeros(shape=(self.width, self.height, 3), dtype=np.uint8)
 
         # Grab an initial frame
         self.grabbed, self.frame = self.camStream.read()
-
-        # Name the stream
-        self.name = name
+        self.frame_time = time.monotonic()
 
         # Initialize stop flag
         self.stopped = False
 
-        # Read camera calibration files
-        cam_matrix_file = calibration_dir + '/Camera_Matrix_Cam' + str(self.device_id) + '.txt'
-        cam_coeffs_file = calibration_dir + '/Distortion_Coeffs_Cam' + str(self.device_id) + '.txt'
-        if os.path.isfile(cam_matrix_file) == True and os.path.isfile(cam_coeffs_file) == True:
-            self.cam_matrix = np.loadtxt(cam_matrix_file)
-            self.distort_coeffs = np.loadtxt(cam_coeffs_file)
+        # Load camera calibration (remap tables for the frame size are built and stored here)
+        self.calibration = FRCCalibration(self.device_id, resolutions=[(self.frame_width, self.frame_height)])
+        if self.calibration.is_loaded() == True and self.decode_scale == 1:
+            self.cam_matrix = self.calibration.cam_matrix
+            self.distort_coeffs = self.calibration.distort_coeffs
             self.undistort_img = True
         
         # Log init complete message
-        self.log_file.write("Webcam initialization complete")
+        self.log_message("Webcam initialization complete")
+
+
+    # Define log message method
+    def log_message(self, message):
+
+        log_message(self.telemetry, SOURCE_CAMERA, self.name + ': ' + str(message))
+
+
+    # Define camera profile method (returns True if the camera confirmed every setting)
+    def set_profile(self, profile):
+
+        failed = self.control.use_profile(profile)
+        self.log_message('Camera profile %s applied in %.1f ms' % (profile, 1000 * self.control.switch_time))
+
+        return len(failed) == 0
+
+
+    # Define camera control check method (reapplies settings the camera dropped)
+    def check_controls(self):
+
+        failed = self.control.check()
+
+        return len(failed) == 0
 
 
     # Define camera thread start method
@@ -137,8 +223,11 @@ class FRCWebCam:
             if self.stopped:
                 return
 
-            # If not stopping, grab new frame
-            self.grabbed, self.frame = self.camStream.read()
+            # If not stopping, grab new frame and timestamp it
+            self.camStream.grab()
+            frameTime = time.monotonic()
+            self.grabbed, self.frame = self.camStream.retrieve()
+            self.frame_time = frameTime
 
 
     # Define frame read method
@@ -149,20 +238,14 @@ class FRCWebCam:
 
         try:
 
-            # Grab new frame
-            self.grabbed, self.frame = self.camStream.read()
+            # Grab new frame and timestamp it (monotonic clock, same as Navx samples)
+            self.grabbed = self.camStream.grab()
+            self.frame_time = time.monotonic()
+            self.grabbed, self.frame = self.camStream.retrieve()
 
             # Undistort image
             if self.undistort_img == True:
-                h, w = self.frame.shape[:2]
-                new_matrix, roi = cv.getOptimalNewCameraMatrix(self.cam_matrix,
-                                                                self.distort_coeffs,
-                                                                (w,h),1,(w,h))
-                newFrame = cv.undistort(self.frame, self.cam_matrix,
-                                        self.distort_coeffs, None,
-                                        new_matrix)
-                x,y,w,h = roi
-                newFrame = newFrame[y:y+h,x:x+w]
+                newFrame = self.calibration.undistort(self.frame)
 
             else:
 
@@ -171,15 +254,54 @@ class FRCWebCam:
         except Exception as read_error:
 
             # Write error to log
-            self.log_file.write('Error reading video:')
-            self.log_file.write(type(read_error))
-            self.log_file.write(read_error.args)
-            self.log_file.write(read_error)
+            self.log_message('Error reading video: ' + repr(read_error))
 
         # Return the most recent frame
         return newFrame
 
 
+    # Define interleaved frame read method (returns the tracking frame, sets driver_frame when one is due)
+    def read_frame_interleaved(self):
+
+        # Read the dark frame for detection
+        newFrame = self.read_frame()
+        frameTime = self.frame_time
+        self.frame_counts['tracking'] += 1
+        self.driver_frame = None
+
+        # Slip in a bright frame when the driver budget allows
+        if self.frame_time >= self.next_driver_time:
+            self.next_driver_time = max(self.next_driver_time, self.frame_time - 1.0 / self.driver_fps) + 1.0 / self.driver_fps
+            self.control.use_profile('driver')
+            self.skip_frames(self.settle_frames)
+            self.driver_frame = self.read_frame()
+            self.driver_frame_time = self.frame_time
+            self.frame_counts['driver'] += 1
+
+            # Frames taken while the exposure goes back down are not used
+            self.control.use_profile('tracking')
+            self.skip_frames(self.settle_frames)
+            self.frame_time = frameTime
+
+        return newFrame
+
+
+    # Define frame skip method (drops frames still exposed with the previous profile)
+    def skip_frames(self, count):
+
+        for n in range(count):
+            self.camStream.grab()
+            self.frame_counts['settle'] += 1
+
+
+    # Define idle frame method (keeps the camera streaming, undecoded, while the pipeline is stopped)
+    def idle_frame(self):
+
+        self.grabbed = self.camStream.grab()
+        self.frame_counts['idle'] += 1
+        return self.grabbed
+
+
     # Define threaded frame read method
     def read_frame_threaded(self):
 
@@ -190,15 +312,7 @@ class FRCWebCam:
 
             # Undistort image
             if self.undistort_img == True:
-                h, w = self.frame.shape[:2]
-                new_matrix, roi = cv.getOptimalNewCameraMatrix(self.cam_matrix,
-                                                                self.distort_coeffs,
-                                                                (w,h),1,(w,h))
-                newFrame = cv.undistort(self.frame, self.cam_matrix,
-                                        self.distort_coeffs, None,
-                                        new_matrix)
-                x,y,w,h = roi
-                newFrame = newFrame[y:y+h,x:x+w]
+                newFrame = self.calibration.undistort(self.frame)
 
             else:
 
@@ -207,39 +321,49 @@ class FRCWebCam:
         except Exception as read_error:
 
             # Write error to log
-            self.log_file.write('Error reading video (threaded):')
-            self.log_file.write(type(read_error))
-            self.log_file.write(read_error.args)
-            self.log_file.write(read_error)
+            self.log_message('Error reading video (threaded): ' + repr(read_error))
 
         # Return the most recent frame
         return newFrame
 
 
     # Define video writing method
-    def write_video(self, img):
+    def write_video(self, img, frameData=None):
 
         # Check if write is opened
         if (self.camWriter.isOpened()):
 
+            # The writer silently drops frames of another size or channel count, so they are
+            # not written or indexed (logged once, counted after that)
+            if img is None or img.shape[0:2] != (self.frame_height, self.frame_width) or \
+               img.ndim != 3 or img.shape[2] != 3:
+                self.frame_counts['rejected'] += 1
+                if self.frame_counts['rejected'] == 1:
+                    self.log_message('Frame not recorded, size %s does not match the video writer %dx%dx3' %
+                                     ('none' if img is None else 'x'.join(str(n) for n in img.shape),
+                                      self.frame_width, self.frame_height))
+                return False
+
             # Write the image
             try:
 
                 self.camWriter.write(img)
+
+                # Index the frame with its capture time and detection values
+                if frameData is None:
+                    frameData = {'time': self.frame_time}
+                self.recordIndex.add_frame(frameData)
                 return True
 
             except Exception as write_error:
 
                 # Print exception info
-                self.log_file.write('Error writing video:')
-                self.log_file.write(type(write_error))
-                self.log_file.write(write_error.args)
-                self.log_file.write(write_error)
+                self.log_message('Error writing video: ' + repr(write_error))
                 return False
         
         else:
 
-            self.log_file.write('Video writer not opened')
+            self.log_message('Video writer not opened')
             return False
 
 
@@ -249,10 +373,15 @@ class FRCWebCam:
         # Release the camera resource
         self.camStream.release()
 
-        # Release video writer
+        # Release video writer and finish the frame index
         self.camWriter.release()
-
-        # Close the log file
-        self.log_file.write('Webcam closed. Video writer closed.')
-        self.log_file.close()
+        if self.recordIndex is not None:
+            if self.recordIndex.close() == False:
+                self.log_message('Warning: frame index has %d rows for %d video frames' %
+                                 (self.recordIndex.frameCount, self.recordIndex.chunkCount))
+        if self.frame_counts['rejected'] > 0:
+            self.log_message('%d frames were not recorded' % self.frame_counts['rejected'])
+
+        # Log camera closed
+        self.log_message('Webcam closed. Video writer closed.')
 
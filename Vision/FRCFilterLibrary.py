@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/env python3
+
+####################################################################
+#                                                                  #
+#                      FRC Filter Library                          #
+#                                                                  #
+#  These functions run the blur and morphology steps of target     #
+#  segmentation with the cheapest implementation for the settings  #
+#  in the vision file.  Blur can be Gaussian, a box filter with    #
+#  the same spread as that Gaussian (a running sum, so its cost    #
+#  does not grow with the kernel), a stack blur, or none at all    #
+#  when a reduced size decode has already smoothed the frame.      #
+#  Repeated erode and dilate passes with a small square kernel are #
+#  the same as one opening with a larger square kernel, so they    #
+#  run as a single morphologyEx call.                              #
+#                                                                  #
+#  @Version: 1.0                                                   #
+#  @Created: 2021-03-31                                            #
+#  @Author: Team 4121                                              #
+#                                                                  #
+####################################################################
+
+'''FRC Filter Library - Provides blur and morphology fast paths'''
+
+# System imports
+import math
+
+# Module Imports
+import cv2 as cv
+
+# Blur types and default filter settings (blur size, blur type, opening size)
+blur_types = ('gaussian', 'box', 'stack', 'none')
+default_filters = (13, 'gaussian', 5)
+
+# Opening kernels by size
+open_kernels = {}
+
+
+# Define filter settings function (reads a target section of the vision file)
+def filter_settings(values):
+
+    blurSize = int(values.get('BLUR', default_filters[0]))
+    blurType = str(values.get('BLURTYPE', default_filters[1])).lower()
+    if blurType not in blur_types:
+        raise ValueError('Unknown blur type: ' + blurType)
+    if blurSize <= 1:
+        blurType = 'none'
+
+    # Each erode or dilate pass with a KERNEL square grows the opening by KERNEL - 1
+    openSize = int(values.get('ITERATIONS', 2)) * (int(values.get('KERNEL', 3)) - 1) + 1
+
+    return (blurSize, blurType, openSize)
+
+
+# Define box size function (odd box width with the same variance as the Gaussian)
+def box_size(blurSize):
+
+    sigma = 0.3 * ((blurSize - 1) * 0.5 - 1) + 0.8
+    width = math.sqrt(12 * sigma * sigma + 1)
+    return 2 * int(round((width - 1) / 2)) + 1
+
+
+# Define blur reach function (rows a blurred pixel reads on each side)
+def blur_reach(blurSize, blurType):
+
+    if blurType == 'none':
+        return 0
+    if blurType == 'box':
+        return box_size(blurSize) // 2
+    return blurSize // 2
+
+
+# Define blur function
+def blur_image(img, blurSize, blurType):
+
+    if blurType == 'none':
+        return img
+    if blurType == 'box':
+        size = box_size(blurSize)
+        return cv.blur(img, (size, size))
+    if blurType == 'stack' and hasattr(cv, 'stackBlur'):
+        return cv.stackBlur(img, (blurSize, blurSize))
+
+    return cv.GaussianBlur(img, (blurSize, blurSize), 0)
+
+
+# Define opening function (erode then dilate in one call)
+def open_mask(mask, openSize):
+
+    if openSize <= 1:
+        return mask
+
+    kernel = open_kernels.get(openSize)
+    if kernel is None:
+        kernel = cv.getStructuringElement(cv.MORPH_RECT, (openSize, openSize))
+        open_kernels[openSize] = kernel
+
+    return cv.morphologyEx(mask, cv.MORPH_OPEN, kernel)
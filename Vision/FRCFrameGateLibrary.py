@@ -0,0 +1,100 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/env python3
+
+####################################################################
+#                                                                  #
+#                    FRC Frame Gate Library                        #
+#                                                                  #
+#  This class skips target detection on frames that have not       #
+#  changed.  Each frame is shrunk to a small grayscale thumbnail   #
+#  (area averaging also removes most sensor noise) and compared    #
+#  with the thumbnail of the last frame that was processed.  When  #
+#  no thumbnail pixel changed by more than the threshold, and the  #
+#  robot is not turning (Navx angular rate, when given), the last  #
+#  detection result is returned again and the reused flag is set.  #
+#  A frame is always processed after maxReuse reused frames so     #
+#  slow drift can never hold a stale result for long.              #
+#                                                                  #
+#  @Version: 1.0                                                   #
+#  @Created: 2021-03-28                                            #
+#  @Author: Team 4121                                              #
+#                                                                  #
+####################################################################
+
+'''FRC Frame Gate Library - Reuses detections on unchanged frames'''
+
+# Module Imports
+import cv2 as cv
+import numpy as np
+
+
+# Define the frame gate class
+class FRCFrameGate:
+
+    # Define initialization
+    def __init__(self, scale=8, pixelThreshold=10, minPixels=1, maxReuse=15, maxRate=2.0):
+
+        # Store gate settings
+        self.scale = int(scale)
+        self.pixelThreshold = pixelThreshold
+        self.minPixels = int(minPixels)
+        self.maxReuse = int(maxReuse)
+        self.maxRate = maxRate
+
+        # Initialize gate state
+        self.reference = None
+        self.result = None
+        self.reused = False
+        self.reuseCount = 0
+        self.changedPixels = 0
+
+
+    # Define thumbnail method
+    def thumbnail(self, img):
+
+        size = (max(img.shape[1] // self.scale, 1), max(img.shape[0] // self.scale, 1))
+        small = cv.resize(img, size, interpolation=cv.INTER_AREA)
+        if small.ndim == 3:
+            small = cv.cvtColor(small, cv.COLOR_BGR2GRAY)
+        return small
+
+
+    # Define change test method (thumbnail compared with the last processed frame)
+    def has_changed(self, small, angularRate=None):
+
+        # Nothing to compare against
+        if self.reference is None or self.reference.shape != small.shape:
+            return True
+
+        # Robot is turning so the view is moving even if the image looks flat
+        if angularRate is not None and abs(angularRate) > self.maxRate:
+            return True
+
+        # Count thumbnail pixels that changed more than noise
+        self.changedPixels = int(np.count_nonzero(cv.absdiff(small, self.reference) > self.pixelThreshold))
+        return self.changedPixels >= self.minPixels
+
+
+    # Define gated processing method (detect is called with the frame when needed)
+    def process(self, img, detect, angularRate=None):
+
+        small = self.thumbnail(img)
+        if self.result is None or self.reuseCount >= self.maxReuse or self.has_changed(small, angularRate):
+            self.result = detect(img)
+            self.reference = small
+            self.reuseCount = 0
+            self.reused = False
+        else:
+            self.reuseCount += 1
+            self.reused = True
+
+        return self.result
+
+
+    # Define reset method (forces the next frame to be processed)
+    def reset(self):
+
+        self.reference = None
+        self.result = None
+        self.reused = False
+        self.reuseCount = 0
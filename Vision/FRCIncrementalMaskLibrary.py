@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/env python3
+
+####################################################################
+#                                                                  #
+#                 FRC Incremental Mask Library                     #
+#                                                                  #
+#  This class keeps the cleaned (eroded then dilated) threshold    #
+#  mask and its contours from one frame to the next and only       #
+#  redoes the work where the mask changed.  The new mask is        #
+#  compared with the last one and the box around every changed     #
+#  pixel is found in one call.  Morphology is rerun on that box    #
+#  plus a halo wide enough that the result matches processing the  #
+#  whole mask.  Contours that do not touch the changed area are    #
+#  kept; contours are found again only in the changed area (grown  #
+#  until no kept contour touches it).  Per tile bookkeeping cost   #
+#  more than whole mask morphology, so there is none.  When the    #
+#  box covers more than maxDirty of the frame the whole mask is    #
+#  processed instead, and for the next skipFrames frames too       #
+#  without comparing, since a moving scene would otherwise pay for #
+#  the compare on every frame (see TestIncrementalMaskApp for the  #
+#  crossover point).                                               #
+#                                                                  #
+#  @Version: 1.0                                                   #
+#  @Created: 2021-03-28                                            #
+#  @Author: Team 4121                                              #
+#                                                                  #
+####################################################################
+
+'''FRC Incremental Mask Library - Reuses morphology on static masks'''
+
+# Module Imports
+import cv2 as cv
+
+# Team 4121 module imports
+from FRCFilterLibrary import open_mask
+
+
+# Define the incremental mask class
+class FRCIncrementalMask:
+
+    # Define initialization
+    def __init__(self, iterations=2, maxDirty=0.25, skipFrames=4, openSize=None):
+
+        # Store settings (an opening reaches openSize - 1 pixels, erode plus dilate)
+        self.openSize = int(openSize) if openSize is not None else 2 * int(iterations) + 1
+        self.halo = self.openSize - 1
+        self.maxDirty = maxDirty
+        self.skipFrames = int(skipFrames)
+        self.skipping = 0
+
+        # Initialize cached state
+        self.mask = None
+        self.opened = None
+        self.contours = []
+        self.boxes = []
+        self.dirtyShare = 0.0
+        self.fullFrames = 0
+        self.incrementalFrames = 0
+        self.reusedFrames = 0
+
+
+    # Define full frame method
+    def open_mask(self, mask):
+
+        return open_mask(mask, self.openSize)
+
+
+    # Define contour storing method (bounding boxes for overlap tests are found when first needed)
+    def store_contours(self, contours):
+
+        self.contours = list(contours)
+        self.boxes = None
+
+
+    # Define mask update method (returns the cleaned mask and its contours)
+    def update(self, mask):
+
+        # Start over on the first frame or a new frame size
+        if self.mask is None or self.mask.shape != mask.shape:
+            self.dirtyShare = 1.0
+            return self.update_full(mask)
+
+        # Keep processing the whole mask for a while after too much changed
+        if self.skipping > 0:
+            self.skipping -= 1
+            return self.update_full(mask)
+
+        # Nothing changed so everything is reused
+        changed = cv.compare(mask, self.mask, cv.CMP_NE)
+        x, y, w, h = cv.boundingRect(changed)
+        height, width = mask.shape
+        self.dirtyShare = float(w * h) / (width * height)
+        if w == 0:
+            self.reusedFrames += 1
+            return self.opened, self.contours
+
+        # Too much changed for a partial update to pay off
+        if self.dirtyShare > self.maxDirty:
+            self.skipping = self.skipFrames
+            return self.update_full(mask)
+
+        # Output area grows by the halo, input area by the halo again
+        halo = self.halo
+        x0 = max(x - halo, 0)
+        x1 = min(x + w + halo, width)
+        y0 = max(y - halo, 0)
+        y1 = min(y + h + halo, height)
+        ix0 = max(x0 - halo, 0)
+        ix1 = min(x1 + halo, width)
+        iy0 = max(y0 - halo, 0)
+        iy1 = min(y1 + halo, height)
+        opened = self.open_mask(mask[iy0:iy1, ix0:ix1])
+        self.opened[y0:y1, x0:x1] = opened[y0 - iy0:y1 - iy0, x0 - ix0:x1 - ix0]
+
+        self.mask = mask
+        self.update_contours(x0, y0, x1, y1)
+        self.incrementalFrames += 1
+        return self.opened, self.contours
+
+
+    # Define full update method
+    def update_full(self, mask):
+
+        self.mask = mask
+        self.opened = self.open_mask(mask)
+        contours, _ = cv.findContours(self.opened, cv.RETR_EXTERNAL, cv.CHAIN_APPROX_SIMPLE)
+        self.store_contours(contours)
+        self.fullFrames += 1
+        return self.opened, self.contours
+
+
+    # Define contour update method (changed area is left, top, right, bottom)
+    def update_contours(self, left, top, right, bottom):
+
+        # Grow the area until no kept contour touches it (one pixel apart counts)
+        if self.boxes is None:
+            self.boxes = [cv.boundingRect(c) for c in self.contours]
+        keep = list(range(len(self.contours)))
+        grown = True
+        while grown:
+            grown = False
+            for i in keep:
+                x, y, w, h = self.boxes[i]
+                if x <= right and x + w >= left and y <= bottom and y + h >= top:
+                    left = min(left, x)
+                    top = min(top, y)
+                    right = max(right, x + w)
+                    bottom = max(bottom, y + h)
+                    keep.remove(i)
+                    grown = True
+                    break
+
+        # Find contours again only inside the changed area
+        found, _ = cv.findContours(self.opened[top:bottom, left:right], cv.RETR_EXTERNAL,
+                                   cv.CHAIN_APPROX_SIMPLE, offset=(left, top))
+        self.contours = [self.contours[i] for i in keep] + list(found)
+        self.boxes = [self.boxes[i] for i in keep] + [cv.boundingRect(c) for c in found]
+
+
+    # Define reset method
+    def reset(self):
+
+        self.mask = None
+        self.opened = None
+        self.skipping = 0
+        self.store_contours([])
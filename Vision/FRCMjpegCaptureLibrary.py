@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/env python3
+
+####################################################################
+#                                                                  #
+#                   FRC MJPEG Capture Library                      #
+#                                                                  #
+#  This class captures compressed MJPEG frames from a USB camera   #
+#  through V4L2 and decodes them only as far as the pipeline       #
+#  needs.  The camera is asked for MJPEG (CAP_PROP_FOURCC) with    #
+#  RGB conversion off, so retrieve() hands back the JPEG buffer.   #
+#  The buffer is decoded with the reduced size JPEG decoder (half, #
+#  quarter or eighth scale is done inside the IDCT, much cheaper   #
+#  than decoding full size and resizing) or as grayscale only.     #
+#  The compressed buffer is also kept so it can be recorded or     #
+#  decoded later on demand.  It can stand in for cv.VideoCapture   #
+#  in FRCWebCam.  An MJPEG AVI file can be used in place of the    #
+#  camera, frame by frame from the AVI chunk index, for testing.   #
+#                                                                  #
+#  @Version: 1.0                                                   #
+#  @Created: 2021-03-29                                            #
+#  @Author: Team 4121                                              #
+#                                                                  #
+####################################################################
+
+'''FRC MJPEG Capture Library - Provides compressed camera capture'''
+
+# System imports
+import os
+import time
+
+# Module Imports
+import cv2 as cv
+import numpy as np
+
+# Team 4121 module imports
+from FRCRecordingLibrary import index_avi_frames
+
+# Decode modes (imdecode flags and the scale they divide the frame by)
+decode_modes = {'color': (cv.IMREAD_COLOR, 1),
+                'color2': (cv.IMREAD_REDUCED_COLOR_2, 2),
+                'color4': (cv.IMREAD_REDUCED_COLOR_4, 4),
+                'color8': (cv.IMREAD_REDUCED_COLOR_8, 8),
+                'gray': (cv.IMREAD_GRAYSCALE, 1),
+                'gray2': (cv.IMREAD_REDUCED_GRAYSCALE_2, 2),
+                'gray4': (cv.IMREAD_REDUCED_GRAYSCALE_4, 4),
+                'gray8': (cv.IMREAD_REDUCED_GRAYSCALE_8, 8)}
+
+
+# Define the MJPEG capture class
+class FRCMjpegCapture:
+
+    # Define initialization
+    def __init__(self, src, decode='color'):
+
+        # Open the camera (or an MJPEG AVI standing in for it)
+        self.src = src
+        self.open(src)
+
+        # Initialize decode settings and frame buffer
+        self.set_decode(decode)
+        self.buffer = None
+
+
+    # Define open method (asks the camera for compressed frames)
+    def open(self, src):
+
+        if os.path.splitext(str(src))[1].lower() == '.avi':
+            self.stream = FRCMjpegFileSource(src)
+        else:
+            self.stream = cv.VideoCapture(src, cv.CAP_V4L2)
+            self.stream.set(cv.CAP_PROP_FOURCC, cv.VideoWriter_fourcc('M', 'J', 'P', 'G'))
+            self.stream.set(cv.CAP_PROP_CONVERT_RGB, 0)
+
+        return self.stream.isOpened()
+
+
+    # Define decode mode method
+    def set_decode(self, decode):
+
+        if decode not in decode_modes:
+            raise ValueError('Unknown decode mode: ' + str(decode))
+        self.decode = decode
+        self.decode_flags, self.scale = decode_modes[decode]
+
+
+    # Define opened check method
+    def isOpened(self):
+
+        return self.stream.isOpened()
+
+
+    # Define property set method
+    def set(self, prop, value):
+
+        return self.stream.set(prop, value)
+
+
+    # Define property get method
+    def get(self, prop):
+
+        return self.stream.get(prop)
+
+
+    # Define release method
+    def release(self):
+
+        self.stream.release()
+
+
+    # Define grab method (next frame stays compressed)
+    def grab(self):
+
+        self.buffer = None
+        return self.stream.grab()
+
+
+    # Define compressed retrieve method (JPEG bytes of the grabbed frame)
+    def retrieve_compressed(self):
+
+        if self.buffer is None:
+            grabbed, self.buffer = self.stream.retrieve()
+            if grabbed == False:
+                self.buffer = None
+
+        return self.buffer
+
+
+    # Define retrieve method (decodes the grabbed frame)
+    def retrieve(self):
+
+        data = self.retrieve_compressed()
+        if data is None:
+            return False, None
+
+        frame = self.decode_buffer(data)
+        return frame is not None, frame
+
+
+    # Define read method
+    def read(self):
+
+        if self.grab() == False:
+            return False, None
+        return self.retrieve()
+
+
+    # Define buffer decode method
+    def decode_buffer(self, data):
+
+        # Compressed buffer (one row of bytes)
+        if data.ndim == 1 or data.shape[0] == 1:
+            return cv.imdecode(data.reshape(-1), self.decode_flags)
+
+        # Backend ignored the RGB conversion setting and already decoded the frame
+        frame = data
+        if self.scale > 1:
+            frame = cv.resize(frame, (frame.shape[1] // self.scale, frame.shape[0] // self.scale),
+                              interpolation=cv.INTER_AREA)
+        if self.decode.startswith('gray') and frame.ndim == 3:
+            frame = cv.cvtColor(frame, cv.COLOR_BGR2GRAY)
+        return frame
+
+
+# Define the MJPEG file source class (an AVI standing in for the camera)
+class FRCMjpegFileSource:
+
+    # Define initialization
+    def __init__(self, videofile, fps=0, loop=True):
+
+        # Index the video chunks and open the file
+        self.videoFilename = videofile
+        self.frames = index_avi_frames(videofile)
+        self.in_file = open(videofile, 'rb') if len(self.frames) > 0 else None
+        self.fps = float(fps)
+        self.loop = loop
+
+        # Initialize playback state and camera properties
+        self.position = -1
+        self.nextTime = time.monotonic()
+        self.properties = {}
+
+
+    # Define opened check method
+    def isOpened(self):
+
+        return self.in_file is not None
+
+
+    # Define property set method
+    def set(self, prop, value):
+
+        # Accept settings like a camera would, and pace frames at the set rate
+        self.properties[prop] = value
+        if prop == cv.CAP_PROP_FPS:
+            self.fps = float(value)
+        return True
+
+
+    # Define property get method
+    def get(self, prop):
+
+        if prop == cv.CAP_PROP_FRAME_COUNT:
+            return float(len(self.frames))
+        return float(self.properties.get(prop, 0))
+
+
+    # Define release method
+    def release(self):
+
+        if self.in_file is not None:
+            self.in_file.close()
+            self.in_file = None
+
+
+    # Define grab method (moves to the next chunk, waiting like a camera when paced)
+    def grab(self):
+
+        if self.in_file is None:
+            return False
+
+        if self.fps > 0:
+            delay = self.nextTime - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            self.nextTime = max(self.nextTime, time.monotonic() - 1.0 / self.fps) + 1.0 / self.fps
+
+        self.position += 1
+        if self.position >= len(self.frames):
+            if self.loop == False:
+                return False
+            self.position = 0
+
+        return True
+
+
+    # Define retrieve method (returns the compressed frame bytes)
+    def retrieve(self):
+
+        if self.in_file is None or self.position < 0:
+            return False, None
+
+        offset, size = self.frames[self.position]
+        self.in_file.seek(offset)
+        return True, np.frombuffer(self.in_file.read(size), dtype=np.uint8)
+
+
+    # Define read method
+    def read(self):
+
+        if self.grab() == False:
+            return False, None
+        return self.retrieve()
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/env python3
+
+####################################################################
+#                                                                  #
+#                    FRC Projection Library                        #
+#                                                                  #
+#  This class converts target keypoints found in a raw camera      #
+#  frame into bearings and ranges using the camera model.  Only    #
+#  the keypoints are undistorted (cv.undistortPoints), so frames   #
+#  never need to be undistorted as a whole.  Each keypoint becomes #
+#  a ray from the camera; bearing comes from the ray direction and #
+#  range from the angle between the rays through two edges of a    #
+#  target of known size.  Lateral offset is the center ray scaled  #
+#  by the target size over the edge ray spacing (as the field of   #
+#  view math did), so it does not pick up the range error.  All    #
+#  targets in a frame are measured in one vectorized pass.         #
+#  Cameras without a calibration use a pinhole model built from    #
+#  the field of view setting.                                      #
+#                                                                  #
+#  @Version: 1.0                                                   #
+#  @Created: 2021-03-26                                            #
+#  @Author: Team 4121                                              #
+#                                                                  #
+####################################################################
+
+'''FRC Projection Library - Provides camera model target measurement'''
+
+# Module Imports
+import cv2 as cv
+import numpy as np
+
+
+# Define the camera projection class
+class FRCProjection:
+
+    # Define initialization
+    def __init__(self, width, height, fov, calibration=None, scale=1):
+
+        # Store frame size
+        self.width = int(width)
+        self.height = int(height)
+
+        # Use calibrated intrinsics when available (scaled for reduced size decoding)
+        if calibration is not None and calibration.is_loaded():
+            self.cam_matrix = np.asarray(calibration.cam_matrix, dtype=np.float64).copy()
+            self.cam_matrix[0:2, 0:2] /= scale
+            self.cam_matrix[0:2, 2] = (self.cam_matrix[0:2, 2] + 0.5) / scale - 0.5
+            self.distort_coeffs = np.asarray(calibration.distort_coeffs, dtype=np.float64)
+            self.calibrated = True
+
+        # Otherwise build a pinhole model matching the FOV setting (half angle, degrees)
+        else:
+            focal = self.width / (2 * np.tan(np.radians(fov)))
+            self.cam_matrix = np.array([[focal, 0, self.width / 2.0],
+                                        [0, focal, self.height / 2.0],
+                                        [0, 0, 1]], dtype=np.float64)
+            self.distort_coeffs = np.zeros(5, dtype=np.float64)
+            self.calibrated = False
+
+
+    # Define point normalization method (pixels -> undistorted rays with z = 1)
+    def normalize(self, points):
+
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 1, 2)
+        if len(points) == 0:
+            return np.zeros((0, 2))
+        return cv.undistortPoints(points, self.cam_matrix, self.distort_coeffs).reshape(-1, 2)
+
+
+    # Define bearing method (degrees, positive to the right of the camera axis)
+    def bearings(self, points):
+
+        rays = self.normalize(points)
+        return np.degrees(np.arctan(rays[:, 0]))
+
+
+    # Define elevation method (degrees, positive above the camera axis)
+    def elevations(self, points):
+
+        rays = self.normalize(points)
+        return np.degrees(np.arctan2(-rays[:, 1], np.hypot(1.0, rays[:, 0])))
+
+
+    # Define range method (target of known size between two edge points)
+    def ranges(self, firstPoints, secondPoints, size):
+
+        # Build unit rays through both edges
+        first = self.normalize(firstPoints)
+        second = self.normalize(secondPoints)
+        first = np.column_stack((first, np.ones(len(first))))
+        second = np.column_stack((second, np.ones(len(second))))
+        first /= np.linalg.norm(first, axis=1)[:, None]
+        second /= np.linalg.norm(second, axis=1)[:, None]
+
+        # Range from the angle the target subtends
+        subtended = np.arccos(np.clip(np.sum(first * second, axis=1), -1.0, 1.0))
+        return np.asarray(size, dtype=np.float64) / (2 * np.tan(np.maximum(subtended, 1e-9) / 2))
+
+
+    # Define target measurement method (centers plus two edges of known size)
+    def measure(self, centers, firstPoints, secondPoints, size):
+
+        bearing = self.bearings(centers)
+        distance = self.ranges(firstPoints, secondPoints, size)
+        centerRays = self.normalize(centers)
+        spans = np.linalg.norm(self.normalize(secondPoints) - self.normalize(firstPoints), axis=1)
+        offset = -np.asarray(size, dtype=np.float64) * centerRays[:, 0] / np.maximum(spans, 1e-9)
+        return distance, bearing, offset
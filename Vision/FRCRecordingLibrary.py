@@ -0,0 +1,242 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/env python3
+
+####################################################################
+#                                                                  #
+#                     FRC Recording Library                        #
+#                                                                  #
+#  This class writes a sidecar index for match videos.  Each row   #
+#  links a frame in the AVI to its capture timestamp, its byte     #
+#  offset in the file and the detection values published for it.   #
+#  Because the videos are MJPEG, every frame is a complete JPEG    #
+#  and can be read and decoded on its own without stepping the     #
+#  decoder through the rest of the file.  Rows are paired with     #
+#  the video chunks by position, so an index whose row count does  #
+#  not match the frame count is marked as unusable instead.  Rows  #
+#  are flushed as they are written so a recording cut off by a     #
+#  power loss still loads, paired with the frames that survived.   #
+#                                                                  #
+#  @Version: 1.0                                                   #
+#  @Created: 2021-03-23                                            #
+#  @Author: Team 4121                                              #
+#                                                                  #
+####################################################################
+
+'''FRC Recording Library - Provides frame indexed match recordings'''
+
+# System imports
+import os
+import csv
+import struct
+import bisect
+import logging
+
+# Module Imports
+import cv2 as cv
+import numpy as np
+
+# Index columns
+index_fields = ['frame', 'time', 'offset', 'size', 'found', 'lock',
+                'distance', 'angle', 'targetoffset', 'bearing']
+
+# Rows written between index flushes (the robot can lose power at any time)
+index_flush_frames = 1
+
+
+# Define the recording index class
+class FRCRecordingIndex:
+
+    # Define initialization
+    def __init__(self, videofile):
+
+        # Open sidecar index next to the video
+        self.videoFilename = videofile
+        self.indexFilename = get_index_filename(videofile)
+        self.index_file = open(self.indexFilename, 'w', newline='')
+        self.writer = csv.writer(self.index_file)
+        self.writer.writerow(index_fields)
+        self.frameCount = 0
+        self.chunkCount = 0
+
+
+    # Define frame record method (byte offsets are filled in on close)
+    def add_frame(self, frameData):
+
+        self.writer.writerow([self.frameCount,
+                              '%.6f' % float(frameData.get('time', 0.0)),
+                              -1, 0,
+                              int(bool(frameData.get('found', False))),
+                              int(bool(frameData.get('lock', False))),
+                              '%.3f' % float(frameData.get('distance', 0.0)),
+                              '%.3f' % float(frameData.get('angle', 0.0)),
+                              '%.3f' % float(frameData.get('offset', 0.0)),
+                              '%.3f' % float(frameData.get('bearing', 0.0))])
+        self.frameCount += 1
+        if self.frameCount % index_flush_frames == 0:
+            self.index_file.flush()
+
+
+    # Define close method (call after the video writer is released, returns True if every row has a frame)
+    def close(self):
+
+        # Close the sidecar
+        self.index_file.close()
+
+        # Fill in frame byte offsets from the finished AVI
+        rows = read_recording_index(self.indexFilename)
+        chunks = index_avi_frames(self.videoFilename)
+        self.chunkCount = len(chunks)
+        matched = fill_frame_offsets(rows, chunks)
+
+        # Rows that could not be matched to frames are marked with a size of -1
+        if matched == False:
+            for row in rows:
+                row['size'] = -1
+        write_recording_index(self.indexFilename, rows)
+
+        return matched
+
+
+# Define frame offset function (rows and chunks pair up by position only when the counts agree)
+def fill_frame_offsets(rows, chunks):
+
+    # A count mismatch means frames were dropped somewhere, so no row can be trusted
+    # to point at its own frame and the offsets are left unknown
+    if len(rows) != len(chunks):
+        return False
+
+    for row, (offset, size) in zip(rows, chunks):
+        row['offset'] = offset
+        row['size'] = size
+    return True
+
+
+# Define index filename function
+def get_index_filename(videofile):
+
+    return os.path.splitext(videofile)[0] + '_index.csv'
+
+
+# Define AVI frame index function (offset and size of every video chunk)
+def index_avi_frames(videofile):
+
+    # Walk the RIFF chunk headers without reading frame data
+    frames = []
+    try:
+        with open(videofile, 'rb') as in_file:
+            fileSize = os.fstat(in_file.fileno()).st_size
+            walk_avi_chunks(in_file, 0, fileSize, frames)
+    except (OSError, struct.error):
+        pass
+
+    return frames
+
+
+# Define AVI chunk walk function
+def walk_avi_chunks(in_file, position, end, frames):
+
+    while position + 8 <= end:
+
+        # Read chunk header
+        in_file.seek(position)
+        chunkId, chunkSize = struct.unpack('<4sI', in_file.read(8))
+
+        # Descend into containers that hold video data (a zero size means
+        # the writer was never closed, so the container runs to the end)
+        if chunkId in (b'RIFF', b'LIST'):
+            listType = in_file.read(4)
+            if chunkSize == 0:
+                chunkSize = end - position - 8
+            if listType in (b'AVI ', b'AVIX', b'movi', b'rec '):
+                walk_avi_chunks(in_file, position + 12, min(position + 8 + chunkSize, end), frames)
+
+        # Record compressed (00dc) and raw (00db) video chunks (not one cut off at the end of the file)
+        elif chunkId[2:4] in (b'dc', b'db'):
+            if position + 8 + chunkSize <= end:
+                frames.append((position + 8, chunkSize))
+
+        # Skip to next chunk (chunks are word aligned)
+        position += 8 + chunkSize + (chunkSize & 1)
+
+
+# Define index read function (stops at a row cut off by a power loss)
+def read_recording_index(indexfile):
+
+    rows = []
+    with open(indexfile, 'r', newline='') as in_file:
+        for row in csv.DictReader(in_file):
+            try:
+                rows.append({'frame': int(row['frame']),
+                             'time': float(row['time']),
+                             'offset': int(row['offset']),
+                             'size': int(row['size']),
+                             'found': int(row['found']),
+                             'lock': int(row['lock']),
+                             'distance': float(row['distance']),
+                             'angle': float(row['angle']),
+                             'targetoffset': float(row['targetoffset']),
+                             'bearing': float(row['bearing'])})
+            except (TypeError, ValueError):
+                break
+
+    return rows
+
+
+# Define index write function
+def write_recording_index(indexfile, rows):
+
+    with open(indexfile, 'w', newline='') as out_file:
+        writer = csv.DictWriter(out_file, fieldnames=index_fields)
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+# Define raw frame read function (returns the JPEG bytes of one frame)
+def read_frame_bytes(videofile, offset, size):
+
+    with open(videofile, 'rb') as in_file:
+        in_file.seek(offset)
+        return in_file.read(size)
+
+
+# Define frame read function (decodes only the requested frame)
+def read_frame(videofile, offset, size, flags=cv.IMREAD_COLOR):
+
+    data = read_frame_bytes(videofile, offset, size)
+    return cv.imdecode(np.frombuffer(data, dtype=np.uint8), flags)
+
+
+# Define recording load function (fills in offsets if the run never closed the video)
+def load_recording(videofile):
+
+    rows = read_recording_index(get_index_filename(videofile))
+    if any(row['size'] < 0 for row in rows):
+        raise ValueError('Frame index does not match the video frames: %s' % videofile)
+    if any(row['offset'] < 0 for row in rows):
+
+        # A video that was never closed may be missing its last unflushed frames, and the
+        # index may be missing its last rows (each frame is written before its row), so
+        # pair up the frames and rows that both made it to disk
+        chunks = index_avi_frames(videofile)
+        if len(chunks) > len(rows):
+            logging.warning('Frame index has %d rows for %d video frames, later frames are not indexed: %s' %
+                            (len(rows), len(chunks), videofile))
+        count = min(len(rows), len(chunks))
+        rows = rows[0:count]
+        fill_frame_offsets(rows, chunks[0:count])
+
+    return rows
+
+
+# Define frame search function (first frame at or after a match time in seconds)
+def find_frame_at_time(rows, seconds):
+
+    startTime = rows[0]['time']
+    times = [row['time'] - startTime for row in rows]
+    return min(bisect.bisect_left(times, seconds), len(rows) - 1)
+
+
+# Define target lock change search function
+def find_lock_changes(rows):
+
+    return [i for i in range(1, len(rows)) if rows[i]['lock'] != rows[i - 1]['lock']]
@@ -0,0 +1,179 @@
+# -*- coding: utf-8 -*-
+#!/usr/bin/env python3
+
+####################################################################
+#                                                                  #
+#                       FRC Shape Library                          #
+#                                                                  #
+#  This class sorts blobs into target shapes and everything else   #
+#  before any per target math runs.  Bounding box aspect ratio and #
+#  fill (blob area over box area) are computed for all contours at #
+#  once with numpy and looked up in a small decision table built   #
+#  from the target settings.  Each cell of the table accepts,      #
+#  rejects, or sends the blob on to the slower checks: solidity    #
+#  (area over hull area) and the aspect ratio from Hu moments,     #
+#  which does not change when the target is tilted in the frame.   #
+#  The moment aspect is long side over short side, so it is        #
+#  checked against the target ratio folded the same way (wide      #
+#  targets have a ratio below 1).                                  #
+#  Slow features are kept for blobs that are still in about the    #
+#  same place next frame, so tracked targets are not measured      #
+#  again.                                                          #
+#                                                                  #
+#  @Version: 1.0                                                   #
+#  @Created: 2021-04-01                                            #
+#  @Author: Team 4121                                              #
+#                                                                  #
+####################################################################
+
+'''FRC Shape Library - Provides fast target shape classification'''
+
+# System imports
+import math
+
+# Module Imports
+import cv2 as cv
+import numpy as np
+
+# Decision table cells
+SHAPE_REJECT = 0
+SHAPE_ACCEPT = 1
+SHAPE_CHECK = 2
+
+
+# Define the shape filter class
+class FRCShapeFilter:
+
+    # Define initialization
+    def __init__(self, ratio, tolerance, minFill=0.6, minSolidity=0.8, aspectBins=64, fillBins=10,
+                 maxAspect=16.0, maxTilt=30.0, cacheGrid=4):
+
+        # Store settings (aspect ratio is height over width)
+        self.ratioMin = max(ratio - tolerance, 0.0)
+        self.ratioMax = ratio + tolerance
+        self.momentMin, self.momentMax = self.moment_range()
+        self.minFill = minFill
+        self.minSolidity = minSolidity
+        self.aspectBins = aspectBins
+        self.fillBins = fillBins
+        self.logMax = math.log(maxAspect)
+        self.maxTilt = math.radians(maxTilt)
+        self.cacheGrid = cacheGrid
+
+        # Build the decision table and initialize the feature cache
+        self.table = self.build_table()
+        self.cache = {}
+        self.cacheHits = 0
+        self.cacheMisses = 0
+
+
+    # Define moment aspect range method (height over width range as long side over short side)
+    def moment_range(self):
+
+        folded = [max(r, 1.0 / r) if r > 0 else float('inf') for r in (self.ratioMin, self.ratioMax)]
+        if self.ratioMin <= 1.0 <= self.ratioMax:
+            return 1.0, max(folded)
+        return min(folded), max(folded)
+
+
+    # Define decision table method (aspect bins are even in log aspect, fill bins in fill)
+    def build_table(self):
+
+        table = np.zeros((self.aspectBins, self.fillBins), dtype=np.uint8)
+        for a in range(self.aspectBins):
+
+            # Aspect range covered by this bin
+            low = math.exp(-self.logMax + 2 * self.logMax * a / self.aspectBins)
+            high = math.exp(-self.logMax + 2 * self.logMax * (a + 1) / self.aspectBins)
+            for f in range(self.fillBins):
+                fillLow = f / float(self.fillBins)
+                fillHigh = (f + 1) / float(self.fillBins)
+
+                # Whole cell inside the target range is accepted, whole cell outside rejected
+                if high < self.ratioMin or low > self.ratioMax or fillHigh <= self.minFill:
+                    table[a, f] = SHAPE_REJECT
+                elif low >= self.ratioMin and high <= self.ratioMax and fillLow >= self.minFill:
+                    table[a, f] = SHAPE_ACCEPT
+                else:
+                    table[a, f] = SHAPE_CHECK
+
+        # A tilted target has a squarer, emptier box but the right moment aspect, so it is checked
+        # (out to the box aspects of the target ratios turned by the largest tilt, which are closer to 1)
+        c = math.cos(self.maxTilt)
+        s = math.sin(self.maxTilt)
+        tiltMin = (self.ratioMin * c + s) / (c + self.ratioMin * s)
+        tiltMax = (self.ratioMax * c + s) / (c + self.ratioMax * s)
+        tilted = (table == SHAPE_REJECT) & (np.arange(self.fillBins)[None, :] >= self.fillBins // 5)
+        rangeBins = self.aspect_bins(np.array([min(self.ratioMin, tiltMin), max(self.ratioMax, tiltMax)]))
+        tilted[0:rangeBins[0], :] = False
+        tilted[rangeBins[1] + 1:, :] = False
+        table[tilted] = SHAPE_CHECK
+
+        return table
+
+
+    # Define aspect bin method
+    def aspect_bins(self, aspects):
+
+        bins = (np.log(np.maximum(aspects, 1e-6)) + self.logMax) * self.aspectBins / (2 * self.logMax)
+        return np.clip(bins.astype(np.int32), 0, self.aspectBins - 1)
+
+
+    # Define bulk feature method (boxes, aspect ratios and fill for all contours)
+    def box_features(self, contours):
+
+        boxes = np.array([cv.boundingRect(c) for c in contours], dtype=np.float64).reshape(-1, 4)
+        areas = np.array([cv.contourArea(c) for c in contours], dtype=np.float64)
+        aspects = boxes[:, 3] / np.maximum(boxes[:, 2], 1)
+        fills = areas / np.maximum(boxes[:, 2] * boxes[:, 3], 1)
+
+        return boxes, areas, aspects, fills
+
+
+    # Define slow feature method (solidity and moment aspect ratio)
+    def shape_features(self, contour, area):
+
+        hullArea = cv.contourArea(cv.convexHull(contour))
+        solidity = area / hullArea if hullArea > 0 else 0.0
+
+        # Hu moments 1 and 2 give the principal spreads of the blob
+        hu = cv.HuMoments(cv.moments(contour)).ravel()
+        spread = math.sqrt(max(hu[1], 0.0))
+        major = (hu[0] + spread) / 2
+        minor = (hu[0] - spread) / 2
+        momentAspect = math.sqrt(major / minor) if minor > 0 else float('inf')
+
+        return solidity, momentAspect
+
+
+    # Define classify method (returns True for each contour that has the target shape)
+    def classify(self, contours):
+
+        if len(contours) == 0:
+            return []
+
+        # Table lookup for every contour at once
+        boxes, areas, aspects, fills = self.box_features(contours)
+        fillBins = np.clip((fills * self.fillBins).astype(np.int32), 0, self.fillBins - 1)
+        cells = self.table[self.aspect_bins(aspects), fillBins]
+        results = cells == SHAPE_ACCEPT
+
+        # Borderline blobs get the slow checks (kept for blobs that have not moved)
+        cache = {}
+        for i in np.flatnonzero(cells == SHAPE_CHECK):
+            x, y, w, h = boxes[i]
+            key = (int(x) // self.cacheGrid, int(y) // self.cacheGrid, int(w) // 2, int(h) // 2)
+            features = self.cache.get(key)
+            if features is None:
+                features = self.shape_features(contours[i], areas[i])
+                self.cacheMisses += 1
+            else:
+                self.cacheHits += 1
+            cache[key] = features
+            solidity, momentAspect = features
+            results[i] = solidity >= self.minSolidity and self.momentMin <= momentAspect <= self.momentMax
+
+        # Only blobs seen this frame stay cached
+        self.cache = cache
+
+        return results.tolist()
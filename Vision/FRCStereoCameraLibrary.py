@@ -27,9 +27,8 @@ import cv2 as cv
 import numpy as np
 from threading import Thread
 
-# Set global variables
-calibration_dir = '/home/pi/Team4121/Config'
-#calibration_dir = 'C:/FRC-Test/Config/Calibration'
+# Team 4121 module imports
+from FRCCalibrationLibrary import FRCCalibration
 
 
 # Define the web camera class
@@ -48,26 +47,18 @@ class FRCStereoCam:
         # Initialize stop flag
         self.stopped = False
 
-        # Read left camera calibrarion files
-        left_matrix_file = (calibration_dir + '/Camera_Matrix_Cam' + 
-                                str(leftSrc) + '.txt')
-        left_coeffs_file = (calibration_dir + '/Distortion_Coeffs_Cam' + 
-                                str(leftSrc) + '.txt')
-        if (os.path.isfile(left_matrix_file) == True and 
-          os.path.isfile(left_coeffs_file) == True):
-            self.left_cam_matrix = np.loadtxt(left_matrix_file)
-            self.left_distort_coeffs = np.loadtxt(left_coeffs_file)
+        # Load left camera calibration (remap tables for the frame size are built and stored here)
+        self.left_calibration = FRCCalibration(leftSrc, resolutions=[(int(settings['Width']), int(settings['Height']))])
+        if self.left_calibration.is_loaded() == True:
+            self.left_cam_matrix = self.left_calibration.cam_matrix
+            self.left_distort_coeffs = self.left_calibration.distort_coeffs
             self.undistort_left = True
-       
-        # Read right camera calibration files
-        right_matrix_file = (calibration_dir + '/Camera_Matrix_Cam' + 
-                                str(rightSrc) + '.txt')
-        right_coeffs_file = (calibration_dir + '/Distortion_Coeffs_Cam' + 
-                                str(rightSrc) + '.txt')
-        if (os.path.isfile(right_matrix_file) == True and 
-          os.path.isfile(right_coeffs_file) == True):
-            self.right_cam_matrix = np.loadtxt(right_matrix_file)
-            self.right_distort_coeffs = np.loadtxt(right_coeffs_file)
+
+        # Load right camera calibration
+        self.right_calibration = FRCCalibration(rightSrc, resolutions=[(int(settings['Width']), int(settings['Height']))])
+        if self.right_calibration.is_loaded() == True:
+            self.right_cam_matrix = self.right_calibration.cam_matrix
+            self.right_distort_coeffs = self.right_calibration.distort_coeffs
             self.undistort_right = True
 
         # Set up left camera
@@ -168,35 +159,8 @@ class FRCStereoCam:
         # Undistort images
         if self.undistort_left == True and self.undistort_right == True:
 
-            left_h, left_w = self.leftFrame.shape[:2]
-            (new_left_matrix, left_roi) = cv.getOptimalNewCameraMatrix(
-                                            self.left_cam_matrix,
-                                            self.left_distort_coeffs,
-                                            (left_w,left_h),
-                                            1,
-                                            (left_w,left_h))
-            newLeftFrame = cv.undistort(self.leftFrame, 
-                                        self.left_cam_matrix,
-                                        self.left_distort_coeffs, 
-                                        None,
-                                        new_left_matrix)
-            x,y,w,h = left_roi
-            newLeftFrame = newLeftFrame[y:y+h,x:x+w]
-
-            right_h, right_w = self.rightFrame.shape[:2]
-            (new_right_matrix, right_roi) = cv.getOptimalNewCameraMatrix(
-                                            self.right_cam_matrix,
-                                            self.right_distort_coeffs,
-                                            (right_w,right_h),
-                                            1,
-                                            (right_w,right_h))
-            newRightFrame = cv.undistort(self.rightFrame, 
-                                        self.right_cam_matrix,
-                                         self.right_distort_coeffs, 
-                                         None,
-                                         new_right_matrix)
-            x,y,w,h = right_roi
-            newRightFrame = newRightFrame[y:y+h,x:x+w]
+            newLeftFrame = self.left_calibration.undistort(self.leftFrame)
+            newRightFrame = self.right_calibration.undistort(self.rightFrame)
 
         else:
             
@@ -213,35 +177,8 @@ class FRCStereoCam:
         # Undistort images
         if self.undistort_left == True and self.undistort_right == True:
 
-            left_h, left_w = self.leftFrame.shape[:2]
-            (new_left_matrix, left_roi) = cv.getOptimalNewCameraMatrix(
-                                            self.left_cam_matrix,
-                                            self.left_distort_coeffs,
-                                            (left_w,left_h),
-                                            1,
-                                            (left_w,left_h))
-            newLeftFrame = cv.undistort(self.leftFrame, 
-                                        self.left_cam_matrix,
-                                        self.left_distort_coeffs, 
-                                        None,
-                                        new_left_matrix)
-            x,y,w,h = left_roi
-            newLeftFrame = newLeftFrame[y:y+h,x:x+w]
-
-            right_h, right_w = self.rightFrame.shape[:2]
-            (new_right_matrix, right_roi) = cv.getOptimalNewCameraMatrix(
-                                            self.right_cam_matrix,
-                                            self.right_distort_coeffs,
-                                            (right_w,right_h),
-                                            1,
-                                            (right_w,right_h))
-            newRightFrame = cv.undistort(self.rightFrame, 
-                                        self.right_cam_matrix,
-                                         self.right_distort_coeffs, 
-                                         None,
-                                         new_right_matrix)
-            x,y,w,h = right_roi
-            newRightFrame = newRightFrame[y:y+h,x:x+w]
+            newLeftFrame = self.left_calibration.undistort(self.leftFrame)
+            newRightFrame = self.right_calibration.undistort(self.rightFrame)
 
         else:
             
@@ -26,6 +26,12 @@ import cv2 as cv
 import numpy as np 
 import math
 
+# Team 4121 module imports
+from FRCIncrementalMaskLibrary import FRCIncrementalMask
+from FRCFilterLibrary import filter_settings, default_filters, blur_image, open_mask
+from FRCShapeLibrary import FRCShapeFilter
+from FRCBallSplitLibrary import split_settings, ball_circles
+
 # Define the vision library class
 class VisionLibrary:
 
@@ -35,6 +41,7 @@ class VisionLibrary:
     goal_values = {}
     tape_values = {}
     marker_values = {}
+    layout_values = {}
 
 
     # Define class initialization
@@ -44,6 +51,31 @@ class VisionLibrary:
         VisionLibrary.visionFile = visionfile
         self.read_vision_file(VisionLibrary.visionFile)
 
+        #Cleaned masks kept between frames (per HSV range) when incremental
+        self.incremental = False
+        self.incrementalMasks = {}
+
+        #Band segmenter (spreads thresholding over cores) when set
+        self.segmenter = None
+
+        #Last single channel threshold (Otsu picks a new one every frame)
+        self.channelThreshold = 0
+
+        #Marker shape filter (built on first use, the settings may have no marker section)
+        self.markerShape = None
+
+
+    # Define marker shape filter method (aspect ratio, fill, solidity and Hu moments)
+    def marker_shape(self):
+
+        if self.markerShape is None:
+            self.markerShape = FRCShapeFilter(float(VisionLibrary.marker_values['TARGETRATIO']),
+                                              float(VisionLibrary.marker_values['RATIOTOL']),
+                                              float(VisionLibrary.marker_values.get('MINFILL', 0.6)),
+                                              float(VisionLibrary.marker_values.get('MINSOLIDITY', 0.8)))
+
+        return self.markerShape
+
 
     # Read vision settings file
     def read_vision_file(self, file):
@@ -82,6 +114,9 @@ class VisionLibrary:
                     new_section = True
                 elif split_line[0].upper() == 'MARKER:':
                     value_section = 'MARKER'
+                elif split_line[0].upper() == 'LAYOUT:':
+                    value_section = 'LAYOUT'
+                    new_section = True
                 elif split_line[0] == '':
                     value_section = ''
                     new_section = True
@@ -98,6 +133,8 @@ class VisionLibrary:
                         VisionLibrary.tape_values[split_line[0].upper()] = split_line[1]
                     elif value_section == 'MARKER':
                         VisionLibrary.marker_values[split_line[0].upper()] = split_line[1]
+                    elif value_section == 'LAYOUT':
+                        VisionLibrary.layout_values[split_line[0].upper()] = split_line[1]
                     else:
                         new_section = True
         
@@ -107,35 +144,96 @@ class VisionLibrary:
         return True
 
 
+    # Define segmentation settings method (None for HSV, else mode, threshold, floor, blur size)
+    def segment_settings(self, values):
+
+        mode = values.get('SEGMENT', 'hsv').lower()
+        if mode == 'hsv':
+            return None
+        if mode not in ('green', 'greendiff'):
+            raise ValueError('Unknown segmentation mode: ' + mode)
+
+        # Floor is the dimmest (or least green) pixel the HSV range would accept
+        if mode == 'green':
+            floor = int(values['VMIN'])
+        else:
+            floor = int(values['SMIN']) * int(values['VMIN']) // 255
+        threshold = str(values.get('THRESHOLD', floor)).lower()
+        if threshold != 'otsu':
+            threshold = int(threshold)
+        return (mode, threshold, floor, int(values.get('SEGMENTBLUR', 5)))
+
+
+    # Define single channel threshold method (green channel or green minus the larger of red and blue)
+    def threshold_channel(self, imgRaw, segment, blur=True):
+
+        mode, threshold, floor, blurSize = segment
+
+        # Build the single channel image
+        if mode == 'greendiff':
+            b, g, r = cv.split(imgRaw)
+            channel = cv.subtract(g, cv.max(r, b))
+        else:
+            channel = cv.extractChannel(imgRaw, 1)
+
+        # Blur one channel instead of three
+        if blur and blurSize > 1:
+            channel = cv.GaussianBlur(channel, (blurSize, blurSize), 0)
+
+        # Fixed threshold or Otsu (never below the floor, so frames without tape stay empty)
+        if threshold == 'otsu':
+            self.channelThreshold, mask = cv.threshold(channel, 0, 255, cv.THRESH_BINARY | cv.THRESH_OTSU)
+            if self.channelThreshold < floor:
+                self.channelThreshold, mask = cv.threshold(channel, floor, 255, cv.THRESH_BINARY)
+        else:
+            self.channelThreshold, mask = cv.threshold(channel, threshold, 255, cv.THRESH_BINARY)
+
+        return mask
+
+
     # Define basic image processing method for contours
-    def process_image_contours(self, imgRaw, hsvMin, hsvMax, erodeDilate):
+    def process_image_contours(self, imgRaw, hsvMin, hsvMax, erodeDilate, segment=None, filters=default_filters):
         
         finalImg = ""
+        blurSize, blurType, openSize = filters
+
+        # Threshold a single channel when the target asks for it (tape under a green LED ring)
+        if segment is not None:
+            mask = self.threshold_channel(imgRaw, segment)
+
+        # Threshold (and clean up) the frame in parallel bands
+        elif self.segmenter is not None:
+            bandMorphology = erodeDilate and not self.incremental
+            mask = self.segmenter.segment(imgRaw, hsvMin, hsvMax, bandMorphology, filters)
+            if bandMorphology:
+                contours, _ = cv.findContours(mask, cv.RETR_EXTERNAL, cv.CHAIN_APPROX_SIMPLE)
+                return contours
+        else:
 
-        # Blur image to remove noise
-        blur = cv.GaussianBlur(imgRaw.copy(),(13,13),0)
-        
-        # Convert from BGR to HSV colorspace
-        hsv = cv.cvtColor(blur, cv.COLOR_BGR2HSV)
+            # Blur image to remove noise (cheapest filter for the target settings)
+            blur = blur_image(imgRaw, blurSize, blurType)
+
+            # Convert from BGR to HSV colorspace
+            hsv = cv.cvtColor(blur, cv.COLOR_BGR2HSV)
 
-        # Set pixels to white if in target HSV range, else set to black
-        mask = cv.inRange(hsv, hsvMin, hsvMax)
+            # Set pixels to white if in target HSV range, else set to black
+            mask = cv.inRange(hsv, hsvMin, hsvMax)
 
         # cv.imshow('mask', mask)
 
+        # Redo morphology and contours only where the mask changed
+        if erodeDilate and self.incremental:
+            incrementalMask = self.incrementalMasks.get((hsvMin, hsvMax, segment, filters))
+            if incrementalMask is None:
+                incrementalMask = FRCIncrementalMask(openSize=openSize)
+                self.incrementalMasks[(hsvMin, hsvMax, segment, filters)] = incrementalMask
+            finalImg, contours = incrementalMask.update(mask)
+            return list(contours)
+
         if erodeDilate:
-            # Erode image to reduce background noise
-            kernel = np.ones((3,3), np.uint8)
-            erode = cv.erode(mask, kernel, iterations=2)
-            
-            # cv.imshow('erode', erode)
-            
-            # Dilate image to sharpen actual objects
-            dilate = cv.dilate(erode, kernel, iterations=2)
-            
-            # cv.imshow('dilate', dilate)
-            
-            finalImg = dilate
+            # Erode image to reduce background noise, then dilate to restore
+            # actual objects (repeated small passes run as one opening)
+            finalImg = open_mask(mask, openSize)
 
         else:
             finalImg = mask
@@ -164,7 +262,7 @@ class VisionLibrary:
 
 
     # Find ball game pieces
-    def detect_game_balls(self, imgRaw, cameraWidth, cameraHeight, cameraFOV):
+    def detect_game_balls(self, imgRaw, cameraWidth, cameraHeight, cameraFOV, projection=None):
 
         # Read HSV values from dictionary and make tuples
         hMin = int(VisionLibrary.ball_values['HMIN'])
@@ -185,31 +283,46 @@ class VisionLibrary:
         ballData = []
 
         # Find contours in the mask and clean up the return style from OpenCV
-        ballContours = self.process_image_contours(imgRaw, ballHSVMin, ballHSVMax,True)
+        ballContours = self.process_image_contours(imgRaw, ballHSVMin, ballHSVMax,True,
+                                                   self.segment_settings(VisionLibrary.ball_values),
+                                                   filter_settings(VisionLibrary.ball_values))
 
         # Only proceed if at least one contour was found
         if len(ballContours) > 0:
 
             #Sort contours by area (reverse order so largest is first)
             sortedContours = sorted(ballContours, key=cv.contourArea, reverse=True)
+            minRadius = int(VisionLibrary.ball_values['MINRADIUS'])
+            split = split_settings(VisionLibrary.ball_values)
 
-            #Process each contour
+            #Process each contour (touching balls are split when the split mode is set)
             for contour in sortedContours:
 
                 #Find enclosing circle
                 ((x, y), radius) = cv.minEnclosingCircle(contour)
 
-                #Proceed if circle meets minimum radius requirement
-                if radius > int(VisionLibrary.ball_values['MINRADIUS']):
+                #Stop when circle is below minimum radius requirement
+                if radius <= minRadius:
+
+                    #No more contours meet criteria so break loop
+                    break
+
+                #Process each ball in the blob
+                for (x, y, radius) in ball_circles(contour, minRadius, split):
+
+                    #Skip split balls below minimum radius requirement
+                    if radius <= minRadius:
+                        continue
             
-                    #Calculate ball metrics
-                    inches_per_pixel = float(VisionLibrary.ball_values['RADIUS'])/radius #set up a general conversion factor
-                    distanceToTargetPlane = inches_per_pixel * (cameraWidth / (2 * math.tan(math.radians(cameraFOV))))
-                    offsetInInches = inches_per_pixel * (x - cameraWidth / 2)
-                    angleToBall = math.degrees(math.atan((offsetInInches / distanceToTargetPlane)))
-                    distanceToBall = math.cos(math.radians(angleToBall)) * distanceToTargetPlane
+                    #Calculate ball metrics (measured together below when a camera model is given)
+                    if projection is None:
+                        inches_per_pixel = float(VisionLibrary.ball_values['RADIUS'])/radius #set up a general conversion factor
+                        distanceToTargetPlane = inches_per_pixel * (cameraWidth / (2 * math.tan(math.radians(cameraFOV))))
+                        offsetInInches = inches_per_pixel * (x - cameraWidth / 2)
+                        angleToBall = math.degrees(math.atan((offsetInInches / distanceToTargetPlane)))
+                        distanceToBall = math.cos(math.radians(angleToBall)) * distanceToTargetPlane
+                        ballOffset = -offsetInInches
                     screenPercent = math.pi * radius * radius / (cameraWidth * cameraHeight)
-                    ballOffset = -offsetInInches
 
                     #Save values to dictionary
                     ballDataDict = {}
@@ -226,17 +339,29 @@ class VisionLibrary:
 
                     #Increment ball count
                     ballsFound = ballsFound + 1
-        
-                else:
 
-                    #No more contours meet criteria so break loop
-                    break
+            #Keep largest ball first when blobs were split
+            if split[0] != 'none':
+                ballData.sort(key=lambda b: b['radius'], reverse=True)
+
+        #Measure all balls from their center and edge rays
+        if projection is not None and ballsFound > 0:
+            centers = np.array([(b['x'], b['y']) for b in ballData])
+            radii = np.array([b['radius'] for b in ballData])
+            distances, angles, offsets = projection.measure(centers,
+                                                            centers - np.column_stack((radii, np.zeros(ballsFound))),
+                                                            centers + np.column_stack((radii, np.zeros(ballsFound))),
+                                                            2 * float(VisionLibrary.ball_values['RADIUS']))
+            for ballDataDict, distance, angle, offset in zip(ballData, distances, angles, offsets):
+                ballDataDict['distance'] = float(distance)
+                ballDataDict['angle'] = float(angle)
+                ballDataDict['offset'] = float(offset)
 
         return ballsFound, ballData
 
     
     #find game field markers
-    def detect_field_marker(self, imgRaw, cameraWidth, cameraHeight, cameraFOV):
+    def detect_field_marker(self, imgRaw, cameraWidth, cameraHeight, cameraFOV, projection=None):
         
         # Read HSV values from dictionary and make tuples
         hMin = int(VisionLibrary.marker_values['HMIN'])
@@ -256,16 +381,15 @@ class VisionLibrary:
         markerH = 0
         distanceToMarker = 0 #inches
         angleToMarker = 0 #degrees
+        markerOffset = 0
         screenPercent = 0
         markersFound = 0
         markerData = []
 
-        # Calculate Ratio TOL
-        ratioMax = float(VisionLibrary.marker_values['TARGETRATIO']) + float(VisionLibrary.marker_values['RATIOTOL'])
-        ratioMin = float(VisionLibrary.marker_values['TARGETRATIO']) - float(VisionLibrary.marker_values['RATIOTOL'])
-        
         #finding marker contours
-        markerContours = self.process_image_contours(imgRaw, markerHSVMin, markerHSVMax, False)
+        markerContours = self.process_image_contours(imgRaw, markerHSVMin, markerHSVMax, False,
+                                                     self.segment_settings(VisionLibrary.marker_values),
+                                                     filter_settings(VisionLibrary.marker_values))
 
         # Only proceed if at least one contour was found
         if len(markerContours) > 0:
@@ -273,8 +397,11 @@ class VisionLibrary:
             #Sort contours by area (reverse order so largest is first)
             sortedContours = sorted(markerContours, key=cv.contourArea, reverse=True)
 
+            #Check the shape of every contour at once
+            markerShapes = self.marker_shape().classify(sortedContours)
+
             #Process each contour
-            for contour in sortedContours:
+            for contour, markerShape in zip(sortedContours, markerShapes):
 
                 # Find bounding rectangle
                 markerX, markerY, markerW, markerH = cv.boundingRect(contour)
@@ -283,17 +410,19 @@ class VisionLibrary:
                 area = (markerW * markerH)
                 if area > int(VisionLibrary.marker_values['MINAREA']):
 
-                    # Check for ratio
-                    #if ((markerH / markerW) > ratioMin) and ((markerH / markerW) < ratioMax):
-
-                    # Marker distance calculations
-                    inches_per_pixel = float(VisionLibrary.marker_values['HEIGHT'])/markerH #set up a general conversion factor
-                    distanceToTargetPlane = inches_per_pixel * (cameraWidth / (2 * math.tan(math.radians(cameraFOV))))
-                    offsetInInches = inches_per_pixel * (markerX - cameraWidth / 2)
-                    angleToMarker = math.degrees(math.atan((offsetInInches / distanceToTargetPlane)))
-                    distanceToMarker = math.cos(math.radians(angleToMarker)) * distanceToTargetPlane
+                    # Check for ratio (and fill, solidity and Hu moments when borderline)
+                    if markerShape == False:
+                        continue
+
+                    # Marker distance calculations (measured together below when a camera model is given)
+                    if projection is None:
+                        inches_per_pixel = float(VisionLibrary.marker_values['HEIGHT'])/markerH #set up a general conversion factor
+                        distanceToTargetPlane = inches_per_pixel * (cameraWidth / (2 * math.tan(math.radians(cameraFOV))))
+                        offsetInInches = inches_per_pixel * (markerX - cameraWidth / 2)
+                        angleToMarker = math.degrees(math.atan((offsetInInches / distanceToTargetPlane)))
+                        distanceToMarker = math.cos(math.radians(angleToMarker)) * distanceToTargetPlane
+                        markerOffset = -offsetInInches
                     screenPercent = area / (cameraWidth * cameraHeight)
-                    markerOffset = -offsetInInches
 
                     #Save values to dictionary
                     markerDataDict = {}
@@ -317,12 +446,25 @@ class VisionLibrary:
                     #No more contours meet criteria so break loop
                     break
 
+        # Measure all markers from their center, top and bottom rays
+        if projection is not None and markersFound > 0:
+            boxes = np.array([(m['x'], m['y'], m['w'], m['h']) for m in markerData], dtype=np.float64)
+            middles = boxes[:, 0] + boxes[:, 2] / 2
+            distances, angles, offsets = projection.measure(np.column_stack((middles, boxes[:, 1] + boxes[:, 3] / 2)),
+                                                            np.column_stack((middles, boxes[:, 1])),
+                                                            np.column_stack((middles, boxes[:, 1] + boxes[:, 3])),
+                                                            float(VisionLibrary.marker_values['HEIGHT']))
+            for markerDataDict, distance, angle, offset in zip(markerData, distances, angles, offsets):
+                markerDataDict['distance'] = float(distance)
+                markerDataDict['angle'] = float(angle)
+                markerDataDict['offset'] = float(offset)
+
         return markersFound, markerData
        
 
 
     # Define general tape detection method (rectangle good for generic vision tape targets)
-    def detect_tape_rectangle(self, imgRaw, imageWidth, imageHeight, cameraFOV, cameraFocalLength, cameraMountAngle, cameraMountHeight):
+    def detect_tape_rectangle(self, imgRaw, imageWidth, imageHeight, cameraFOV, cameraFocalLength, cameraMountAngle, cameraMountHeight, projection=None, findPose=False):
 
         # Read HSV values from dictionary and make tupples
         hMin = int(VisionLibrary.tape_values['HMIN'])
@@ -358,10 +500,17 @@ class VisionLibrary:
         vertOffsetInInches = 0
         rect = None
         box = None
+        largestContour = None
+        poseX = 0
+        poseZ = 0
+        poseYaw = 0
+        poseError = 0
 
         # Initialize flags
         foundTape = False
         targetLock = False
+        foundPose = False
+        poseAmbiguous = False
 
         goalHeight = 90.0
 
@@ -370,7 +519,9 @@ class VisionLibrary:
         tapeRealWorldValues = {}
         
         # Find alignment tape in image
-        tapeContours = self.process_image_contours(imgRaw, tapeHSVMin, tapeHSVMax, True)
+        tapeSegment = self.segment_settings(VisionLibrary.tape_values)
+        tapeContours = self.process_image_contours(imgRaw, tapeHSVMin, tapeHSVMax, True, tapeSegment,
+                                                   filter_settings(VisionLibrary.tape_values))
   
         # Continue with processing if alignment tape found
         if len(tapeContours) > 0:
@@ -389,7 +540,7 @@ class VisionLibrary:
                 # Find angled rectangle
                 rect = cv.minAreaRect(largestContour)#((x, y), (h, w), angle)
                 box = cv.boxPoints(rect)
-                box = np.int0(box)
+                box = np.intp(box)
 
                 # Find angle of bot to target
                 angle = rect[2]
@@ -418,21 +569,48 @@ class VisionLibrary:
                 vertOffsetInInches = inchesPerPixel * vertOffsetPixels
                 centerOffset = -horizOffsetInInches
                 
-                # Calculate distance to tape
-                straightLineDistance = apparentTapeWidth * cameraFocalLength / targetW
+                # Calculate distance to tape (from the tape edge rays when a camera model is given)
+                if projection is None:
+                    straightLineDistance = apparentTapeWidth * cameraFocalLength / targetW
+                else:
+                    middleY = targetY + targetH / 2
+                    straightLineDistance = float(projection.ranges([(targetX, middleY)],
+                                                                   [(targetX + targetW, middleY)],
+                                                                   apparentTapeWidth)[0])
                 distanceArg = math.pow(straightLineDistance, 2) - math.pow((float(VisionLibrary.tape_values['GOALHEIGHT']) - cameraMountHeight),2)
                 if (distanceArg > 0):
                     distanceToTape = math.sqrt(distanceArg)
                 distanceToWall = distanceToTape / math.cos(math.radians(botAngle))                
 
                 # Find tape offsets
-                horizAngleToTape = math.degrees(math.atan((horizOffsetInInches / distanceToTape)))
-                vertAngleToTape = math.degrees(math.atan((vertOffsetInInches / distanceToTape)))
+                if projection is None:
+                    horizAngleToTape = math.degrees(math.atan((horizOffsetInInches / distanceToTape)))
+                    vertAngleToTape = math.degrees(math.atan((vertOffsetInInches / distanceToTape)))
+                else:
+                    tapeCenter = [(targetX + targetW / 2, targetY + targetH / 2)]
+                    horizAngleToTape = float(projection.bearings(tapeCenter)[0])
+                    vertAngleToTape = float(projection.elevations(tapeCenter)[0])
 
                 # Determine if we have target lock
                 if abs(horizOffsetInInches) <= float(VisionLibrary.tape_values['LOCKTOLERANCE']):
                     targetLock = True
 
+                # Solve for the full camera to goal pose
+                if findPose == True and projection is not None:
+                    poseContour = self.refine_tape_contour(imgRaw, targetX, targetY, targetW, targetH,
+                                                           tapeHSVMin, tapeHSVMax, segment=tapeSegment)
+                    foundPose, poseX, poseZ, poseYaw, poseError, poseAmbiguous = self.estimate_tape_pose(
+                        poseContour, projection, cameraMountAngle)
+
+                    # When both solutions fit about as well the pose yaw is a guess, so use
+                    # the rectangle distance and angle (keeping the pose side of the wall)
+                    if foundPose == True and poseAmbiguous == True:
+                        poseRange = math.hypot(poseX, poseZ)
+                        if poseRange > 0 and distanceToTape > 0:
+                            poseX *= distanceToTape / poseRange
+                            poseZ *= distanceToTape / poseRange
+                        poseYaw = math.copysign(botAngle, poseYaw)
+
         # Fill return dictionary
         tapeCameraValues['TargetX'] = targetX
         tapeCameraValues['TargetY'] = targetY
@@ -451,6 +629,176 @@ class VisionLibrary:
         tapeRealWorldValues['BotAngle'] = botAngle
         tapeRealWorldValues['ApparentWidth'] = apparentTapeWidth
         tapeRealWorldValues['VertOffset'] = vertOffsetInInches
+        tapeRealWorldValues['PoseFound'] = foundPose
+        tapeRealWorldValues['PoseX'] = poseX
+        tapeRealWorldValues['PoseZ'] = poseZ
+        tapeRealWorldValues['PoseYaw'] = poseYaw
+        tapeRealWorldValues['PoseError'] = poseError
+        tapeRealWorldValues['PoseAmbiguous'] = poseAmbiguous
 
         return tapeCameraValues, tapeRealWorldValues, foundTape, targetLock, rect, box
 
+
+    # Define tape outline method (thin tape lines don't survive the erode, so
+    # re-threshold just the target region with light blur and no morphology)
+    def refine_tape_contour(self, imgRaw, targetX, targetY, targetW, targetH, hsvMin, hsvMax, margin=6, segment=None):
+
+        x0 = max(targetX - margin, 0)
+        y0 = max(targetY - margin, 0)
+        roi = imgRaw[y0:targetY + targetH + margin, x0:targetX + targetW + margin]
+        if segment is not None:
+            mask = self.threshold_channel(roi, (segment[0], int(self.channelThreshold), 0, 0), False)
+        else:
+            mask = cv.inRange(cv.cvtColor(roi, cv.COLOR_BGR2HSV), hsvMin, hsvMax)
+        contours, _ = cv.findContours(mask, cv.RETR_EXTERNAL, cv.CHAIN_APPROX_NONE)
+        contours = [c for c in contours if cv.contourArea(c) > 0.02 * targetW * targetH]
+        if len(contours) == 0:
+            return np.array([[targetX, targetY]])
+        return np.vstack(contours).reshape(-1, 2) + np.array([x0, y0])
+
+
+    # Define tape corner method (top left, top right, bottom right, bottom left)
+    def find_tape_corners(self, contour):
+
+        # Coarse corners are the extreme hull points along the diagonals
+        points = cv.convexHull(np.asarray(contour, dtype=np.int32).reshape(-1, 1, 2)).reshape(-1, 2).astype(np.float64)
+        sums = points[:, 0] + points[:, 1]
+        diffs = points[:, 0] - points[:, 1]
+        corners = np.array([points[np.argmin(sums)], points[np.argmax(diffs)],
+                            points[np.argmax(sums)], points[np.argmin(diffs)]])
+
+        # Refine by fitting a line to the outline points along each side
+        outline = np.asarray(contour, dtype=np.float64).reshape(-1, 2)
+        lines = []
+        for i in range(4):
+            start, end = corners[i], corners[(i + 1) % 4]
+            side = end - start
+            length = np.hypot(side[0], side[1])
+            if length < 4:
+                return corners
+            along = (outline - start) @ side / (length * length)
+            across = np.abs((outline - start) @ np.array([-side[1], side[0]])) / length
+            selected = outline[(along > 0.15) & (along < 0.85) & (across < 2.0)]
+            if len(selected) < 3:
+                return corners
+            lines.append(cv.fitLine(selected.astype(np.float32), cv.DIST_L2, 0, 0.01, 0.01).ravel())
+
+        # Corners are where neighboring sides meet
+        refined = []
+        for i in range(4):
+            vx0, vy0, x0, y0 = lines[i - 1]
+            vx1, vy1, x1, y1 = lines[i]
+            det = vx0 * (-vy1) - vy0 * (-vx1)
+            if abs(det) < 1e-6:
+                return corners
+            t = ((x1 - x0) * (-vy1) - (y1 - y0) * (-vx1)) / det
+            refined.append((x0 + t * vx0, y0 + t * vy0))
+        refined = np.array(refined, dtype=np.float64)
+
+        # Keep coarse corners if a fit went wild
+        if np.max(np.abs(refined - corners)) > 3.0:
+            return corners
+        return refined
+
+
+    # Define tape model method (corners in inches, origin at top center, y down, z into the wall)
+    def tape_model_points(self):
+
+        topWidth = float(VisionLibrary.tape_values['TAPEWIDTH'])
+        bottomWidth = float(VisionLibrary.tape_values.get('TAPEBOTTOMWIDTH', topWidth))
+        height = float(VisionLibrary.tape_values['TAPEHEIGHT'])
+        return np.array([[-topWidth / 2, 0, 0], [topWidth / 2, 0, 0],
+                         [bottomWidth / 2, height, 0], [-bottomWidth / 2, height, 0]], dtype=np.float64)
+
+
+    # Define tape pose method (solvePnP on the four tape corners, also returns
+    # whether the two IPPE solutions were too close in error to tell apart)
+    def estimate_tape_pose(self, contour, projection, cameraMountAngle):
+
+        objectPoints = self.tape_model_points()
+        imagePoints = self.find_tape_corners(contour)
+        tilt = math.radians(cameraMountAngle)
+
+        # A small planar target has two nearly equal solutions; the goal
+        # tape is on a vertical wall, so keep the one with a level normal
+        count, rvecs, tvecs, errors = cv.solvePnPGeneric(objectPoints, imagePoints, projection.cam_matrix,
+                                                         projection.distort_coeffs, flags=cv.SOLVEPNP_IPPE)
+        best = None
+        for rvec, tvec in zip(rvecs, tvecs):
+            if tvec[2, 0] <= 0:
+                continue
+            normal = cv.Rodrigues(rvec)[0][:, 2]
+            tiltError = abs(normal[2] * math.sin(tilt) - normal[1] * math.cos(tilt))
+            if best is None or tiltError < best[0]:
+                best = (tiltError, rvec, tvec)
+        if best is None:
+            return False, 0, 0, 0, 0, False
+        tiltError, rvec, tvec = best
+        ambiguous = False
+        if count > 1:
+            solutionErrors = sorted(float(e) for e in np.ravel(errors))
+            ambiguous = solutionErrors[1] < float(VisionLibrary.tape_values.get('POSEAMBIGUITY', 3.0)) * solutionErrors[0]
+        error = self.pose_error(objectPoints, imagePoints, projection, rvec, tvec)
+
+        # Level the camera frame using the mount angle (camera pitched up)
+        normal = cv.Rodrigues(rvec)[0][:, 2]
+        poseX = float(tvec[0, 0])
+        poseY = float(tvec[1, 0] * math.cos(tilt) - tvec[2, 0] * math.sin(tilt))
+        poseZ = float(tvec[2, 0] * math.cos(tilt) + tvec[1, 0] * math.sin(tilt))
+        normalZ = normal[2] * math.cos(tilt) + normal[1] * math.sin(tilt)
+        poseYaw = math.degrees(math.atan2(normal[0], normalZ))
+
+        # Far away the tape is only a few pixels tall and pitch trades off
+        # against yaw, so finish with the wall held vertical
+        pose, levelError = self.refine_level_pose(objectPoints, imagePoints, projection, tilt,
+                                                  np.array([poseYaw, poseX, poseY, poseZ]))
+        if levelError < error:
+            poseYaw, poseX, poseY, poseZ = (float(v) for v in pose)
+            error = levelError
+
+        return True, poseX, poseZ, poseYaw, error, ambiguous
+
+
+    # Define level pose projection method (yaw in degrees, position in the level camera frame)
+    def project_level_pose(self, objectPoints, projection, tilt, pose):
+
+        yaw = math.radians(pose[0])
+        turn = np.array([[math.cos(yaw), 0, math.sin(yaw)], [0, 1, 0], [-math.sin(yaw), 0, math.cos(yaw)]])
+        level = np.array([[1, 0, 0], [0, math.cos(tilt), -math.sin(tilt)], [0, math.sin(tilt), math.cos(tilt)]])
+        projected, _ = cv.projectPoints(objectPoints, cv.Rodrigues(level.T @ turn)[0], level.T @ pose[1:4],
+                                        projection.cam_matrix, projection.distort_coeffs)
+        return projected.reshape(-1, 2)
+
+
+    # Define level pose refinement method (Gauss-Newton on yaw and position)
+    def refine_level_pose(self, objectPoints, imagePoints, projection, tilt, pose, iterations=10):
+
+        pose = pose.astype(np.float64)
+        for iteration in range(iterations):
+
+            # Numeric Jacobian of the corner residuals
+            residual = (self.project_level_pose(objectPoints, projection, tilt, pose) - imagePoints).ravel()
+            jacobian = np.zeros((len(residual), 4))
+            for k in range(4):
+                step = pose.copy()
+                step[k] += 0.01
+                jacobian[:, k] = ((self.project_level_pose(objectPoints, projection, tilt, step) - imagePoints).ravel()
+                                  - residual) / 0.01
+
+            # Solve for the update
+            update = np.linalg.lstsq(jacobian, -residual, rcond=None)[0]
+            pose += update
+            if np.max(np.abs(update)) < 1e-3:
+                break
+
+        diff = self.project_level_pose(objectPoints, projection, tilt, pose) - imagePoints
+        return pose, float(np.sqrt(np.mean(np.sum(diff * diff, axis=1))))
+
+
+    # Define pose reprojection error method (RMS pixels)
+    def pose_error(self, objectPoints, imagePoints, projection, rvec, tvec):
+
+        projected, _ = cv.projectPoints(objectPoints, rvec, tvec, projection.cam_matrix, projection.distort_coeffs)
+        diff = projected.reshape(-1, 2) - imagePoints
+        return float(np.sqrt(np.mean(np.sum(diff * diff, axis=1))))
+